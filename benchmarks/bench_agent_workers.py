@@ -0,0 +1,219 @@
+"""Throughput of the balance sheet agent server with 1..N uvicorn workers.
+
+Each run starts the agent server (SQLite store) with a given number of workers
+and drives it with concurrent A2A `message/send` requests. The model is a
+scripted stand-in that calls `balance_sheet_metrics` once and then answers, so
+every request runs the real executor, tool, FMP client and analytics code
+against a local stub FMP server, plus `--model-latency` seconds per model call.
+Reports requests per second and p50/p99 latency per worker count.
+
+    python benchmarks/bench_agent_workers.py --workers 1 2 4 --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import AsyncGenerator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+import httpx  # noqa: E402
+
+from bench_statement_tools import BALANCE_SHEET_ITEMS, fake_statement  # noqa: E402
+
+
+FMP_PORT = 19200
+AGENT_PORT = 19201
+
+
+def create_app():
+    """App factory imported by every uvicorn worker; configured from the environment."""
+    from google.adk.agents import LlmAgent
+    from google.adk.models.base_llm import BaseLlm
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    from balancesheet_agent.balance_sheet_agent import balance_sheet_metrics, create_agent_card
+    from common.agent_stores import create_stores
+    from common.statement_server import build_statement_app
+
+    model_latency = float(os.environ['BENCH_MODEL_LATENCY'])
+
+    class ScriptedLlm(BaseLlm):
+        """Calls the metrics tool for the ticker in the message, then summarises the result."""
+
+        model: str = 'scripted'
+
+        async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+            await asyncio.sleep(model_latency)
+            last = llm_request.contents[-1].parts[0]
+            if last.function_response:
+                text = str(last.function_response.response.get('result'))
+                yield LlmResponse(content=types.Content(
+                    role='model', parts=[types.Part(text=f'Summary: {text[:200]}')]
+                ))
+            else:
+                yield LlmResponse(content=types.Content(role='model', parts=[types.Part(
+                    function_call=types.FunctionCall(
+                        name='balance_sheet_metrics', args={'ticker': last.text.split()[-1]}
+                    )
+                )]))
+
+    agent = LlmAgent(name='Balance_Sheet_Agent', model=ScriptedLlm(), tools=[balance_sheet_metrics])
+    agent_card = create_agent_card(os.environ['APP_URL'])
+    return build_statement_app(agent_card, agent, create_stores('sqlite', agent_card.name))
+
+
+def serve_fmp(port: int, periods: int) -> None:
+    body = fake_statement(BALANCE_SHEET_ITEMS, periods).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f'{url}/.well-known/agent-card.json')).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f'Agent server at {url} did not start')
+
+
+async def drive(url: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    failures = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(f'TICK{index % 50}')
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        await wait_until_ready(client, url)
+
+        async def worker() -> None:
+            nonlocal failures
+            while not queue.empty():
+                ticker = queue.get_nowait()
+                payload = {
+                    'jsonrpc': '2.0',
+                    'id': str(uuid.uuid4()),
+                    'method': 'message/send',
+                    'params': {'message': {
+                        'role': 'user',
+                        'messageId': str(uuid.uuid4()),
+                        'contextId': str(uuid.uuid4()),
+                        'parts': [{'kind': 'text', 'text': f'Analyse the balance sheet of {ticker}'}],
+                    }},
+                }
+                start = time.perf_counter()
+                response = await client.post(f'{url}/', json=payload)
+                result = response.json().get('result') or {}
+                if result.get('status', {}).get('state') == 'completed':
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'completed': len(latencies),
+        'failed': failures,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    fmp = multiprocessing.Process(target=serve_fmp, args=(FMP_PORT, args.periods), daemon=True)
+    fmp.start()
+    url = f'http://127.0.0.1:{AGENT_PORT}'
+    results = []
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as store_dir:
+                env = {
+                    **os.environ,
+                    'APP_URL': url,
+                    'AGENT_STORE_DIR': store_dir,
+                    'BENCH_MODEL_LATENCY': str(args.model_latency),
+                    'FMP_BASE_URL': f'http://127.0.0.1:{FMP_PORT}',
+                    'FMP_KEY': 'bench',
+                    'FMP_CACHE': 'FALSE',
+                    'FMP_HTTP2': 'FALSE',
+                    'FMP_RATE_LIMIT': '0',
+                    # Measure the agent runs themselves, not cached answers or queueing.
+                    'ANALYSIS_CACHE': 'FALSE',
+                    'AGENT_MAX_CONCURRENT': str(args.concurrency),
+                    'PYTHONPATH': os.pathsep.join(sys.path),
+                }
+                server = subprocess.Popen(
+                    [
+                        sys.executable, '-m', 'uvicorn', 'bench_agent_workers:create_app', '--factory',
+                        '--port', str(AGENT_PORT), '--workers', str(workers), '--log-level', 'warning',
+                    ],
+                    cwd=Path(__file__).resolve().parent,
+                    env=env,
+                )
+                try:
+                    result = asyncio.run(drive(url, args.requests, args.concurrency))
+                finally:
+                    server.terminate()
+                    server.wait()
+            results.append({'workers': workers, **result})
+    finally:
+        fmp.terminate()
+
+    baseline = results[0]['requests_per_second'] or 1
+    for result in results:
+        result['speedup'] = round(result['requests_per_second'] / baseline, 2)
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'model_latency_s': args.model_latency,
+        'periods': args.periods,
+        'cpu_count': os.cpu_count(),
+        'runs': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--model-latency', type=float, default=0.05, help='Seconds per scripted model call')
+    parser.add_argument('--periods', type=int, default=20)
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == '__main__':
+    main()
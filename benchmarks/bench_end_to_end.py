@@ -0,0 +1,496 @@
+"""End-to-end benchmark of the host and the three statement agents, fully offline.
+
+Starts a stub FMP server with realistic statement payloads, the three agent
+servers (in this process, each on its own port) and the host's RoutingAgent.
+Both the agents and the RoutingAgent run on a deterministic fake model behind
+the ADK `Gemini` interface: the agents call their metrics tool once and stream
+a short answer, the RoutingAgent fans one task out to every agent with
+`send_messages` and then summarises.
+
+Measures latency per stage (card discovery, A2A hop, tool fetch, model call,
+artifact conversion), end-to-end latency and throughput at increasing
+concurrency, and memory per session, and prints JSON (also written to
+`--output`) with the commit it ran on so regressions can be tracked.
+
+    python benchmarks/bench_end_to_end.py --concurrency 1 4 16 --requests 48 --output e2e.json
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import AsyncGenerator
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(ROOT / 'src' / 'host'))
+
+from bench_statement_tools import (  # noqa: E402
+    BALANCE_SHEET_ITEMS,
+    CASH_FLOW_ITEMS,
+    INCOME_STATEMENT_ITEMS,
+    fake_statement,
+)
+
+
+FMP_PORT = 19700
+AGENT_PORTS = (19701, 19702, 19703)
+
+# Everything offline and unthrottled; measure the full fetch path, not the caches.
+OFFLINE_ENV = {
+    'FMP_BASE_URL': f'http://127.0.0.1:{FMP_PORT}',
+    'FMP_KEY': 'offline',
+    'FMP_CACHE': 'FALSE',
+    'FMP_HTTP2': 'FALSE',
+    'FMP_RATE_LIMIT': '0',
+    'ANALYSIS_CACHE': 'FALSE',
+    'AGENT_MAX_CONCURRENT': '1000',
+    'AGENT_MAX_QUEUE': '1000',
+    'AGENT_STORE': 'memory',
+    'GOOGLE_API_KEY': 'offline',
+}
+
+# us-gaap concepts the as-reported cash flow statement uses for the standardised line items.
+AS_REPORTED_CASH_FLOW = {
+    'netIncome': 'NetIncomeLoss',
+    'depreciationAndAmortization': 'DepreciationDepletionAndAmortization',
+    'deferredIncomeTax': 'DeferredIncomeTaxExpenseBenefit',
+    'stockBasedCompensation': 'ShareBasedCompensation',
+    'accountsReceivables': 'IncreaseDecreaseInAccountsReceivable',
+    'inventory': 'IncreaseDecreaseInInventories',
+    'accountsPayables': 'IncreaseDecreaseInAccountsPayable',
+    'netCashProvidedByOperatingActivities': 'NetCashProvidedByUsedInOperatingActivities',
+    'investmentsInPropertyPlantAndEquipment': 'PaymentsToAcquirePropertyPlantAndEquipment',
+    'acquisitionsNet': 'PaymentsToAcquireBusinessesNetOfCashAcquired',
+    'netCashProvidedByInvestingActivities': 'NetCashProvidedByUsedInInvestingActivities',
+    'longTermNetDebtIssuance': 'ProceedsFromIssuanceOfLongTermDebt',
+    'commonStockRepurchased': 'PaymentsForRepurchaseOfCommonStock',
+    'commonDividendsPaid': 'PaymentsOfDividends',
+    'netCashProvidedByFinancingActivities': 'NetCashProvidedByUsedInFinancingActivities',
+    'netChangeInCash': (
+        'CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalents'
+        'PeriodIncreaseDecreaseIncludingExchangeRateEffect'
+    ),
+    'cashAtEndOfPeriod': 'CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalents',
+}
+
+
+def serve_fmp(port: int, periods: int) -> None:
+    """Stub FMP server answering every statement endpoint with `periods` years of data per symbol."""
+    payloads: dict[tuple[str, str], bytes] = {}
+
+    def payload(endpoint: str, symbol: str) -> bytes:
+        key = (endpoint, symbol)
+        if key not in payloads:
+            seed = sum(map(ord, symbol))
+            if endpoint == 'cash-flow-statement-as-reported':
+                rows = json.loads(fake_statement(CASH_FLOW_ITEMS, periods, seed))
+                # The as-reported endpoints nest lower case XBRL names under `data`.
+                rows = [
+                    {
+                        **{field: row[field] for field in ('date', 'fiscalYear', 'period')},
+                        'symbol': symbol,
+                        'data': {
+                            AS_REPORTED_CASH_FLOW.get(item, item).lower(): row[item] for item in CASH_FLOW_ITEMS
+                        },
+                    }
+                    for row in rows
+                ]
+            else:
+                items = BALANCE_SHEET_ITEMS if endpoint.startswith('balance') else INCOME_STATEMENT_ITEMS
+                rows = [{**row, 'symbol': symbol} for row in json.loads(fake_statement(items, periods, seed))]
+            payloads[key] = json.dumps(rows).encode()
+        return payloads[key]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            body = payload(url.path.strip('/'), query.get('symbol', ['AAPL'])[0].upper())
+            limit = int(query.get('limit', [0])[0])
+            if limit:
+                body = json.dumps(json.loads(body)[:limit]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), Handler).serve_forever()
+
+
+class Stages:
+    """Collects durations per stage, and start/end times per A2A context for the hop."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.sent: dict[str, float] = {}
+        self.processed: dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.durations[stage].append(seconds)
+
+    def hops(self) -> list[float]:
+        # Time on the wire and in the A2A layers: host send minus agent processing.
+        return [
+            self.sent[context_id] - self.processed[context_id]
+            for context_id in self.sent if context_id in self.processed
+        ]
+
+    def summary(self) -> dict:
+        stages = {**self.durations, 'a2a_hop': self.hops()}
+        return {stage: summarise(values) for stage, values in stages.items() if values}
+
+    def clear(self) -> None:
+        self.durations.clear()
+        self.sent.clear()
+        self.processed.clear()
+
+
+STAGES = Stages()
+
+
+def summarise(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p99_ms': round(ordered[math.ceil(len(ordered) * 0.99) - 1] * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def timed(stage: str, fn):
+    """Wraps an async function so every call records its duration under `stage`."""
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            STAGES.record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def timed_sync(stage: str, fn):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            STAGES.record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def build_fake_model(model_latency: float, chunks: int):
+    from google.adk.models.google_llm import Gemini
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+
+    class FakeGemini(Gemini):
+        """Deterministic stand-in for Gemini: scripted tool calls and canned, streamed answers."""
+
+        agent_names: list[str] = []
+
+        async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+            start = time.perf_counter()
+            await asyncio.sleep(model_latency)
+            last = llm_request.contents[-1].parts[0]
+            if last.function_response is None:
+                yield LlmResponse(content=types.Content(role='model', parts=[self._call(llm_request, last.text)]))
+            else:
+                text = self._answer(last.function_response)
+                if stream:
+                    size = max(1, len(text) // chunks)
+                    for index in range(0, len(text), size):
+                        yield LlmResponse(
+                            content=types.Content(role='model', parts=[types.Part(text=text[index:index + size])]),
+                            partial=True,
+                        )
+                yield LlmResponse(content=types.Content(role='model', parts=[types.Part(text=text)]))
+            STAGES.record('model_call', time.perf_counter() - start)
+
+        def _call(self, llm_request, text: str):
+            ticker = text.rstrip('.?!').split()[-1].upper()
+            if 'send_messages' in llm_request.tools_dict:
+                names = FakeGemini.agent_names
+                return types.Part(function_call=types.FunctionCall(name='send_messages', args={
+                    'agent_names': names,
+                    'tasks': [f'Analyse the {name.replace(" Agent", "")} of {ticker}' for name in names],
+                }))
+            # The metrics tool when the agent has one, otherwise its first tool.
+            tool = next(
+                (name for name in llm_request.tools_dict if name.endswith('_metrics')),
+                next(iter(llm_request.tools_dict)),
+            )
+            return types.Part(function_call=types.FunctionCall(name=tool, args={'ticker': ticker}))
+
+        @staticmethod
+        def _answer(function_response) -> str:
+            result = str(function_response.response.get('result'))
+            lines = result.splitlines()
+            return f'Summary of {len(lines)} lines: ' + ' / '.join(lines[:3])[:600]
+
+    return FakeGemini
+
+
+async def start_agents(fake_model) -> tuple[list, list[str]]:
+    """Starts the three statement agents on their own ports; returns the servers and their urls."""
+    import uvicorn
+
+    from balancesheet_agent import balance_sheet_agent
+    from cashflow_agent import cash_flow_agent
+    from incomestatement_agent import income_statement_agent
+    from common.agent_stores import create_stores
+    from common.statement_server import build_statement_app
+
+    modules = [
+        (balance_sheet_agent, balance_sheet_agent.create_balance_sheet_agent),
+        (cash_flow_agent, cash_flow_agent.create_cashflow_statement_agent),
+        (income_statement_agent, income_statement_agent.create_income_statement_agent),
+    ]
+    servers, urls = [], []
+    for (module, agent), port in zip(modules, AGENT_PORTS):
+        agent.model = fake_model(model='fake-statement-model')
+        url = f'http://127.0.0.1:{port}'
+        card = module.create_agent_card(url)
+        app = build_statement_app(card, agent, create_stores('memory', card.name))
+        server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+        servers.append((server, asyncio.create_task(server.serve())))
+        urls.append(url)
+    while not all(server.started for server, _ in servers):
+        await asyncio.sleep(0.05)
+    return servers, urls
+
+
+def instrument() -> None:
+    """Wraps the functions whose duration makes up the stages."""
+    from a2a.server.tasks import TaskUpdater
+
+    import routing_agent
+    from common import fmp_client, statement_executor
+
+    fmp_client.FMPClient.get_statement_frame = timed('tool_fetch', fmp_client.FMPClient.get_statement_frame)
+    statement_executor.convert_genai_part_to_a2a = timed_sync(
+        'artifact_conversion', statement_executor.convert_genai_part_to_a2a
+    )
+    TaskUpdater.add_artifact = timed('artifact_publish', TaskUpdater.add_artifact)
+
+    send_task = routing_agent.RoutingAgent._send_task
+
+    async def timed_send_task(self, agent_name, task, task_id, context_id, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await send_task(self, agent_name, task, task_id, context_id, *args, **kwargs)
+        finally:
+            STAGES.sent[context_id] = time.perf_counter() - start
+    routing_agent.RoutingAgent._send_task = timed_send_task
+
+    process_request = statement_executor.StatementExecutor._process_request
+
+    async def timed_process_request(self, new_message, session_id, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await process_request(self, new_message, session_id, *args, **kwargs)
+        finally:
+            STAGES.processed[session_id] = time.perf_counter() - start
+    statement_executor.StatementExecutor._process_request = timed_process_request
+
+
+async def measure_discovery(urls: list[str], repeats: int) -> dict:
+    from routing_agent import RoutingAgent
+
+    durations = []
+    for _ in range(repeats):
+        routing = RoutingAgent()
+        start = time.perf_counter()
+        await routing.discover_agents(urls)
+        durations.append(time.perf_counter() - start)
+        await routing.aclose()
+    return summarise(durations)
+
+
+async def ask(runner, text: str) -> float:
+    """Sends one user message to the routing agent in a new session; returns the latency."""
+    from google.genai import types
+
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id='bench')
+    start = time.perf_counter()
+    final = None
+    async for event in runner.run_async(
+            user_id='bench',
+            session_id=session.id,
+            new_message=types.UserContent(parts=[types.Part(text=text)]),
+    ):
+        if event.is_final_response():
+            final = event
+    if final is None or not final.content or not final.content.parts[0].text.startswith('Summary'):
+        raise RuntimeError(f'Unexpected final response: {final}')
+    return time.perf_counter() - start
+
+
+async def measure_throughput(runner, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    failures = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(f'Analyse the financials of TICK{index}')
+
+    async def worker() -> None:
+        nonlocal failures
+        while not queue.empty():
+            text = queue.get_nowait()
+            try:
+                latencies.append(await ask(runner, text))
+            except Exception as e:
+                failures += 1
+                print(f'Request failed: {e!r}', file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'failed': failures,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 2),
+        'latency': summarise(latencies) if latencies else None,
+    }
+
+
+async def measure_memory(runner, sessions: int) -> dict:
+    """Python heap growth per host request, including the agent sessions it creates."""
+    from common.metrics import collect_metrics
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index in range(sessions):
+        await ask(runner, f'Analyse the financials of MEM{index}')
+    gc.collect()
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    agent_sessions = {}
+    for name, stats in collect_metrics().items():
+        if name.startswith('sessions/') and stats.get('resident_sessions'):
+            agent_sessions[name.split('/', 1)[1]] = round(stats['resident_bytes'] / stats['resident_sessions'])
+    return {
+        'sessions': sessions,
+        'heap_bytes_per_request': round(grown / sessions),
+        'agent_session_bytes': agent_sessions,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from remote_agent_connection import aclose_http_pool
+    from routing_agent import RoutingAgent
+
+    # The host and ADK modules log every event; keep the output to the result.
+    logging.basicConfig(level=logging.WARNING, force=True)
+    instrument()
+    logging.getLogger('common.statement_executor').setLevel(logging.WARNING)
+    fake_model = build_fake_model(args.model_latency, args.chunks)
+    servers, urls = await start_agents(fake_model)
+    try:
+        discovery = await measure_discovery(urls, args.discovery_repeats)
+
+        routing = RoutingAgent()
+        await routing.discover_agents(urls)
+        fake_model.agent_names = list(routing.cards)
+        agent = routing.create_agent()
+        agent.model = fake_model(model='fake-routing-model')
+        runner = Runner(app_name='routing_bench', agent=agent, session_service=InMemorySessionService())
+
+        await measure_throughput(runner, 4, 2)  # warm up connections and lazy imports
+        STAGES.clear()
+        throughput = []
+        for concurrency in args.concurrency:
+            throughput.append(await measure_throughput(runner, args.requests, concurrency))
+        stages = STAGES.summary()
+        memory = await measure_memory(runner, args.memory_sessions)
+        await routing.aclose()
+    finally:
+        for server, task in servers:
+            server.should_exit = True
+        await asyncio.gather(*(task for _, task in servers))
+        await aclose_http_pool()
+
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {
+            'model_latency_s': args.model_latency,
+            'chunks': args.chunks,
+            'periods': args.periods,
+            'requests': args.requests,
+        },
+        'card_discovery': discovery,
+        'stages': stages,
+        'throughput': throughput,
+        'memory': memory,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=48, help='Host requests per concurrency level')
+    parser.add_argument('--model-latency', type=float, default=0.0, help='Seconds per fake model call')
+    parser.add_argument('--chunks', type=int, default=4, help='Streamed chunks per fake answer')
+    parser.add_argument('--periods', type=int, default=10, help='Years of data per stub statement')
+    parser.add_argument('--discovery-repeats', type=int, default=5)
+    parser.add_argument('--memory-sessions', type=int, default=20)
+    parser.add_argument('--output', help='Also write the JSON result to this file')
+    args = parser.parse_args()
+
+    os.environ.update(OFFLINE_ENV)
+    fmp = multiprocessing.Process(target=serve_fmp, args=(FMP_PORT, args.periods), daemon=True)
+    fmp.start()
+    try:
+        # stdout is reserved for the JSON result; the host prints every card it resolves.
+        with contextlib.redirect_stdout(sys.stderr):
+            result = asyncio.run(run(args))
+    finally:
+        fmp.terminate()
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Host startup time with N stub agent servers.
+
+Starts N local HTTP servers answering `/.well-known/agent-card.json` after a
+configurable delay (plus optional slow agents that exceed the discovery timeout)
+and compares the old one-after-another card resolution with the concurrent
+`RoutingAgent` discovery.
+
+    python benchmarks/bench_host_startup.py --agents 10 --delay 0.2 --slow 1 --slow-delay 30
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src' / 'host'))
+
+from a2a.client import A2ACardResolver  # noqa: E402
+from a2a.types import AgentCapabilities, AgentCard  # noqa: E402
+
+from remote_agent_connection import aclose_http_pool, get_http_pool  # noqa: E402
+from routing_agent import RoutingAgent  # noqa: E402
+
+
+BASE_PORT = 19100
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def card_json(index: int, port: int) -> bytes:
+    card = AgentCard(
+        name=f'Stub Agent {index}',
+        description='Stub agent for the startup benchmark',
+        url=f'http://127.0.0.1:{port}',
+        version='1.0.0',
+        default_input_modes=['text'],
+        default_output_modes=['text'],
+        capabilities=AgentCapabilities(streaming=True),
+        skills=[],
+    )
+    return card.model_dump_json(exclude_none=True).encode()
+
+
+async def start_stub_agent(index: int, port: int, delay: float) -> asyncio.Server:
+    body = card_json(index, port)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await reader.readuntil(b'\r\n\r\n')
+                if not request:
+                    break
+                await asyncio.sleep(delay)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(body)}\r\n\r\n'.encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Slow agents are still sleeping when the benchmark shuts the servers down.
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', port)
+
+
+async def sequential_discovery(addresses: list[str], timeout: float) -> int:
+    """The previous behaviour: resolve one card after the other."""
+    found = 0
+    for address in addresses:
+        try:
+            await asyncio.wait_for(
+                A2ACardResolver(get_http_pool().client, address).get_agent_card(), timeout
+            )
+            found += 1
+        except Exception:
+            pass
+    return found
+
+
+async def run(args: argparse.Namespace) -> dict:
+    servers = []
+    addresses = []
+    for index in range(args.agents + args.slow):
+        port = BASE_PORT + index
+        delay = args.slow_delay if index >= args.agents else args.delay
+        servers.append(await start_stub_agent(index, port, delay))
+        addresses.append(f'http://127.0.0.1:{port}')
+
+    try:
+        start = time.perf_counter()
+        sequential_found = await sequential_discovery(addresses, args.timeout)
+        sequential_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        routing_agent = RoutingAgent()
+        routing_agent.registry.discovery_timeout = args.timeout
+        await routing_agent.discover_agents(addresses)
+        concurrent_s = time.perf_counter() - start
+        concurrent_found = len(routing_agent.cards)
+        await routing_agent.aclose()
+    finally:
+        await aclose_http_pool()
+        for server in servers:
+            server.close()
+
+    return {
+        'agents': args.agents,
+        'slow_agents': args.slow,
+        'card_delay_s': args.delay,
+        'discovery_timeout_s': args.timeout,
+        'sequential': {'seconds': round(sequential_s, 3), 'agents_found': sequential_found},
+        'concurrent': {'seconds': round(concurrent_s, 3), 'agents_found': concurrent_found},
+        'speedup': round(sequential_s / concurrent_s, 2) if concurrent_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=10, help='Number of responsive stub agents')
+    parser.add_argument('--delay', type=float, default=0.2, help='Card response delay of the responsive agents')
+    parser.add_argument('--slow', type=int, default=1, help='Number of agents slower than the discovery timeout')
+    parser.add_argument('--slow-delay', type=float, default=30.0)
+    parser.add_argument('--timeout', type=float, default=2.0, help='Per agent discovery timeout')
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == '__main__':
+    main()
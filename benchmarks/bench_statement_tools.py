@@ -0,0 +1,248 @@
+"""Compares the statement tools before and after the columnar/analytics stage, end to end.
+
+"Before" is the original tool, handing the raw FMP JSON to the model; "after"
+is the agent's current statement tool, returning the rendered StatementFrame,
+plus its metrics tool. Both run against the stub FMP server of
+`bench_end_to_end.py`, without the statement cache, so every call includes
+the HTTP fetch.
+
+Reports the payload size and an approximate token count (4 characters per
+token), the measured tool latency, and the measured latency of a whole
+analysis: an ADK agent with the tool, on the deterministic fake model of
+`bench_end_to_end.py`, calling it once and answering from its result. The
+fake model takes the same time whatever the prompt, so the analysis latency
+leaves out the model's prompt processing, which grows with the token counts.
+
+    python benchmarks/bench_statement_tools.py --periods 20 --iterations 50
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+
+
+CHARS_PER_TOKEN = 4
+
+INCOME_STATEMENT_ITEMS = [
+    'revenue', 'costOfRevenue', 'grossProfit', 'researchAndDevelopmentExpenses',
+    'generalAndAdministrativeExpenses', 'sellingAndMarketingExpenses',
+    'sellingGeneralAndAdministrativeExpenses', 'otherExpenses', 'operatingExpenses',
+    'costAndExpenses', 'netInterestIncome', 'interestIncome', 'interestExpense',
+    'depreciationAndAmortization', 'ebitda', 'ebit', 'nonOperatingIncomeExcludingInterest',
+    'operatingIncome', 'totalOtherIncomeExpensesNet', 'incomeBeforeTax', 'incomeTaxExpense',
+    'netIncomeFromContinuingOperations', 'netIncomeFromDiscontinuedOperations',
+    'otherAdjustmentsToNetIncome', 'netIncome', 'netIncomeDeductions', 'bottomLineNetIncome',
+    'eps', 'epsDiluted', 'weightedAverageShsOut', 'weightedAverageShsOutDil',
+]
+BALANCE_SHEET_ITEMS = [
+    'cashAndCashEquivalents', 'shortTermInvestments', 'cashAndShortTermInvestments',
+    'netReceivables', 'accountsReceivables', 'otherReceivables', 'inventory', 'prepaids',
+    'otherCurrentAssets', 'totalCurrentAssets', 'propertyPlantEquipmentNet', 'goodwill',
+    'intangibleAssets', 'goodwillAndIntangibleAssets', 'longTermInvestments', 'taxAssets',
+    'otherNonCurrentAssets', 'totalNonCurrentAssets', 'otherAssets', 'totalAssets',
+    'totalPayables', 'accountPayables', 'otherPayables', 'accruedExpenses', 'shortTermDebt',
+    'capitalLeaseObligationsCurrent', 'taxPayables', 'deferredRevenue',
+    'otherCurrentLiabilities', 'totalCurrentLiabilities', 'longTermDebt',
+    'deferredRevenueNonCurrent', 'deferredTaxLiabilitiesNonCurrent',
+    'otherNonCurrentLiabilities', 'totalNonCurrentLiabilities', 'otherLiabilities',
+    'capitalLeaseObligations', 'totalLiabilities', 'treasuryStock', 'preferredStock',
+    'commonStock', 'retainedEarnings', 'additionalPaidInCapital',
+    'accumulatedOtherComprehensiveIncomeLoss', 'otherTotalStockholdersEquity',
+    'totalStockholdersEquity', 'totalEquity', 'minorityInterest',
+    'totalLiabilitiesAndTotalEquity', 'totalInvestments', 'totalDebt', 'netDebt',
+]
+CASH_FLOW_ITEMS = [
+    'netIncome', 'depreciationAndAmortization', 'deferredIncomeTax', 'stockBasedCompensation',
+    'changeInWorkingCapital', 'accountsReceivables', 'inventory', 'accountsPayables',
+    'otherWorkingCapital', 'otherNonCashItems', 'netCashProvidedByOperatingActivities',
+    'investmentsInPropertyPlantAndEquipment', 'acquisitionsNet', 'purchasesOfInvestments',
+    'salesMaturitiesOfInvestments', 'otherInvestingActivities',
+    'netCashProvidedByInvestingActivities', 'netDebtIssuance', 'longTermNetDebtIssuance',
+    'shortTermNetDebtIssuance', 'netStockIssuance', 'commonStockIssuance',
+    'commonStockRepurchased', 'netDividendsPaid', 'commonDividendsPaid',
+    'otherFinancingActivities', 'netCashProvidedByFinancingActivities', 'netChangeInCash',
+    'cashAtEndOfPeriod', 'cashAtBeginningOfPeriod', 'operatingCashFlow', 'capitalExpenditure',
+    'freeCashFlow',
+]
+
+# Statement endpoint, agent module, agent, statement tool and metrics tool.
+STATEMENTS = {
+    'income-statement': (
+        'incomestatement_agent.income_statement_agent', 'create_income_statement_agent',
+        'fmp_income_statement', 'income_statement_metrics',
+    ),
+    'balance-sheet-statement': (
+        'balancesheet_agent.balance_sheet_agent', 'create_balance_sheet_agent',
+        'fmp_balance_sheet', 'balance_sheet_metrics',
+    ),
+    'cash-flow-statement-as-reported': (
+        'cashflow_agent.cash_flow_agent', 'create_cashflow_statement_agent',
+        'fmp_cashflow_statement', 'cashflow_statement_metrics',
+    ),
+}
+
+
+def fake_statement(items: list[str], periods: int, seed: int = 7) -> str:
+    """Builds an FMP shaped statement response with `periods` annual rows, newest first."""
+    rng = random.Random(seed)
+    base = {item: rng.uniform(1e8, 5e10) for item in items}
+    rows = []
+    for index in range(periods):
+        year = 2024 - index
+        row = {
+            'date': f'{year}-09-30',
+            'symbol': 'AAPL',
+            'reportedCurrency': 'USD',
+            'cik': '0000320193',
+            'filingDate': f'{year}-11-01',
+            'acceptedDate': f'{year}-11-01 06:01:36',
+            'fiscalYear': str(year),
+            'period': 'FY',
+        }
+        for item in items:
+            row[item] = round(base[item] * (1 + rng.uniform(-0.15, 0.25)) ** (periods - index))
+        row['link'] = f'https://www.sec.gov/Archives/edgar/data/320193/{year}-index.htm'
+        row['finalLink'] = f'https://www.sec.gov/Archives/edgar/data/320193/{year}.htm'
+        rows.append(row)
+    return json.dumps(rows, indent=2)
+
+
+async def timed(fn, iterations: int) -> float:
+    """Median milliseconds of `iterations` awaited calls, after one warm-up call."""
+    await fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def raw_tool(endpoint: str):
+    """The tool as it was before the analytics stage: the raw FMP JSON."""
+    from common.fmp_client import get_fmp_client
+
+    async def fmp_statement(ticker: str) -> Optional[str]:
+        """Hits the FMP API to retrieve the statement for the company with the given ticker.
+
+        Args:
+            ticker: The ticker of the company we want to access the statement of
+
+        Returns:
+            A formatted string with search results, or None if no results.
+        """
+        return await get_fmp_client().get_statement(endpoint, ticker)
+    return fmp_statement
+
+
+def analysis(agent):
+    """Returns a coroutine function running one analysis with `agent` in a new session."""
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    runner = InMemoryRunner(agent=agent, app_name='bench')
+
+    async def run() -> None:
+        session = await runner.session_service.create_session(app_name='bench', user_id='bench')
+        final = None
+        async for event in runner.run_async(
+                user_id='bench',
+                session_id=session.id,
+                new_message=types.UserContent(parts=[types.Part(text='Analyse AAPL')]),
+        ):
+            if event.is_final_response():
+                final = event
+        if final is None or not final.content or not final.content.parts[0].text.startswith('Summary'):
+            raise RuntimeError(f'Unexpected final response: {final}')
+    return run
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import importlib
+
+    from google.adk.agents import LlmAgent
+
+    from bench_end_to_end import build_fake_model
+    from common.fmp_client import aclose_fmp_client
+
+    logging.basicConfig(level=logging.WARNING, force=True)
+    fake_model = build_fake_model(args.model_latency, chunks=1)
+    results = {}
+    try:
+        for endpoint, (module_name, agent_name, statement_name, metrics_name) in STATEMENTS.items():
+            module = importlib.import_module(module_name)
+            agent = getattr(module, agent_name)
+            before_tool = raw_tool(endpoint)
+            after_tool = getattr(module, statement_name)
+            metrics_tool = getattr(module, metrics_name)
+
+            before = await before_tool('AAPL')
+            after = await after_tool('AAPL')
+            metrics = await metrics_tool('AAPL')
+            before_tokens = len(before) // CHARS_PER_TOKEN
+            after_tokens = len(after) // CHARS_PER_TOKEN
+
+            def variant(name: str, tool) -> LlmAgent:
+                return LlmAgent(
+                    model=fake_model(model='fake-statement-model'),
+                    name=f'{agent.name}_{name}',
+                    instruction=agent.instruction,
+                    tools=[tool],
+                )
+
+            results[endpoint] = {
+                'before_chars': len(before),
+                'after_chars': len(after),
+                'metrics_chars': len(metrics),
+                'before_tokens': before_tokens,
+                'after_tokens': after_tokens,
+                'token_reduction': round(1 - after_tokens / before_tokens, 3),
+                'tool_ms_before': round(await timed(lambda: before_tool('AAPL'), args.iterations), 3),
+                'tool_ms_after': round(await timed(lambda: after_tool('AAPL'), args.iterations), 3),
+                'tool_ms_metrics': round(await timed(lambda: metrics_tool('AAPL'), args.iterations), 3),
+                'analysis_ms_before': round(
+                    await timed(analysis(variant('before', before_tool)), args.analyses), 3
+                ),
+                'analysis_ms_after': round(await timed(analysis(variant('after', after_tool)), args.analyses), 3),
+            }
+    finally:
+        await aclose_fmp_client()
+    return results
+
+
+def main():
+    from bench_end_to_end import FMP_PORT, OFFLINE_ENV, serve_fmp
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--periods', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=50, help='Calls per tool')
+    parser.add_argument('--analyses', type=int, default=20, help='Whole analyses per variant')
+    parser.add_argument('--model-latency', type=float, default=0.0, help='Seconds per fake model call')
+    args = parser.parse_args()
+
+    os.environ.update(OFFLINE_ENV)
+    fmp = multiprocessing.Process(target=serve_fmp, args=(FMP_PORT, args.periods), daemon=True)
+    fmp.start()
+    try:
+        # stdout is reserved for the JSON result.
+        with contextlib.redirect_stdout(sys.stderr):
+            results = asyncio.run(run(args))
+    finally:
+        fmp.terminate()
+    print(json.dumps({'periods': args.periods, 'statements': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
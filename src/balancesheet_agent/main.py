@@ -1,25 +1,24 @@
 import logging
 import os
+import sys
+from pathlib import Path
+
+# Make the shared `common` package importable when started from the agent directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 import click
-import uvicorn
 
-from a2a.server.apps import A2AStarletteApplication
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import (
-    AgentCapabilities,
-    AgentCard,
-    AgentSkill,
-)
 from dotenv import load_dotenv
-from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from balance_sheet_executor import BalancesheetExecutor
-
-from balance_sheet_agent import create_balance_sheet_agent
+from starlette.applications import Starlette
+from common.agent_stores import STORE_BACKENDS, create_stores
+from common.statement_server import (
+    build_statement_app,
+    check_google_api_key,
+    configure_server,
+    run_server,
+)
+from common.tracing import configure_tracing
+from balance_sheet_agent import create_agent_card, create_balance_sheet_agent
 
 load_dotenv()
 
@@ -29,59 +28,40 @@ DEFAULT_HOST = '0.0.0.0'
 DEFAULT_PORT = 10003
 
 
-def main(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
-    # Verify an API key is set.
-    # Not required if using Vertex AI APIs.
-    if os.getenv('GOOGLE_GENAI_USE_VERTEXAI') != 'TRUE' and not os.getenv(
-            'GOOGLE_API_KEY'
-    ):
-        raise ValueError(
-            'GOOGLE_API_KEY environment variable not set and '
-            'GOOGLE_GENAI_USE_VERTEXAI is not TRUE.'
-        )
+def create_app() -> Starlette:
+    """App factory, configured from the environment so every worker process can call it."""
+    configure_tracing('balance-sheet-agent')
+    agent_card = create_agent_card(os.environ['APP_URL'])
+    stores = create_stores(os.getenv('AGENT_STORE'), agent_card.name)
+    return build_statement_app(agent_card, create_balance_sheet_agent, stores)
+
 
-    skill = AgentSkill(
-        id='balancesheet_search',
-        name='Balance Sheet Analysis',
-        description='It analyses balance sheet of a company across time',
-        tags=['balance sheet', 'financial analysis'],
-        examples=['Analyse the balance sheet data for NVIDIA'],
-    )
-    app_url = os.environ.get('APP_URL', f'http://{host}:{port}')
-    agent_card = AgentCard(
-        name='Balance Sheet Agent',
-        description='Helps with Performing a Detailed analyses of balance sheet data across time for companies',
-        url=app_url,
-        version='1.0.0',
-        default_input_modes=['text'],
-        default_output_modes=['text'],
-        capabilities=AgentCapabilities(streaming=True),
-        skills=[skill],
-    )
-    adk_agent = create_balance_sheet_agent
-    runner = Runner(
-        app_name=agent_card.name,
-        agent=adk_agent,
-        artifact_service=InMemoryArtifactService(),
-        session_service=InMemorySessionService(),
-        memory_service=InMemoryMemoryService(),
-    )
-    agent_executor = BalancesheetExecutor(runner, agent_card)
-    request_handler = DefaultRequestHandler(
-        agent_executor=agent_executor,
-        task_store=InMemoryTaskStore()
-    )
-    a2a_app = A2AStarletteApplication(
-        agent_card=agent_card, http_handler=request_handler
-    )
-    uvicorn.run(a2a_app.build(), host=host, port=port)
+def main(
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        store: str | None = None,
+        store_path: str | None = None,
+        workers: int = 1,
+):
+    check_google_api_key()
+    configure_server(host, port, store, store_path, workers)
+    run_server('main:create_app', create_app, host, port, workers)
 
 @click.command()
 @click.option('--host', 'host', default=DEFAULT_HOST)
 @click.option('--port', 'port', default=DEFAULT_PORT)
-def cli(host: str, port: int):
-    main(host, port)
+@click.option(
+    '--store',
+    'store',
+    type=click.Choice(STORE_BACKENDS),
+    default=None,
+    help='Where tasks and sessions are kept; sqlite survives restarts and is shared by workers.',
+)
+@click.option('--store-path', 'store_path', default=None, help='SQLite database file.')
+@click.option('--workers', 'workers', default=1, help='Worker processes sharing the port.')
+def cli(host: str, port: int, store: str | None, store_path: str | None, workers: int):
+    main(host, port, store, store_path, workers)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
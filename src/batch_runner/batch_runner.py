@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+from a2a.client import A2ACardResolver, A2AClient
+from a2a.client.errors import A2AClientError
+from a2a.types import (
+    JSONRPCErrorResponse,
+    MessageSendParams,
+    SendMessageRequest,
+    Task,
+    TaskState,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+BATCH_USER_ID = 'batch-runner'
+
+
+@dataclass(frozen=True)
+class StatementAgent:
+    """The A2A agent analysing one kind of statement."""
+
+    url_env: str
+    default_url: str
+    task: str
+
+    @property
+    def url(self) -> str:
+        return os.getenv(self.url_env, self.default_url)
+
+
+# The same agent urls as the host, see `host/routing_agent.remote_agent_addresses`.
+STATEMENT_AGENTS: Dict[str, StatementAgent] = {
+    'balance-sheet': StatementAgent(
+        'SEA_AGENT_URL', 'http://localhost:10003', 'Analyse the {period} balance sheet of {ticker}'
+    ),
+    'cash-flow': StatementAgent(
+        'WEA_AGENT_URL', 'http://localhost:10001', 'Analyse the {period} cash flow statement of {ticker}'
+    ),
+    'income-statement': StatementAgent(
+        'AIR_AGENT_URL', 'http://localhost:10002', 'Analyse the {period} income statement of {ticker}'
+    ),
+}
+
+
+@dataclass
+class TaskResult:
+    ticker: str
+    statement: str
+    period: str
+    state: str
+    latency: float
+    attempts: int
+    error: Optional[str] = None
+    path: Optional[str] = None
+    finished_at: float = field(default_factory=time.time)
+
+
+def read_watchlist(path: str | Path) -> List[str]:
+    """Reads one ticker per line (or comma separated), ignoring blank lines and `#` comments."""
+    tickers: Dict[str, None] = {}
+    for line in Path(path).read_text().splitlines():
+        line = line.split('#', 1)[0]
+        for ticker in line.replace(',', ' ').split():
+            tickers.setdefault(ticker.upper())
+    return list(tickers)
+
+
+class Checkpoint:
+    """Append-only JSON lines log of finished tasks, so an interrupted run can resume.
+
+    Every finished task is flushed to disk as soon as it is known; a line cut
+    short by a crash is ignored on the next start. Tasks are keyed by ticker,
+    statement and period, so an annual run never skips quarterly tasks.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed: Set[Tuple[str, str, str]] = set()
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                # Lines without a period were written before it was recorded; those tasks run again.
+                if record.get('state') == TaskState.completed.value and 'period' in record:
+                    self.completed.add((record['ticker'], record['statement'], record['period']))
+        self._file = path.open('a', encoding='utf-8')
+
+    def record(self, result: TaskResult) -> None:
+        self._file.write(json.dumps(asdict(result)) + '\n')
+        self._file.flush()
+        if result.state == TaskState.completed.value:
+            self.completed.add((result.ticker, result.statement, result.period))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BatchRunner:
+    """Sends ticker x statement analysis tasks to the statement agents.
+
+    At most `concurrency` tasks are in flight. Tasks are sent with the `batch`
+    priority, so interactive users of the same agents go first. A task the
+    agent rejected because it was at capacity, or that failed to reach the
+    agent, is retried up to `max_attempts` times. Every answer is written to
+    `<output>/<statement>/<period>/<TICKER>.md` as it arrives and recorded in
+    the checkpoint; tasks already completed in an earlier run are skipped. A
+    task that fails unexpectedly is recorded as failed without stopping the
+    others.
+    """
+
+    def __init__(
+            self,
+            output_dir: str | Path,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            timeout: float = DEFAULT_TIMEOUT,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+            period: str = 'annual',
+    ):
+        self.output_dir = Path(output_dir)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.period = period
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint = Checkpoint(self.output_dir / 'checkpoint.jsonl')
+
+    async def run(self, tickers: Iterable[str], statements: Iterable[str]) -> Dict[str, Any]:
+        """Runs every task not completed yet and returns the report, also saved as report.json."""
+        tasks = [(ticker, statement) for ticker in tickers for statement in statements]
+        pending = [
+            (ticker, statement) for ticker, statement in tasks
+            if (ticker, statement, self.period) not in self.checkpoint.completed
+        ]
+        logger.info(f'{len(pending)} of {len(tasks)} tasks to run, {self.concurrency} at a time')
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in pending:
+            queue.put_nowait(task)
+        results: List[TaskResult] = []
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=self.timeout) as http_client:
+            clients = await self._connect(http_client, {statement for _, statement in pending})
+
+            async def worker() -> None:
+                while not queue.empty():
+                    ticker, statement = queue.get_nowait()
+                    try:
+                        result = await self._run_task(clients.get(statement), ticker, statement)
+                    except Exception as e:
+                        logger.exception(f'{ticker} {statement} failed')
+                        result = TaskResult(ticker, statement, self.period, TaskState.failed.value, 0.0, 0, repr(e))
+                    self.checkpoint.record(result)
+                    results.append(result)
+                    logger.info(
+                        f'[{len(results)}/{len(pending)}] {ticker} {statement}: {result.state} '
+                        f'in {result.latency:.1f}s'
+                    )
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            finally:
+                self.checkpoint.close()
+
+        report = self._report(results, time.perf_counter() - start, len(tasks) - len(pending))
+        (self.output_dir / 'report.json').write_text(json.dumps(report, indent=2))
+        return report
+
+    async def _connect(self, http_client: httpx.AsyncClient, statements: Set[str]) -> Dict[str, A2AClient]:
+        clients = {}
+        for statement in sorted(statements):
+            agent = STATEMENT_AGENTS[statement]
+            try:
+                card = await A2ACardResolver(http_client, agent.url).get_agent_card()
+            except Exception as e:
+                # Its tasks fail and are retried on the next run.
+                logger.error(f'Agent for {statement} at {agent.url} is unavailable: {e!r}')
+                continue
+            # The configured url, not the one the card advertises, as in `RemoteAgentConnections`.
+            clients[statement] = A2AClient(http_client, agent_card=card, url=agent.url)
+        return clients
+
+    async def _run_task(self, client: Optional[A2AClient], ticker: str, statement: str) -> TaskResult:
+        start = time.perf_counter()
+        error = 'agent unavailable'
+        attempt = 0
+        while client is not None and attempt < self.max_attempts:
+            attempt += 1
+            try:
+                task = await self._send(client, STATEMENT_AGENTS[statement].task.format(
+                    ticker=ticker, period=self.period
+                ))
+            except (httpx.HTTPError, A2AClientError, RuntimeError) as e:
+                error = repr(e)
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+
+            state = task.status.state
+            if state == TaskState.completed:
+                path = self._save(ticker, statement, task)
+                return TaskResult(
+                    ticker, statement, self.period, state.value, time.perf_counter() - start, attempt,
+                    path=str(path),
+                )
+            error = _status_text(task) or f'task ended in state {state.value}'
+            if state != TaskState.rejected:
+                break
+            if attempt < self.max_attempts:
+                # The agent is at capacity; come back when it expects to have room.
+                await asyncio.sleep(_retry_after(task))
+        return TaskResult(
+            ticker, statement, self.period, TaskState.failed.value, time.perf_counter() - start, attempt,
+            error=error,
+        )
+
+    async def _send(self, client: A2AClient, text: str) -> Task:
+        message_id = str(uuid.uuid4())
+        request = SendMessageRequest(id=message_id, params=MessageSendParams.model_validate({
+            'message': {
+                'role': 'user',
+                'parts': [{'type': 'text', 'text': text}],
+                'messageId': message_id,
+                'contextId': str(uuid.uuid4()),
+                'metadata': {'user_id': BATCH_USER_ID, 'priority': 'batch'},
+            },
+        }))
+        response = await client.send_message(request)
+        if isinstance(response.root, JSONRPCErrorResponse):
+            raise RuntimeError(response.root.error.message)
+        if not isinstance(response.root.result, Task):
+            raise RuntimeError('The agent did not return a task')
+        return response.root.result
+
+    def _save(self, ticker: str, statement: str, task: Task) -> Path:
+        text = '\n\n'.join(
+            part.root.text
+            for artifact in task.artifacts or []
+            for part in artifact.parts
+            if getattr(part.root, 'text', None)
+        )
+        path = self.output_dir / statement / self.period / f'{ticker}.md'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name so an interrupted run never leaves half a file.
+        partial = path.with_suffix('.md.partial')
+        partial.write_text(text, encoding='utf-8')
+        os.replace(partial, path)
+        return path
+
+    def _report(self, results: List[TaskResult], elapsed: float, skipped: int) -> Dict[str, Any]:
+        completed = sorted(result.latency for result in results if result.state == TaskState.completed.value)
+        failures = [
+            {'ticker': result.ticker, 'statement': result.statement, 'period': result.period, 'error': result.error}
+            for result in results if result.state != TaskState.completed.value
+        ]
+        return {
+            'tasks': len(results) + skipped,
+            'completed': len(completed),
+            'failed': len(failures),
+            'skipped': skipped,
+            'seconds': round(elapsed, 2),
+            'tasks_per_minute': round(len(completed) / elapsed * 60, 2) if elapsed else 0.0,
+            'latency_p50_s': round(statistics.median(completed), 2) if completed else None,
+            'latency_p99_s': round(completed[int((len(completed) - 1) * 0.99)], 2) if completed else None,
+            'failures': failures,
+        }
+
+
+def _status_text(task: Task) -> Optional[str]:
+    message = task.status.message
+    if message is None or not message.parts:
+        return None
+    return getattr(message.parts[0].root, 'text', None)
+
+
+def _retry_after(task: Task) -> float:
+    """Seconds the agent asked to wait before retrying a rejected task."""
+    message = task.status.message
+    metadata = (message.metadata if message else None) or {}
+    return float(metadata.get('retry_after', 1.0))
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import logging
+
+import click
+
+from dotenv import load_dotenv
+
+from batch_runner import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_TIMEOUT,
+    STATEMENT_AGENTS,
+    BatchRunner,
+    read_watchlist,
+)
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main(
+        watchlist: str,
+        output_dir: str,
+        statements: tuple[str, ...] = tuple(STATEMENT_AGENTS),
+        concurrency: int = DEFAULT_CONCURRENCY,
+        period: str = 'annual',
+        timeout: float = DEFAULT_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+):
+    runner = BatchRunner(output_dir, concurrency, timeout, max_attempts, period)
+    report = asyncio.run(runner.run(read_watchlist(watchlist), statements or tuple(STATEMENT_AGENTS)))
+    print(json.dumps(report, indent=2))
+
+
+@click.command()
+@click.argument('watchlist', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output-dir', 'output_dir', default='batch_results', help='Results, checkpoint and report.')
+@click.option(
+    '--statement',
+    'statements',
+    type=click.Choice(list(STATEMENT_AGENTS)),
+    multiple=True,
+    help='Statements to analyse per ticker; all of them by default.',
+)
+@click.option('--concurrency', 'concurrency', default=DEFAULT_CONCURRENCY, help='Tasks in flight at once.')
+@click.option('--period', 'period', type=click.Choice(['annual', 'quarter']), default='annual')
+@click.option('--timeout', 'timeout', default=DEFAULT_TIMEOUT, help='Seconds to wait for one analysis.')
+@click.option('--max-attempts', 'max_attempts', default=DEFAULT_MAX_ATTEMPTS, help='Attempts per task.')
+def cli(
+        watchlist: str,
+        output_dir: str,
+        statements: tuple[str, ...],
+        concurrency: int,
+        period: str,
+        timeout: float,
+        max_attempts: int,
+):
+    """Analyses every ticker of the WATCHLIST file with the statement agents.
+
+    Run it again with the same output directory to resume an interrupted run.
+    """
+    main(watchlist, output_dir, statements, concurrency, period, timeout, max_attempts)
+
+
+if __name__ == '__main__':
+    cli()
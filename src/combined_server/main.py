@@ -0,0 +1,118 @@
+import logging
+import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+# Make the shared `common` package and the agent packages importable when started from this directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import click
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.routing import Mount, Route
+
+from balancesheet_agent.balance_sheet_agent import (
+    create_agent_card as create_balance_sheet_card,
+    create_balance_sheet_agent,
+)
+from cashflow_agent.cash_flow_agent import (
+    create_agent_card as create_cashflow_statement_card,
+    create_cashflow_statement_agent,
+)
+from incomestatement_agent.income_statement_agent import (
+    create_agent_card as create_income_statement_card,
+    create_income_statement_agent,
+)
+from common.agent_stores import STORE_BACKENDS, AgentStores, create_stores
+from common.metrics import metrics_endpoint
+from common.statement_server import (
+    build_statement_app,
+    check_google_api_key,
+    configure_server,
+    run_server,
+)
+from common.tracing import configure_tracing
+
+load_dotenv()
+
+logging.basicConfig()
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 10000
+
+# Mount path -> (card factory, ADK agent). Each agent keeps its own card at
+# <mount path>/.well-known/agent-card.json.
+STATEMENT_AGENTS = {
+    '/balance-sheet': (create_balance_sheet_card, create_balance_sheet_agent),
+    '/cash-flow': (create_cashflow_statement_card, create_cashflow_statement_agent),
+    '/income-statement': (create_income_statement_card, create_income_statement_agent),
+}
+
+
+def build_combined_app(base_url: str, store: str | None = None) -> Starlette:
+    """Serves every statement agent from one ASGI app, each under its own mount path.
+
+    The agents share the process-wide FMP client, statement cache and model
+    client; each has its own task store and session service.
+    """
+    routes = [Route('/metrics', metrics_endpoint)]
+    all_stores: list[AgentStores] = []
+    for path, (create_card, agent) in STATEMENT_AGENTS.items():
+        # The trailing slash keeps A2A posts from being redirected by the mount.
+        agent_card = create_card(f'{base_url}{path}/')
+        stores = create_stores(store, agent_card.name)
+        all_stores.append(stores)
+        routes.append(Mount(path, app=build_statement_app(agent_card, agent, stores)))
+
+    # Mounted apps do not run their own lifespan, so run all of them here.
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with AsyncExitStack() as stack:
+            for stores in all_stores:
+                await stack.enter_async_context(stores.lifespan(app))
+            yield
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def create_app() -> Starlette:
+    """App factory, configured from the environment so every worker process can call it."""
+    configure_tracing('statement-agents')
+    return build_combined_app(os.environ['APP_URL'].rstrip('/'), os.getenv('AGENT_STORE'))
+
+
+def main(
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        store: str | None = None,
+        store_dir: str | None = None,
+        workers: int = 1,
+):
+    check_google_api_key()
+    if store_dir:
+        os.environ['AGENT_STORE_DIR'] = store_dir
+    configure_server(host, port, store, workers=workers)
+    run_server('main:create_app', create_app, host, port, workers)
+
+
+@click.command()
+@click.option('--host', 'host', default=DEFAULT_HOST)
+@click.option('--port', 'port', default=DEFAULT_PORT)
+@click.option(
+    '--store',
+    'store',
+    type=click.Choice(STORE_BACKENDS),
+    default=None,
+    help='Where tasks and sessions are kept; sqlite survives restarts and is shared by workers.',
+)
+@click.option('--store-dir', 'store_dir', default=None, help='Directory of the SQLite databases.')
+@click.option('--workers', 'workers', default=1, help='Worker processes sharing the port.')
+def cli(host: str, port: int, store: str | None, store_dir: str | None, workers: int):
+    main(host, port, store, store_dir, workers)
+
+
+if __name__ == '__main__':
+    cli()
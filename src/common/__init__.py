@@ -0,0 +1 @@
+"""Code shared by the statement agents (FMP access, caching, executors)."""
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+# In order of precedence.
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_MAX_QUEUE = 64
+WAIT_SAMPLES = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed because the wait queue is full."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits the agent runs in progress and queues the rest fairly.
+
+    At most `max_concurrent` runs hold a slot. Further requests wait, at most
+    `max_queue` of them; beyond that they are rejected so a burst fails fast
+    instead of piling up model calls that end in 429s and long backoffs.
+
+    A freed slot goes to the highest priority class with waiters: interactive
+    requests always go before batch ones. Within a class, users take turns, so
+    one user queueing many requests cannot starve the others. Each user's own
+    requests run in arrival order.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_concurrent = max_concurrent or int(
+            os.getenv('AGENT_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT)
+        )
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv('AGENT_MAX_QUEUE', DEFAULT_MAX_QUEUE)
+        )
+        self.active = 0
+        # Priority class -> user -> waiters, users in round robin order.
+        self._waiters: Dict[str, OrderedDict[str, Deque[asyncio.Future]]] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._queued = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._run_seconds: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.admitted = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def admit(self, user: str, priority: str = INTERACTIVE) -> AsyncIterator[float]:
+        """Holds a slot for the duration of the block and yields the seconds waited for it.
+
+        Raises:
+            AdmissionRejected: If the wait queue is full.
+            ValueError: If the priority is unknown.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority {priority!r}, expected one of {PRIORITIES}')
+        start = time.monotonic()
+        await self._acquire(user, priority)
+        waited = time.monotonic() - start
+        self._waits.append(waited)
+        self.admitted += 1
+        try:
+            yield waited
+        finally:
+            self._run_seconds.append(time.monotonic() - start - waited)
+            self._release()
+
+    async def _acquire(self, user: str, priority: str) -> None:
+        if self.active < self.max_concurrent and not self._queued:
+            self.active += 1
+            return
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f'The agent is at capacity ({self.active} running, {self._queued} waiting); '
+                'retry later',
+                retry_after=self.retry_after(),
+            )
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(user, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the request was canceled.
+                self._release()
+            else:
+                self._discard(priority, user, waiter)
+            raise
+
+    def _release(self) -> None:
+        self.active -= 1
+        for users in self._waiters.values():
+            if users:
+                user, waiters = next(iter(users.items()))
+                waiter = waiters.popleft()
+                self._queued -= 1
+                if waiters:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                waiter.set_result(None)
+                self.active += 1
+                return
+
+    def _discard(self, priority: str, user: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiters[priority].get(user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        self._queued -= 1
+        if not waiters:
+            del self._waiters[priority][user]
+
+    def retry_after(self) -> float:
+        """Estimates the seconds until a request queued now would get a slot."""
+        if not self._run_seconds:
+            return 1.0
+        mean_run = sum(self._run_seconds) / len(self._run_seconds)
+        return round(mean_run * max(self._queued, 1) / self.max_concurrent, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            'active': self.active,
+            'max_concurrent': self.max_concurrent,
+            'queued': self._queued,
+            'queued_by_priority': {
+                priority: sum(len(waiters) for waiters in users.values())
+                for priority, users in self._waiters.items()
+            },
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'wait_p50_ms': round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            'wait_p99_ms': round(waits[int(len(waits) * 0.99)] * 1000, 1) if waits else 0.0,
+            'wait_max_ms': round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
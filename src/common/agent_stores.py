@@ -0,0 +1,121 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+from a2a.server.context import ServerCallContext
+from a2a.server.tasks import InMemoryTaskStore, TaskStore
+from a2a.types import Message, Task
+from google.adk.artifacts import BaseArtifactService, InMemoryArtifactService
+from google.adk.sessions import BaseSessionService
+from starlette.applications import Starlette
+
+from common.analysis_cache import close_analysis_cache
+from common.fmp_client import fmp_client_lifespan
+from common.metrics import register_metrics
+from common.session_store import BoundedSessionService
+from common.sqlite_store import SQLiteDatabase, SQLiteSessionService, SQLiteTaskStore, default_store_path
+
+
+logger = logging.getLogger(__name__)
+
+STORE_BACKENDS = ('memory', 'sqlite')
+DEFAULT_STORE_BACKEND = 'memory'
+PARTIAL = 'partial'
+
+
+def partial_metadata() -> Dict[str, Any]:
+    """Metadata marking a streamed status message as partial output, see `PartialDroppingTaskStore`."""
+    return {PARTIAL: True}
+
+
+def is_partial(message: Optional[Message]) -> bool:
+    return message is not None and bool((message.metadata or {}).get(PARTIAL))
+
+
+class PartialDroppingTaskStore(TaskStore):
+    """Task store keeping streamed partial output out of the stored tasks.
+
+    The A2A task manager moves every status message into the task history and
+    saves the whole task on every event, so storing each streamed chunk would
+    grow the history and the writes with the square of the chunks. Partial
+    messages still reach the client as they stream, but they are removed from
+    the history, and a task whose status is a partial message is saved with its
+    next status instead.
+    """
+
+    def __init__(self, store: TaskStore):
+        self.store = store
+
+    async def save(self, task: Task, context: ServerCallContext | None = None) -> None:
+        if task.history and any(is_partial(message) for message in task.history):
+            # The task manager keeps this task object, so its history stays small too.
+            task.history = [message for message in task.history if not is_partial(message)]
+        if is_partial(task.status.message):
+            return
+        await self.store.save(task, context)
+
+    async def get(self, task_id: str, context: ServerCallContext | None = None) -> Task | None:
+        return await self.store.get(task_id, context)
+
+    async def delete(self, task_id: str, context: ServerCallContext | None = None) -> None:
+        await self.store.delete(task_id, context)
+
+
+@dataclass
+class AgentStores:
+    """Task store and ADK services of one agent server."""
+
+    task_store: TaskStore
+    session_service: BaseSessionService
+    artifact_service: BaseArtifactService
+    database: Optional[SQLiteDatabase] = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Starlette) -> AsyncIterator[None]:
+        """Server lifespan: shares the FMP client, flushes the database and closes the analysis cache on shutdown."""
+        async with fmp_client_lifespan(app):
+            try:
+                yield
+            finally:
+                close_analysis_cache()
+                if self.database is not None:
+                    await self.database.aclose()
+
+
+def create_stores(backend: Optional[str], name: str, path: Optional[str] = None) -> AgentStores:
+    """Creates the stores for the agent called `name`.
+
+    Args:
+        backend: 'memory' (default, lost on restart) or 'sqlite' (durable and
+            shared by every process of the agent). Falls back to AGENT_STORE.
+        name: The agent name, used for the default database file.
+        path: The SQLite database file; falls back to AGENT_STORE_PATH, then
+            AGENT_STORE_DIR/<name>.sqlite3.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = (backend or os.getenv('AGENT_STORE', DEFAULT_STORE_BACKEND)).lower()
+    # The agents never save artifacts, so they stay in memory with either backend.
+    artifact_service = InMemoryArtifactService()
+    if backend == 'memory':
+        stores = AgentStores(
+            task_store=PartialDroppingTaskStore(InMemoryTaskStore()),
+            session_service=BoundedSessionService(artifact_service=artifact_service),
+            artifact_service=artifact_service,
+        )
+    elif backend == 'sqlite':
+        database = SQLiteDatabase(path or os.getenv('AGENT_STORE_PATH') or default_store_path(name))
+        logger.info(f'Storing tasks and sessions in {database.path}')
+        stores = AgentStores(
+            task_store=PartialDroppingTaskStore(SQLiteTaskStore(database)),
+            session_service=SQLiteSessionService(database),
+            artifact_service=artifact_service,
+            database=database,
+        )
+    else:
+        raise ValueError(f'Unknown store backend {backend!r}, expected one of {STORE_BACKENDS}')
+    register_metrics(f'sessions/{name}', stores.session_service.stats)
+    return stores
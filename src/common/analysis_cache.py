@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from common.metrics import register_metrics
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'agentic-stock-analysis' / 'analyses.sqlite3'
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_cache: Optional['AnalysisCache'] = None
+
+
+def digest(value: Any) -> str:
+    """Returns a stable SHA-256 hex digest of a JSON serialisable value."""
+    text = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def normalize_task(text: str) -> str:
+    """Normalises a request so trivially different phrasings share a cache entry."""
+    return ' '.join(text.lower().split()).rstrip('.?! ')
+
+
+@dataclass
+class ToolCall:
+    """A tool call made during an analysis and the digest of its response."""
+
+    name: str
+    args: Dict[str, Any]
+    response_digest: str
+
+
+@dataclass
+class CachedAnalysis:
+    parts: List[Dict[str, Any]]
+    calls: List[ToolCall]
+    elapsed: float
+    created_at: float
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class AnalysisCache:
+    """Persistent SQLite cache for the final answers of the statement agents.
+
+    An entry is keyed by the request: agent, model, instruction version, the
+    conversation so far and the normalised task. It also stores the tool calls
+    of the run (which carry the ticker and period) with a digest of every tool
+    response. The response is a pure function of the fetched statement data,
+    so the caller re-runs the calls (served from the statement cache) and only
+    reuses the answer while every digest still matches. Entries expire after
+    `ttl` seconds and are evicted least recently used first once the stored
+    answers exceed `max_bytes`. The file is shared by every process.
+    """
+
+    def __init__(
+            self,
+            path: Optional[str | Path] = None,
+            ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+    ):
+        self.path = Path(path or os.getenv('ANALYSIS_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.ttl = ttl if ttl is not None else float(os.getenv('ANALYSIS_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        self.max_bytes = max_bytes or int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                request_key TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                tickers TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed_at)'
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.joined = 0
+        self.stores = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def get(self, request_key: str) -> Optional[CachedAnalysis]:
+        """Returns the unexpired entry for `request_key`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, created_at FROM analyses WHERE request_key=?', (request_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if time.time() - created_at >= self.ttl:
+                self._conn.execute('DELETE FROM analyses WHERE request_key=?', (request_key,))
+                return None
+            self._conn.execute(
+                'UPDATE analyses SET accessed_at=? WHERE request_key=?', (time.time(), request_key)
+            )
+        value = json.loads(zlib.decompress(payload))
+        return CachedAnalysis(
+            parts=value['parts'],
+            calls=[ToolCall(**call) for call in value['calls']],
+            elapsed=value['elapsed'],
+            created_at=created_at,
+        )
+
+    def put(
+            self,
+            request_key: str,
+            agent: str,
+            parts: List[Dict[str, Any]],
+            calls: List[ToolCall],
+            elapsed: float,
+    ) -> None:
+        """Stores an answer and evicts the least recently used entries over budget.
+
+        Args:
+            request_key: The request key, see `AnalysisCache`.
+            agent: The agent name, for inspection.
+            parts: The A2A parts of the answer, as JSON.
+            calls: The tool calls the answer is based on.
+            elapsed: Seconds the run took, counted as saved on every hit.
+        """
+        payload = zlib.compress(json.dumps({
+            'parts': parts,
+            'calls': [call.__dict__ for call in calls],
+            'elapsed': elapsed,
+        }).encode('utf-8'))
+        tickers = sorted({str(call.args['ticker']).upper() for call in calls if 'ticker' in call.args})
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (request_key, agent, ','.join(tickers), payload, len(payload), now, now),
+            )
+            self._evict()
+        self.stores += 1
+
+    def delete(self, request_key: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM analyses WHERE request_key=?', (request_key,))
+
+    def _evict(self) -> None:
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM analyses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT rowid, size FROM analyses ORDER BY accessed_at ASC'
+        ).fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self._conn.executemany('DELETE FROM analyses WHERE rowid=?', evicted)
+        self.evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM analyses')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses'
+            ).fetchone()
+        lookups = self.hits + self.joined + self.misses + self.stale
+        return {
+            'hits': self.hits,
+            'joined': self.joined,
+            'misses': self.misses,
+            'stale': self.stale,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.joined) / lookups, 4) if lookups else 0.0,
+            'seconds_saved': round(self.seconds_saved, 3),
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Returns the shared analysis cache, or None when ANALYSIS_CACHE is not TRUE.
+
+    ANALYSIS_CACHE defaults to FALSE while a cassette records or replays, so
+    every request reaches the model and is recorded or replayed.
+    """
+    # Imported here: the cassette module uses `digest` from this one.
+    from common.cassette import get_cassette
+
+    global _cache
+    default = 'FALSE' if get_cassette() is not None else 'TRUE'
+    if os.getenv('ANALYSIS_CACHE', default).upper() != 'TRUE':
+        return None
+    if _cache is None:
+        _cache = AnalysisCache()
+        register_metrics('analysis_cache', _cache.stats)
+    return _cache
+
+
+def close_analysis_cache() -> None:
+    """Closes the shared analysis cache. The next `get_analysis_cache` call opens it again."""
+    global _cache
+    if _cache is not None:
+        cache, _cache = _cache, None
+        cache.close()
@@ -0,0 +1,257 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.statement_frame import StatementFrame, format_value
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOVING_AVERAGE_WINDOW = 3
+
+RatioDefinition = Callable[[StatementFrame], np.ndarray]
+
+
+def _pick(frame: StatementFrame, *aliases: str) -> np.ndarray:
+    """Returns the first line item found among `aliases`, matched case-insensitively.
+
+    The standardised statements use camelCase names while the as-reported
+    endpoints use lower case XBRL concept names, so definitions list both.
+    """
+    lookup = {name.lower(): name for name in frame.columns}
+    for alias in aliases:
+        name = lookup.get(alias.lower())
+        if name is not None:
+            return frame[name]
+    return np.full(len(frame), np.nan)
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def period_change(matrix: np.ndarray, lag: int = 1) -> np.ndarray:
+    """Relative change against `lag` periods earlier for every row of a (items x periods) matrix.
+
+    The first `lag` periods have no base and are NaN. The base is taken in
+    absolute value so that a loss shrinking from -10 to -5 reads as +50%.
+    """
+    change = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] > lag:
+        base = matrix[:, :-lag]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change[:, lag:] = (matrix[:, lag:] - base) / np.abs(base)
+    change[~np.isfinite(change)] = np.nan
+    return change
+
+
+def cagr(matrix: np.ndarray, years: float) -> np.ndarray:
+    """Compound annual growth rate between the first and last period of every row.
+
+    Only defined when both ends are positive; NaN otherwise.
+    """
+    if matrix.shape[1] < 2 or years <= 0:
+        return np.full(matrix.shape[0], np.nan)
+    first, last = matrix[:, 0], matrix[:, -1]
+    valid = (first > 0) & (last > 0)
+    result = np.full(matrix.shape[0], np.nan)
+    result[valid] = (last[valid] / first[valid]) ** (1 / years) - 1
+    return result
+
+
+def moving_average(matrix: np.ndarray, window: int = DEFAULT_MOVING_AVERAGE_WINDOW) -> np.ndarray:
+    """Trailing moving average over `window` periods for every row; NaN until the window is full.
+
+    A missing period only blanks the windows that contain it.
+    """
+    result = np.full(matrix.shape, np.nan)
+    if window < 1 or matrix.shape[1] < window:
+        return result
+    windows = np.lib.stride_tricks.sliding_window_view(matrix, window, axis=1)
+    result[:, window - 1:] = windows.mean(axis=-1)
+    return result
+
+
+def span_in_years(frame: StatementFrame) -> float:
+    """Years between the first and last period of the frame."""
+    if len(frame) < 2 or np.isnat(frame.dates[0]) or np.isnat(frame.dates[-1]):
+        return 0.0
+    days = (frame.dates[-1] - frame.dates[0]).astype('timedelta64[D]').astype(float)
+    return days / 365.25
+
+
+BALANCE_SHEET_RATIOS: Dict[str, RatioDefinition] = {
+    'currentRatio': lambda f: _divide(
+        _pick(f, 'totalCurrentAssets', 'assetscurrent'),
+        _pick(f, 'totalCurrentLiabilities', 'liabilitiescurrent'),
+    ),
+    'quickRatio': lambda f: _divide(
+        _pick(f, 'totalCurrentAssets', 'assetscurrent') - np.nan_to_num(_pick(f, 'inventory', 'inventorynet')),
+        _pick(f, 'totalCurrentLiabilities', 'liabilitiescurrent'),
+    ),
+    'cashRatio': lambda f: _divide(
+        _pick(f, 'cashAndCashEquivalents', 'cashandcashequivalentsatcarryingvalue'),
+        _pick(f, 'totalCurrentLiabilities', 'liabilitiescurrent'),
+    ),
+    'debtToEquity': lambda f: _divide(
+        _pick(f, 'totalDebt'),
+        _pick(f, 'totalStockholdersEquity', 'stockholdersequity'),
+    ),
+    'debtToAssets': lambda f: _divide(_pick(f, 'totalDebt'), _pick(f, 'totalAssets', 'assets')),
+    'liabilitiesToAssets': lambda f: _divide(
+        _pick(f, 'totalLiabilities', 'liabilities'),
+        _pick(f, 'totalAssets', 'assets'),
+    ),
+    'equityRatio': lambda f: _divide(
+        _pick(f, 'totalStockholdersEquity', 'stockholdersequity'),
+        _pick(f, 'totalAssets', 'assets'),
+    ),
+}
+
+INCOME_STATEMENT_RATIOS: Dict[str, RatioDefinition] = {
+    'grossMargin': lambda f: _divide(_pick(f, 'grossProfit'), _pick(f, 'revenue', 'revenues')),
+    'operatingMargin': lambda f: _divide(
+        _pick(f, 'operatingIncome', 'operatingincomeloss'),
+        _pick(f, 'revenue', 'revenues'),
+    ),
+    'ebitdaMargin': lambda f: _divide(_pick(f, 'ebitda'), _pick(f, 'revenue', 'revenues')),
+    'netMargin': lambda f: _divide(
+        _pick(f, 'netIncome', 'netincomeloss'),
+        _pick(f, 'revenue', 'revenues'),
+    ),
+    'rndToRevenue': lambda f: _divide(
+        _pick(f, 'researchAndDevelopmentExpenses', 'researchanddevelopmentexpense'),
+        _pick(f, 'revenue', 'revenues'),
+    ),
+    'interestCoverage': lambda f: _divide(
+        _pick(f, 'operatingIncome', 'operatingincomeloss'),
+        _pick(f, 'interestExpense', 'interestexpense'),
+    ),
+    'effectiveTaxRate': lambda f: _divide(
+        _pick(f, 'incomeTaxExpense', 'incometaxexpensebenefit'),
+        _pick(f, 'incomeBeforeTax'),
+    ),
+}
+
+
+def _operating_cash_flow(f: StatementFrame) -> np.ndarray:
+    return _pick(
+        f,
+        'operatingCashFlow',
+        'netCashProvidedByOperatingActivities',
+        'netcashprovidedbyusedinoperatingactivities',
+    )
+
+
+def _capital_expenditure(f: StatementFrame) -> np.ndarray:
+    # Standardised statements report capex as a negative number, as-reported as a positive payment.
+    return -np.abs(_pick(
+        f,
+        'capitalExpenditure',
+        'investmentsInPropertyPlantAndEquipment',
+        'paymentstoacquirepropertyplantandequipment',
+    ))
+
+
+def _free_cash_flow(f: StatementFrame) -> np.ndarray:
+    reported = _pick(f, 'freeCashFlow')
+    return np.where(np.isnan(reported), _operating_cash_flow(f) + _capital_expenditure(f), reported)
+
+
+CASH_FLOW_RATIOS: Dict[str, RatioDefinition] = {
+    'capexToOperatingCashFlow': lambda f: _divide(-_capital_expenditure(f), _operating_cash_flow(f)),
+    'cashConversion': lambda f: _divide(_operating_cash_flow(f), _pick(f, 'netIncome', 'netincomeloss')),
+    'fcfToNetIncome': lambda f: _divide(_free_cash_flow(f), _pick(f, 'netIncome', 'netincomeloss')),
+    'buybacksToFreeCashFlow': lambda f: _divide(
+        np.abs(_pick(f, 'commonStockRepurchased', 'paymentsforrepurchaseofcommonstock')),
+        _free_cash_flow(f),
+    ),
+    'dividendsToFreeCashFlow': lambda f: _divide(
+        np.abs(_pick(f, 'commonDividendsPaid', 'netDividendsPaid', 'paymentsofdividends')),
+        _free_cash_flow(f),
+    ),
+}
+
+
+def compute_ratios(frame: StatementFrame, definitions: Dict[str, RatioDefinition]) -> Dict[str, np.ndarray]:
+    """Evaluates every ratio definition on the frame, skipping ratios the statement cannot support."""
+    ratios = {}
+    for name, definition in definitions.items():
+        values = definition(frame)
+        if not np.all(np.isnan(values)):
+            ratios[name] = values
+    return ratios
+
+
+def _format_percent(value: float) -> str:
+    return '-' if np.isnan(value) else f'{value * 100:+.1f}%'
+
+
+def _format_ratio(value: float) -> str:
+    return '-' if np.isnan(value) else f'{value:.2f}'
+
+
+def _table(header: List[str], rows: List[Tuple[str, List[str]]]) -> List[str]:
+    return [' | '.join(header)] + [' | '.join([name, *cells]) for name, cells in rows]
+
+
+def render_metrics(
+        frame: StatementFrame,
+        definitions: Dict[str, RatioDefinition],
+        window: int = DEFAULT_MOVING_AVERAGE_WINDOW,
+        fields: Optional[List[str]] = None,
+) -> str:
+    """Computes trends and ratios for the whole statement and renders them for the model.
+
+    Sections: period-over-period change per line item with CAGR and the latest
+    moving average, year-over-year change for quarterly statements, and the
+    ratios from `definitions` per period. When `fields` is given the trend
+    tables only cover those line items, unless the statement has none of them;
+    ratios always use the full statement.
+    """
+    selected = frame.select(fields) if fields is not None else frame
+    names, matrix = (selected if selected.columns else frame).to_matrix()
+    keep = ~np.all(np.isnan(matrix) | (matrix == 0), axis=1)
+    names = [name for name, kept in zip(names, keep) if kept]
+    matrix = matrix[keep]
+
+    change = period_change(matrix, lag=1)
+    growth = cagr(matrix, span_in_years(frame))
+    average = moving_average(matrix, window)
+
+    label = 'QoQ' if frame.is_quarterly else 'YoY'
+    lines = [f'{frame.symbol} {label} change per line item, CAGR over {span_in_years(frame):.1f} years '
+             f'and latest {window}-period moving average']
+    lines += _table(
+        ['item', *frame.periods[1:], 'CAGR', f'MA{window}'],
+        [
+            (
+                name,
+                [*(_format_percent(value) for value in change[row, 1:]),
+                 _format_percent(growth[row]),
+                 format_value(average[row, -1])],
+            )
+            for row, name in enumerate(names)
+        ],
+    )
+
+    if frame.is_quarterly and len(frame) > 4:
+        yoy = period_change(matrix, lag=4)
+        lines += ['', f'{frame.symbol} YoY change per line item (same quarter previous year)']
+        lines += _table(
+            ['item', *frame.periods[4:]],
+            [(name, [_format_percent(value) for value in yoy[row, 4:]]) for row, name in enumerate(names)],
+        )
+
+    ratios = compute_ratios(frame, definitions)
+    if ratios:
+        lines += ['', f'{frame.symbol} ratios per period']
+        lines += _table(
+            ['ratio', *frame.periods],
+            [(name, [_format_ratio(value) for value in values]) for name, values in ratios.items()],
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+import httpx
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from common.analysis_cache import digest
+from common.metrics import register_metrics
+from common.tracing import record_error, tracer
+
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (RECORD, REPLAY)
+
+DEFAULT_CASSETTE_PATH = Path.home() / '.cache' / 'agentic-stock-analysis' / 'cassette.sqlite3'
+FMP = 'fmp'
+LLM = 'llm'
+
+# Task, context, session and function call ids differ on every run.
+_UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+# Only headers the callers look at; the body is stored decoded.
+_KEPT_HEADERS = ('content-type', 'retry-after')
+
+_cassette: Optional['Cassette'] = None
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_key(value: Any) -> str:
+    """Digest identifying a request across runs: ids generated per run are masked out."""
+    return digest(json.loads(_UUID.sub('<id>', json.dumps(value, sort_keys=True, default=str))))
+
+
+class Cassette:
+    """Recorded FMP responses and model calls, shared by every process using the same file.
+
+    In `record` mode every FMP response and every model call is stored with
+    the seconds it took, keyed by a digest of the request. In `replay` mode
+    the same requests are answered from the file without touching FMP or
+    Gemini; a request made several times is answered with its recordings in
+    order, and with the last one once they run out. With `replay_timing` a
+    replayed answer is delayed by the recorded time, so latency experiments
+    see the shape of the real traffic. Payloads are compressed with zlib.
+    """
+
+    def __init__(
+            self,
+            mode: str,
+            path: Optional[str | Path] = None,
+            replay_timing: Optional[bool] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f'Unknown cassette mode {mode!r}, expected one of {MODES}')
+        self.mode = mode
+        self.path = Path(path or os.getenv('CASSETTE_PATH', DEFAULT_CASSETTE_PATH))
+        if replay_timing is None:
+            replay_timing = os.getenv('CASSETTE_REPLAY_TIMING', 'FALSE').upper() == 'TRUE'
+        self.replay_timing = replay_timing
+        if mode == REPLAY and not self.path.exists():
+            raise FileNotFoundError(f'No cassette at {self.path} to replay')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS interactions (
+                kind TEXT NOT NULL,
+                request_key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                elapsed REAL NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (kind, request_key, seq)
+            )"""
+        )
+        # Replays served per request in this process.
+        self._served: Dict[Tuple[str, str], int] = defaultdict(int)
+
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def record(self, kind: str, key: str, payload: Any, elapsed: float) -> None:
+        """Appends a recording of `payload` for the request `key`."""
+        blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO interactions
+                   SELECT ?, ?, COALESCE(MAX(seq) + 1, 0), ?, ?, ?
+                   FROM interactions WHERE kind=? AND request_key=?""",
+                (kind, key, blob, elapsed, time.time(), kind, key),
+            )
+        self.recorded += 1
+
+    def replay(self, kind: str, key: str) -> Tuple[Any, float]:
+        """Returns the next recorded (payload, elapsed) for the request `key`.
+
+        Raises:
+            CassetteMiss: If the request was never recorded.
+        """
+        with self._lock:
+            index = self._served[(kind, key)]
+            row = self._conn.execute(
+                """SELECT payload, elapsed FROM interactions WHERE kind=? AND request_key=?
+                   ORDER BY seq LIMIT 1 OFFSET ?""",
+                (kind, key, index),
+            ).fetchone()
+            if row is None and index:
+                row = self._conn.execute(
+                    """SELECT payload, elapsed FROM interactions WHERE kind=? AND request_key=?
+                       ORDER BY seq DESC LIMIT 1""",
+                    (kind, key),
+                ).fetchone()
+            if row is None:
+                self.missed += 1
+                raise CassetteMiss(f'No {kind} recording for request {key[:12]} in {self.path}')
+            self._served[(kind, key)] = index + 1
+        self.replayed += 1
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    async def delay(self, elapsed: float) -> None:
+        if self.replay_timing and elapsed > 0:
+            await asyncio.sleep(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT kind, COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM interactions GROUP BY kind'
+            ).fetchall()
+        return {
+            'mode': self.mode,
+            'recorded': self.recorded,
+            'replayed': self.replayed,
+            'missed': self.missed,
+            'entries': {kind: count for kind, count, _ in rows},
+            'bytes': sum(size for _, _, size in rows),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport recording the responses of `transport` to, or replaying them from, a cassette.
+
+    Requests are keyed by method, path and query without the API key, so a
+    cassette recorded with one key and base url replays with any other.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key({
+            'method': request.method,
+            'path': request.url.path,
+            'query': sorted((name, value) for name, value in request.url.params.multi_items() if name != 'apikey'),
+        })
+        if self.cassette.replaying:
+            recording, elapsed = await asyncio.to_thread(self.cassette.replay, FMP, key)
+            await self.cassette.delay(elapsed)
+            return httpx.Response(
+                recording['status'],
+                headers=recording['headers'],
+                content=recording['body'].encode('utf-8'),
+                request=request,
+            )
+
+        start = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        # Read and decode the body here, so it can be stored and handed back.
+        body = await httpx.Response(
+            response.status_code, headers=response.headers, stream=response.stream, request=request
+        ).aread()
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        await asyncio.to_thread(self.cassette.record, FMP, key, {
+            'status': response.status_code,
+            'headers': headers,
+            'body': body.decode('utf-8', errors='replace'),
+        }, time.monotonic() - start)
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class CassetteGemini(Gemini):
+    """Gemini that records its calls to, or replays them from, the cassette when one is active.
+
+    A call is keyed by the model, the contents, the system instruction and the
+    tool declarations. A streamed answer is replayed chunk by chunk, each at
+    its recorded offset when the cassette replays timings. Every call, with or
+    without a cassette, is traced as an `llm.generate_content` span.
+    """
+
+    async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # Not made the current span: a model call has no children, and the
+        # generator may be closed from another context.
+        span = tracer.start_span('llm.generate_content', attributes={
+            'llm.model': llm_request.model or self.model,
+            'llm.stream': stream,
+            'llm.cassette': os.getenv('CASSETTE_MODE', '') or 'off',
+        })
+        try:
+            async for response in self._generate(llm_request, stream):
+                usage = response.usage_metadata
+                if usage is not None:
+                    span.set_attribute('llm.prompt_tokens', usage.prompt_token_count or 0)
+                    span.set_attribute('llm.output_tokens', usage.candidates_token_count or 0)
+                yield response
+        except Exception as e:
+            record_error(span, e)
+            raise
+        finally:
+            span.end()
+
+    async def _generate(self, llm_request: LlmRequest, stream: bool) -> AsyncGenerator[LlmResponse, None]:
+        cassette = get_cassette()
+        if cassette is None:
+            async for response in super().generate_content_async(llm_request, stream):
+                yield response
+            return
+
+        key = request_key({
+            'model': llm_request.model or self.model,
+            'stream': stream,
+            'request': llm_request.model_dump(
+                mode='json', exclude_none=True, include={'contents', 'config'}
+            ),
+        })
+        start = time.monotonic()
+        if cassette.replaying:
+            chunks, _ = await asyncio.to_thread(cassette.replay, LLM, key)
+            for offset, chunk in chunks:
+                await cassette.delay(start + offset - time.monotonic())
+                yield LlmResponse.model_validate(chunk)
+            return
+
+        chunks = []
+        async for response in super().generate_content_async(llm_request, stream):
+            chunks.append([time.monotonic() - start, response.model_dump(mode='json', exclude_none=True)])
+            yield response
+        # An answer the caller stopped reading early is incomplete and not recorded.
+        await asyncio.to_thread(cassette.record, LLM, key, chunks, time.monotonic() - start)
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Returns the shared cassette, or None unless CASSETTE_MODE is `record` or `replay`."""
+    global _cassette
+    mode = os.getenv('CASSETTE_MODE', '').lower()
+    if mode not in MODES:
+        return None
+    if _cassette is None:
+        _cassette = Cassette(mode)
+        register_metrics('cassette', _cassette.stats)
+        logger.info(f'Cassette {_cassette.path}: {mode}')
+    return _cassette
+
+
+def is_replaying() -> bool:
+    """True when FMP and model calls are served from a cassette instead of the network."""
+    return os.getenv('CASSETTE_MODE', '').lower() == REPLAY
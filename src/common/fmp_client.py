@@ -0,0 +1,388 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import ssl
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Optional
+
+import certifi
+import httpx
+from dotenv import load_dotenv
+from opentelemetry import trace
+
+from common.cassette import CassetteTransport, get_cassette
+from common.metrics import register_metrics
+from common.rate_limiter import DEFAULT_RATE_PER_MINUTE, TokenBucketLimiter
+from common.singleflight import SingleFlight
+from common.statement_cache import StatementCache, latest_filing
+from common.statement_frame import StatementFrame
+from common.tracing import tracer
+
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEFAULT_BASE_URL = 'https://financialmodelingprep.com/stable'
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_RETRY_BASE_DELAY = 0.5
+DEFAULT_RETRY_MAX_DELAY = 30.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_client: Optional['FMPClient'] = None
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """Returns the process wide SSL context, built once from the certifi bundle."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FMPClient:
+    """Async, connection pooled client for the Financial Modeling Prep API.
+
+    A single instance is shared by every tool in the process so that TLS
+    sessions and keep-alive connections are reused across tool calls instead of
+    paying a new handshake per request.
+
+    Requests are paced by a token bucket shared by every process using the same
+    API key, and retried with jittered exponential backoff on transport errors,
+    429 and 5xx answers. A `Retry-After` is honoured, and after a 429 it holds
+    back the other processes too.
+    """
+
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            api_key: Optional[str] = None,
+            connect_timeout: Optional[float] = None,
+            read_timeout: Optional[float] = None,
+            max_connections: Optional[int] = None,
+            max_keepalive_connections: Optional[int] = None,
+            http2: Optional[bool] = None,
+            cache: Optional[StatementCache] = None,
+            use_cache: Optional[bool] = None,
+            rate_limiter: Optional[TokenBucketLimiter] = None,
+            max_retries: Optional[int] = None,
+    ):
+        self.base_url = (base_url or os.getenv('FMP_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.api_key = api_key or os.getenv('FMP_KEY') or os.getenv('fmp_key')
+        connect_timeout = connect_timeout or float(
+            os.getenv('FMP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)
+        )
+        read_timeout = read_timeout or float(
+            os.getenv('FMP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)
+        )
+        max_connections = max_connections or int(
+            os.getenv('FMP_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+        )
+        max_keepalive_connections = max_keepalive_connections or int(
+            os.getenv('FMP_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE)
+        )
+        if http2 is None:
+            http2 = os.getenv('FMP_HTTP2', 'TRUE').upper() == 'TRUE'
+        # HTTP/2 needs the optional `h2` package (httpx[http2]).
+        self.http2 = http2 and _http2_available()
+
+        cassette = get_cassette()
+        if use_cache is None:
+            # A recording must see every response, so recording skips the cache by default.
+            default = 'FALSE' if cassette is not None and not cassette.replaying else 'TRUE'
+            use_cache = os.getenv('FMP_CACHE', default).upper() == 'TRUE'
+        self.cache = cache or (StatementCache() if use_cache else None)
+        self._single_flight = SingleFlight()
+
+        rate_limit = float(os.getenv('FMP_RATE_LIMIT', DEFAULT_RATE_PER_MINUTE))
+        if cassette is not None and cassette.replaying:
+            # Replays never reach FMP.
+            rate_limit = 0
+        if rate_limiter is None and rate_limit > 0:
+            # One bucket per API key; the key itself is not stored.
+            bucket = hashlib.sha256(str(self.api_key).encode('utf-8')).hexdigest()[:16]
+            rate_limiter = TokenBucketLimiter(bucket)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.getenv('FMP_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        )
+        self.retry_base_delay = float(os.getenv('FMP_RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY))
+        self.retry_max_delay = float(os.getenv('FMP_RETRY_MAX_DELAY', DEFAULT_RETRY_MAX_DELAY))
+        self.retries = 0
+        self.throttled = 0
+
+        transport = httpx.AsyncHTTPTransport(
+            verify=get_ssl_context(),
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        if cassette is not None:
+            transport = CassetteTransport(transport, cassette)
+        self._http_client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=transport,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    async def _get(self, endpoint: str, params: dict[str, Any]) -> httpx.Response:
+        query = {key: value for key, value in params.items() if value is not None}
+        with tracer.start_as_current_span('FMPClient._get', attributes={
+            'fmp.endpoint': endpoint,
+            **{f'fmp.{key}': value for key, value in query.items()},
+        }) as span:
+            response = await self._get_with_retries(endpoint, query)
+            span.set_attribute('http.status_code', response.status_code)
+            return response
+
+    async def _get_with_retries(self, endpoint: str, query: dict[str, Any]) -> httpx.Response:
+        query = {**query, 'apikey': self.api_key}
+        url = f'/{endpoint.lstrip("/")}'
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                response = await self._http_client.get(url, params=query)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f'FMP {endpoint} failed ({e!r}), retrying in {delay:.2f}s')
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = _retry_after(response)
+                if retry_after is not None and retry_after > self.retry_max_delay:
+                    # E.g. the daily quota is used up; waiting would only hold up the caller.
+                    response.raise_for_status()
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                logger.warning(f'FMP {endpoint} answered {response.status_code}, retrying in {delay:.2f}s')
+                if response.status_code == 429:
+                    self.throttled += 1
+                    if self.rate_limiter is not None:
+                        # The limiter makes every process, including this one, wait.
+                        await self.rate_limiter.block(delay)
+                        delay = 0.0
+            self.retries += 1
+            trace.get_current_span().add_event('retry', {'attempt': attempt + 1, 'delay': delay})
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: a random delay up to the exponential backoff of `attempt`."""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    async def get_text(self, endpoint: str, **params: Any) -> str:
+        """Performs a GET on the given FMP endpoint and returns the body as text.
+
+        Args:
+            endpoint: The FMP endpoint relative to the base url, e.g. `income-statement`
+            **params: Query parameters; parameters set to None are dropped.
+
+        Returns:
+            The decoded response body.
+
+        Raises:
+            httpx.HTTPError: If the request fails or FMP answers with an error status.
+        """
+        response = await self._get(endpoint, params)
+        return response.text
+
+    async def get_json(self, endpoint: str, **params: Any) -> Any:
+        """Same as `get_text` but returns the parsed JSON body."""
+        response = await self._get(endpoint, params)
+        return response.json()
+
+    async def get_statement(
+            self,
+            endpoint: str,
+            symbol: str,
+            period: Optional[str] = None,
+            limit: Optional[int] = None,
+    ) -> str:
+        """Returns the raw JSON text of a financial statement, served from cache when possible.
+
+        An expired cache entry is revalidated with a single period request: if
+        no newer filing than the cached one exists the entry is kept, otherwise
+        the full history is downloaded again. Concurrent identical requests share
+        one lookup and one upstream fetch.
+        """
+        key = (endpoint, symbol.upper(), period, limit)
+        return await self._single_flight.do(
+            key, lambda: self._get_statement(endpoint, symbol, period, limit)
+        )
+
+    async def _get_statement(
+            self,
+            endpoint: str,
+            symbol: str,
+            period: Optional[str],
+            limit: Optional[int],
+    ) -> str:
+        params = {'symbol': symbol, 'period': period, 'limit': limit}
+        if self.cache is None:
+            return await self.get_text(endpoint, **params)
+
+        key = (endpoint, symbol, period, limit)
+        entry = await asyncio.to_thread(self.cache.get, key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry.text
+
+        if entry is not None and entry.latest_filing is not None:
+            probe = await self.get_text(endpoint, **{**params, 'limit': 1})
+            probe_filing = latest_filing(_loads(probe))
+            if probe_filing is not None and probe_filing <= entry.latest_filing:
+                self.cache.hits += 1
+                self.cache.revalidations += 1
+                await asyncio.to_thread(self.cache.touch, key)
+                return entry.text
+
+        self.cache.misses += 1
+        text = await self.get_text(endpoint, **params)
+        payload = _loads(text)
+        # FMP reports errors (bad key, plan limits) as a JSON object with a 200 status.
+        if isinstance(payload, list) and payload:
+            await asyncio.to_thread(self.cache.put, key, text, latest_filing(payload))
+        return text
+
+    async def get_statement_frame(
+            self,
+            endpoint: str,
+            symbol: str,
+            period: Optional[str] = None,
+            limit: Optional[int] = None,
+            start_date: Optional[str] = None,
+            end_date: Optional[str] = None,
+    ) -> StatementFrame:
+        """Same as `get_statement` but parsed into a columnar `StatementFrame`.
+
+        The FMP statement endpoints have no date filter, so a `start_date` is
+        pushed down as a `limit` that just covers the range and the periods
+        outside [start_date, end_date] are trimmed after parsing.
+        """
+        if limit is None and start_date:
+            limit = _periods_since(start_date, period)
+        text = await self.get_statement(endpoint, symbol, period, limit)
+        return StatementFrame.from_json(text).between(start_date, end_date)
+
+    async def get_statement_frames(
+            self,
+            endpoint: str,
+            symbols: list[str],
+            period: Optional[str] = None,
+            limit: Optional[int] = None,
+            start_date: Optional[str] = None,
+            end_date: Optional[str] = None,
+    ) -> dict[str, Optional[StatementFrame]]:
+        """Fetches the same statement for several symbols concurrently.
+
+        The requests are paced by the shared rate limiter like any other. A
+        symbol that cannot be fetched maps to None instead of failing the rest.
+        """
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        results = await asyncio.gather(
+            *(
+                self.get_statement_frame(endpoint, symbol, period, limit, start_date, end_date)
+                for symbol in symbols
+            ),
+            return_exceptions=True,
+        )
+        frames = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f'Fetching {endpoint} for {symbol} failed: {result!r}')
+                frames[symbol] = None
+            else:
+                frames[symbol] = result
+        return frames
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def single_flight_stats(self) -> dict[str, Any]:
+        return self._single_flight.stats()
+
+    def rate_limit_stats(self) -> dict[str, Any]:
+        stats = self.rate_limiter.stats() if self.rate_limiter is not None else {}
+        return {**stats, 'retries': self.retries, 'throttled': self.throttled}
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if self.rate_limiter is not None:
+            self.rate_limiter.close()
+
+
+def _periods_since(start_date: str, period: Optional[str]) -> int:
+    years = date.today().year - date.fromisoformat(start_date).year + 1
+    return max(years, 1) * (4 if period == 'quarter' else 1)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait according to the `Retry-After` header, in seconds or as an HTTP date."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def get_fmp_client() -> FMPClient:
+    """Returns the shared FMP client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = FMPClient()
+        register_metrics('fmp_cache', _client.stats)
+        register_metrics('fmp_single_flight', _client.single_flight_stats)
+        register_metrics('fmp_rate_limit', _client.rate_limit_stats)
+    return _client
+
+
+async def aclose_fmp_client() -> None:
+    """Closes the shared FMP client. The next `get_fmp_client` call builds a new one."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+@asynccontextmanager
+async def fmp_client_lifespan(app: Any) -> AsyncIterator[None]:
+    """Starlette lifespan that closes the shared FMP client on server shutdown."""
+    yield
+    await aclose_fmp_client()
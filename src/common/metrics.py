@@ -0,0 +1,33 @@
+import logging
+from typing import Any, Callable, Dict
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+
+logger = logging.getLogger(__name__)
+
+MetricsProvider = Callable[[], Dict[str, Any]]
+
+_providers: Dict[str, MetricsProvider] = {}
+
+
+def register_metrics(name: str, provider: MetricsProvider) -> None:
+    """Registers a callable returning a JSON serialisable dict of metrics under `name`."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Returns a snapshot of every registered metrics provider."""
+    snapshot = {}
+    for name, provider in _providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.error(f'Collecting metrics for {name} failed: {e}')
+    return snapshot
+
+
+async def metrics_endpoint(request: Request) -> JSONResponse:
+    """Starlette endpoint exposing `collect_metrics` as JSON."""
+    return JSONResponse(collect_metrics())
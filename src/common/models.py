@@ -0,0 +1,27 @@
+import functools
+
+from google.adk.models.google_llm import Gemini
+from google.genai import types
+
+from common.cassette import CassetteGemini
+
+
+STATEMENT_MODEL = 'gemini-2.5-flash-lite'
+
+retry_config = types.HttpRetryOptions(
+    attempts=5,  # Maximum retry attempts
+    exp_base=7,  # Delay multiplier
+    initial_delay=1,
+    http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
+)
+
+
+@functools.cache
+def statement_model() -> Gemini:
+    """Returns the model shared by the statement agents.
+
+    One instance means one Gen AI client and connection pool, also when all
+    agents are served from the same process. Its calls are recorded to or
+    replayed from the cassette when CASSETTE_MODE is set.
+    """
+    return CassetteGemini(model=STATEMENT_MODEL, retry_options=retry_config)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITER_PATH = Path.home() / '.cache' / 'agentic-stock-analysis' / 'fmp_rate_limit.sqlite3'
+# FMP Starter plan: 300 calls per minute.
+DEFAULT_RATE_PER_MINUTE = 300
+DEFAULT_BURST = 10
+
+
+class TokenBucketLimiter:
+    """Token bucket shared by every process using the same SQLite file.
+
+    The bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second. Every request takes a token, even when none is left: the balance
+    goes negative and the caller sleeps until its token has been refilled. So
+    waiting callers are spaced out evenly in the order they arrived, across
+    processes, instead of all retrying at once. One short SQLite transaction
+    per request keeps the balance consistent between the agent servers.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            path: Optional[str | Path] = None,
+            rate: Optional[float] = None,
+            burst: Optional[float] = None,
+    ):
+        self.name = name
+        self.path = Path(path or os.getenv('FMP_RATE_LIMIT_PATH', DEFAULT_LIMITER_PATH))
+        self.rate = rate or float(os.getenv('FMP_RATE_LIMIT', DEFAULT_RATE_PER_MINUTE)) / 60
+        self.burst = burst or float(os.getenv('FMP_RATE_BURST', DEFAULT_BURST))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+
+        self.acquired = 0
+        self.delayed = 0
+        self.seconds_waited = 0.0
+        self.max_wait = 0.0
+        self.blocks = 0
+
+    def _update(self, cost: float, block: float = 0.0) -> float:
+        """Refills the bucket, takes `cost` tokens and returns the seconds to wait for them.
+
+        A `block` empties the bucket so nobody gets a token for `block` seconds.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    'SELECT tokens, updated_at FROM buckets WHERE name=?', (self.name,)
+                ).fetchone()
+                tokens = self.burst if row is None else min(
+                    self.burst, row[0] + (now - row[1]) * self.rate
+                )
+                if block:
+                    tokens = min(tokens, -block * self.rate)
+                tokens -= cost
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)', (self.name, tokens, now)
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self) -> float:
+        """Waits for a token and returns the seconds waited."""
+        wait = await asyncio.to_thread(self._update, 1.0)
+        self.acquired += 1
+        if wait > 0:
+            self.delayed += 1
+            self.seconds_waited += wait
+            self.max_wait = max(self.max_wait, wait)
+            logger.debug(f'Rate limit {self.name}: waiting {wait:.2f}s')
+            await asyncio.sleep(wait)
+        return wait
+
+    async def block(self, seconds: float) -> None:
+        """Holds back every process for `seconds`, e.g. after the API answered 429."""
+        self.blocks += 1
+        logger.warning(f'Rate limit {self.name}: blocking all requests for {seconds:.1f}s')
+        await asyncio.to_thread(self._update, 0.0, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rate_per_minute': round(self.rate * 60, 2),
+            'burst': self.burst,
+            'acquired': self.acquired,
+            'delayed': self.delayed,
+            'seconds_waited': round(self.seconds_waited, 3),
+            'max_wait': round(self.max_wait, 3),
+            'blocks': self.blocks,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,165 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Tuple
+
+from google.adk.artifacts import BaseArtifactService
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_TTL = 30 * 60
+DEFAULT_SESSION_MAX_BYTES = 64 * 1024 * 1024
+
+SessionKey = Tuple[str, str, str]
+
+
+@dataclass
+class _SessionUsage:
+    last_used: float = field(default_factory=time.monotonic)
+    bytes: int = 0
+
+
+class BoundedSessionService(InMemorySessionService):
+    """In-memory ADK session service with a bounded footprint.
+
+    The A2A executors open one session per context id and never close them, so
+    this service evicts sessions idle for longer than `ttl` seconds and, least
+    recently used first, sessions beyond `max_sessions` or beyond `max_bytes` of
+    serialized events. Every create, get and append sweeps, so idle sessions go
+    even when no new ones are created. Session ids in `pinned` (requests still
+    running) are never evicted. The session's artifacts are deleted with it when an
+    `artifact_service` is given.
+    """
+
+    def __init__(
+            self,
+            max_sessions: Optional[int] = None,
+            ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+            artifact_service: Optional[BaseArtifactService] = None,
+    ):
+        super().__init__()
+        self.max_sessions = max_sessions or int(os.getenv('AGENT_MAX_SESSIONS', DEFAULT_MAX_SESSIONS))
+        self.ttl = ttl or float(os.getenv('AGENT_SESSION_TTL', DEFAULT_SESSION_TTL))
+        self.max_bytes = max_bytes or int(os.getenv('AGENT_SESSION_MAX_BYTES', DEFAULT_SESSION_MAX_BYTES))
+        self.artifact_service = artifact_service
+        self.pinned: Set[str] = set()
+
+        self._usage: OrderedDict[SessionKey, _SessionUsage] = OrderedDict()
+        self._bytes = 0
+        self.created = 0
+        self.evictions = 0
+
+    def _touch(self, key: SessionKey) -> Optional[_SessionUsage]:
+        usage = self._usage.get(key)
+        if usage is not None:
+            usage.last_used = time.monotonic()
+            self._usage.move_to_end(key)
+        return usage
+
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[Dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        # Make room first so the new session is never the one evicted.
+        await self.evict(reserve=1)
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._usage[(app_name, user_id, session.id)] = _SessionUsage()
+        self.created += 1
+        return session
+
+    async def get_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            session_id: str,
+            config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        await self.evict()
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            self._touch((app_name, user_id, session_id))
+        return session
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if not event.partial:
+            usage = self._touch((session.app_name, session.user_id, session.id))
+            if usage is not None:
+                size = len(event.model_dump_json(exclude_none=True))
+                usage.bytes += size
+                self._bytes += size
+            await self.evict()
+        return event
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        usage = self._usage.pop((app_name, user_id, session_id), None)
+        if usage is not None:
+            self._bytes -= usage.bytes
+
+    async def evict(self, reserve: int = 0) -> int:
+        """Deletes idle sessions and the least recently used ones over the caps.
+
+        Args:
+            reserve: Sessions about to be created, to leave room for.
+
+        Returns:
+            The number of sessions evicted.
+        """
+        now = time.monotonic()
+        evicted = 0
+        for key, usage in list(self._usage.items()):
+            over_budget = len(self._usage) + reserve > self.max_sessions or self._bytes > self.max_bytes
+            if not over_budget and now - usage.last_used <= self.ttl:
+                # Sessions are in least recently used order; the rest are newer.
+                break
+            if key[2] in self.pinned:
+                continue
+            await self._evict_session(*key)
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            logger.info(f'Evicted {evicted} sessions, {len(self._usage)} resident ({self._bytes} bytes)')
+        return evicted
+
+    async def _evict_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        await self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if self.artifact_service is None:
+            return
+        filenames = await self.artifact_service.list_artifact_keys(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        for filename in filenames:
+            # `user:` artifacts are shared by all sessions of the user.
+            if not filename.startswith('user:'):
+                await self.artifact_service.delete_artifact(
+                    app_name=app_name, user_id=user_id, filename=filename, session_id=session_id
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'resident_sessions': len(self._usage),
+            'resident_bytes': self._bytes,
+            'pinned': len(self.pinned),
+            'created': self.created,
+            'evictions': self.evictions,
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+        }
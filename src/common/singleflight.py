@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight awaitable.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and share its result or exception. A
+    cancelled caller leaves the work running for the others, and the work is
+    cancelled once the last caller waiting for it is gone.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.deduplicated += 1
+            logger.debug(f'Joining in-flight call for {key}')
+        else:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        flight.waiters += 1
+        try:
+            # Shield so one cancelled caller does not cancel the work for the others.
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                logger.debug(f'Cancelling abandoned call for {key}')
+                self.abandoned += 1
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'deduplicated': self.deduplicated,
+            'abandoned': self.abandoned,
+            'in_flight': len(self._inflight),
+        }
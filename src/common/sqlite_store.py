@@ -0,0 +1,476 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from a2a.server.context import ServerCallContext
+from a2a.server.tasks import TaskStore
+from a2a.types import Task
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from common.session_store import DEFAULT_SESSION_TTL
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = Path.home() / '.cache' / 'agentic-stock-analysis'
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_CANCEL_POLL_INTERVAL = 0.5
+# Requests for contexts no worker is running are dropped after this many seconds.
+CANCELLATION_TTL = 60.0
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY,
+        context_id TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS sessions (
+        app_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        id TEXT NOT NULL,
+        state BLOB NOT NULL,
+        update_time REAL NOT NULL,
+        PRIMARY KEY (app_name, user_id, id)
+    )""",
+    'CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (update_time)',
+    """CREATE TABLE IF NOT EXISTS events (
+        app_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        payload BLOB NOT NULL,
+        size INTEGER NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, timestamp)',
+    """CREATE TABLE IF NOT EXISTS app_state (
+        app_name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (app_name, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS user_state (
+        app_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (app_name, user_id, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS cancellations (
+        context_id TEXT PRIMARY KEY,
+        requested_at REAL NOT NULL
+    )""",
+)
+
+Statement = Tuple[str, Tuple[Any, ...]]
+
+
+def default_store_path(name: str) -> Path:
+    """Database file for the agent called `name`, e.g. 'Balance Sheet Agent' -> balance_sheet_agent.sqlite3."""
+    directory = Path(os.getenv('AGENT_STORE_DIR', DEFAULT_STORE_DIR))
+    return directory / f"{'_'.join(name.lower().split())}.sqlite3"
+
+
+def _pack(text: str) -> bytes:
+    return zlib.compress(text.encode('utf-8'))
+
+
+def _unpack(payload: bytes) -> str:
+    return zlib.decompress(payload).decode('utf-8')
+
+
+class SQLiteDatabase:
+    """SQLite file shared by the task store and session service of one agent.
+
+    The database runs in WAL mode so several server processes can read while
+    one writes. Writes are queued and committed together in one transaction
+    every `flush_interval` seconds, or as soon as `batch_size` statements are
+    pending; every read flushes the queue first, so a process always reads its
+    own writes. A statement that fails is rolled back on its own and logged,
+    so it never drops the other writes of its batch.
+    """
+
+    def __init__(
+            self,
+            path: str | Path,
+            flush_interval: Optional[float] = None,
+            batch_size: Optional[int] = None,
+    ):
+        self.path = Path(path)
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.getenv('AGENT_STORE_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        )
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        # Other worker processes may hold the write lock for a short batch.
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        # Metrics read through their own connection: in WAL mode it never waits for
+        # the write lock `_commit` may hold, so a scrape cannot stall the event loop.
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(
+            f'{self.path.resolve().as_uri()}?mode=ro', uri=True, check_same_thread=False
+        )
+
+        self._pending: List[Statement] = []
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+
+    def write(self, sql: str, params: Tuple[Any, ...]) -> None:
+        """Queues a write for the next batch."""
+        self._pending.append((sql, params))
+        if len(self._pending) >= self.batch_size:
+            self._track(asyncio.ensure_future(self.flush()))
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = self._track(asyncio.ensure_future(self._flush_later()))
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        # Background flushes are referenced until done, and their errors logged.
+        self._flushes.add(task)
+        task.add_done_callback(self._flushed)
+        return task
+
+    def _flushed(self, task: asyncio.Task) -> None:
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f'Flushing {self.path} failed: {task.exception()!r}')
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Commits every queued write in one transaction."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Batches must commit in the order they were queued.
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            await asyncio.to_thread(self._commit, batch)
+
+    def _commit(self, batch: List[Statement]) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            failed = 0
+            try:
+                for sql, params in batch:
+                    self._conn.execute('SAVEPOINT statement')
+                    try:
+                        self._conn.execute(sql, params)
+                    except sqlite3.DatabaseError as e:
+                        self._conn.execute('ROLLBACK TO statement')
+                        failed += 1
+                        logger.error(f'Dropped write to {self.path}: {e!r} in {" ".join(sql.split()[:4])}')
+                    self._conn.execute('RELEASE statement')
+                self._conn.execute('COMMIT')
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+        self.batches += 1
+        self.writes += len(batch) - failed
+        self.failed += failed
+
+    async def fetchone(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[Tuple[Any, ...]]:
+        await self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    async def fetchall(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        await self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def peek(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[Tuple[Any, ...]]:
+        """Reads committed rows only, without flushing or waiting for a commit; for metrics."""
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchone()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            'batches': self.batches,
+            'writes': self.writes,
+            'failed': self.failed,
+            'pending': len(self._pending),
+        }
+
+    async def aclose(self) -> None:
+        await self.flush()
+        with self._read_lock:
+            self._reader.close()
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteTaskStore(TaskStore):
+    """A2A task store persisted in a `SQLiteDatabase`.
+
+    Tasks are stored as compressed JSON so in-flight and finished tasks survive
+    a restart and can be read by every worker process of the agent.
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def save(self, task: Task, context: ServerCallContext | None = None) -> None:
+        self.database.write(
+            'INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?)',
+            (task.id, task.context_id, _pack(task.model_dump_json(exclude_none=True)), time.time()),
+        )
+
+    async def get(self, task_id: str, context: ServerCallContext | None = None) -> Task | None:
+        row = await self.database.fetchone('SELECT payload FROM tasks WHERE id=?', (task_id,))
+        if row is None:
+            return None
+        return Task.model_validate_json(_unpack(row[0]))
+
+    async def delete(self, task_id: str, context: ServerCallContext | None = None) -> None:
+        self.database.write('DELETE FROM tasks WHERE id=?', (task_id,))
+
+
+class SQLiteSessionService(BaseSessionService):
+    """ADK session service persisted in a `SQLiteDatabase`.
+
+    Events are stored one row each as compressed JSON; session state is stored
+    per session and app/user scoped state per key, so concurrent sessions never
+    overwrite each other's keys. Sessions not updated for `ttl` seconds are
+    deleted when new sessions are created, except the ones in `pinned`.
+    """
+
+    def __init__(self, database: SQLiteDatabase, ttl: Optional[float] = None):
+        self.database = database
+        self.ttl = ttl or float(os.getenv('AGENT_SESSION_TTL', DEFAULT_SESSION_TTL))
+        self.pinned: Set[str] = set()
+        self.expired = 0
+
+    @staticmethod
+    def _session_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        # App and user scoped keys live in their own tables, temp keys are never stored.
+        return {
+            key: value for key, value in state.items()
+            if not key.startswith((State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX))
+        }
+
+    def _write_scoped_state(self, app_name: str, user_id: str, delta: Dict[str, Any]) -> None:
+        for key, value in delta.items():
+            if key.startswith(State.APP_PREFIX):
+                self.database.write(
+                    'INSERT OR REPLACE INTO app_state VALUES (?, ?, ?)',
+                    (app_name, key.removeprefix(State.APP_PREFIX), json.dumps(value)),
+                )
+            elif key.startswith(State.USER_PREFIX):
+                self.database.write(
+                    'INSERT OR REPLACE INTO user_state VALUES (?, ?, ?, ?)',
+                    (app_name, user_id, key.removeprefix(State.USER_PREFIX), json.dumps(value)),
+                )
+
+    async def _scoped_state(self, app_name: str, user_id: str) -> Dict[str, Any]:
+        state = {}
+        for key, value in await self.database.fetchall(
+                'SELECT key, value FROM app_state WHERE app_name=?', (app_name,)
+        ):
+            state[State.APP_PREFIX + key] = json.loads(value)
+        for key, value in await self.database.fetchall(
+                'SELECT key, value FROM user_state WHERE app_name=? AND user_id=?', (app_name, user_id)
+        ):
+            state[State.USER_PREFIX + key] = json.loads(value)
+        return state
+
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[Dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        await self.expire()
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        if await self.database.fetchone(
+                'SELECT 1 FROM sessions WHERE app_name=? AND user_id=? AND id=?',
+                (app_name, user_id, session_id),
+        ):
+            raise ValueError(f'Session with id {session_id} already exists.')
+
+        state = state or {}
+        session_state = self._session_state(state)
+        now = time.time()
+        self._write_scoped_state(app_name, user_id, state)
+        self.database.write(
+            # Another worker may have created it meanwhile; its row is kept.
+            'INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?)',
+            (app_name, user_id, session_id, _pack(json.dumps(session_state)), now),
+        )
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state={**session_state, **await self._scoped_state(app_name, user_id)},
+            last_update_time=now,
+        )
+
+    async def get_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            session_id: str,
+            config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        row = await self.database.fetchone(
+            'SELECT state, update_time FROM sessions WHERE app_name=? AND user_id=? AND id=?',
+            (app_name, user_id, session_id),
+        )
+        if row is None:
+            return None
+        state, update_time = row
+
+        query = 'SELECT payload FROM events WHERE app_name=? AND user_id=? AND session_id=?'
+        params: Tuple[Any, ...] = (app_name, user_id, session_id)
+        if config and config.after_timestamp is not None:
+            query += ' AND timestamp >= ?'
+            params += (config.after_timestamp,)
+        query += ' ORDER BY timestamp DESC, rowid DESC'
+        if config and config.num_recent_events is not None:
+            query += ' LIMIT ?'
+            params += (config.num_recent_events,)
+        events = [
+            Event.model_validate_json(_unpack(payload))
+            for payload, in reversed(await self.database.fetchall(query, params))
+        ]
+
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state={**json.loads(_unpack(state)), **await self._scoped_state(app_name, user_id)},
+            events=events,
+            last_update_time=update_time,
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        query = 'SELECT user_id, id, update_time FROM sessions WHERE app_name=?'
+        params: Tuple[Any, ...] = (app_name,)
+        if user_id is not None:
+            query += ' AND user_id=?'
+            params += (user_id,)
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=row_user, id=row_id, state={}, last_update_time=update_time)
+            for row_user, row_id, update_time in await self.database.fetchall(query, params)
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self.database.write(
+            'DELETE FROM events WHERE app_name=? AND user_id=? AND session_id=?',
+            (app_name, user_id, session_id),
+        )
+        self.database.write(
+            'DELETE FROM sessions WHERE app_name=? AND user_id=? AND id=?',
+            (app_name, user_id, session_id),
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        payload = _pack(event.model_dump_json(exclude_none=True))
+        self.database.write(
+            'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)',
+            (session.app_name, session.user_id, session.id, event.timestamp, payload, len(payload)),
+        )
+        if event.actions and event.actions.state_delta:
+            self._write_scoped_state(session.app_name, session.user_id, event.actions.state_delta)
+        self.database.write(
+            'UPDATE sessions SET state=?, update_time=? WHERE app_name=? AND user_id=? AND id=?',
+            (_pack(json.dumps(self._session_state(session.state))), event.timestamp, session.app_name, session.user_id, session.id),
+        )
+        return event
+
+    async def expire(self) -> int:
+        """Deletes sessions, and the tasks of their context, not updated for longer than the TTL."""
+        rows = await self.database.fetchall(
+            'SELECT app_name, user_id, id FROM sessions WHERE update_time < ?',
+            (time.time() - self.ttl,),
+        )
+        expired = [row for row in rows if row[2] not in self.pinned]
+        for app_name, user_id, session_id in expired:
+            await self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+            # The executors use the A2A context id as session id.
+            self.database.write('DELETE FROM tasks WHERE context_id=?', (session_id,))
+        self.expired += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        sessions, = self.database.peek('SELECT COUNT(*) FROM sessions')
+        events, size = self.database.peek('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM events')
+        return {
+            'resident_sessions': sessions,
+            'events': events,
+            'resident_bytes': size,
+            'pinned': len(self.pinned),
+            'expired': self.expired,
+            'database': self.database.stats(),
+        }
+
+
+class SQLiteCancellations:
+    """Cancellation requests shared by the worker processes of one agent.
+
+    A2A `tasks/cancel` reaches whichever worker accepted the connection, which
+    is usually not the one running the task. That worker records the request
+    here, and the worker running the context picks it up within
+    `poll_interval` seconds.
+    """
+
+    def __init__(self, database: SQLiteDatabase, poll_interval: Optional[float] = None):
+        self.database = database
+        self.poll_interval = poll_interval if poll_interval is not None else float(
+            os.getenv('AGENT_CANCEL_POLL_INTERVAL', DEFAULT_CANCEL_POLL_INTERVAL)
+        )
+
+    def request(self, context_id: str) -> None:
+        """Asks the worker running `context_id` to cancel it."""
+        self.database.write('INSERT OR REPLACE INTO cancellations VALUES (?, ?)', (context_id, time.time()))
+
+    def clear(self, context_id: str) -> None:
+        """Forgets earlier requests for `context_id`, when a new request starts in it."""
+        self.database.write('DELETE FROM cancellations WHERE context_id=?', (context_id,))
+
+    async def take(self, context_ids: List[str]) -> List[str]:
+        """Returns, and removes, the contexts among `context_ids` that were asked to cancel."""
+        self.database.write('DELETE FROM cancellations WHERE requested_at < ?', (time.time() - CANCELLATION_TTL,))
+        if not context_ids:
+            return []
+        rows = await self.database.fetchall(
+            f'SELECT context_id FROM cancellations WHERE context_id IN ({", ".join("?" * len(context_ids))})',
+            tuple(context_ids),
+        )
+        canceled = [context_id for context_id, in rows]
+        for context_id in canceled:
+            self.clear(context_id)
+        return canceled
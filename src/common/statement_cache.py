@@ -0,0 +1,203 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'agentic-stock-analysis' / 'fmp_statements.sqlite3'
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# FMP's legacy endpoints spell it `fillingDate`, the stable ones `filingDate`.
+FILING_DATE_FIELDS = ('acceptedDate', 'filingDate', 'fillingDate')
+
+CacheKey = Tuple[str, str, Optional[str], Optional[int]]
+
+
+def latest_filing(payload: Any) -> Optional[str]:
+    """Returns the most recent filing timestamp found in an FMP statement payload.
+
+    Dates are ISO formatted, so the lexicographic maximum is the latest one.
+    """
+    if not isinstance(payload, list):
+        return None
+    latest = None
+    for row in payload:
+        if not isinstance(row, dict):
+            continue
+        for field in FILING_DATE_FIELDS:
+            value = row.get(field)
+            if value:
+                if latest is None or str(value) > latest:
+                    latest = str(value)
+                break
+    return latest
+
+
+@dataclass
+class CacheEntry:
+    text: str
+    fetched_at: float
+    latest_filing: Optional[str]
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class StatementCache:
+    """Persistent SQLite cache for FMP statement responses.
+
+    Entries are keyed by (endpoint, symbol, period, limit), expire after `ttl`
+    seconds and are evicted least recently used first once the stored payloads
+    exceed `max_bytes`. Expired entries are kept so the caller can revalidate
+    them against the latest filing date instead of downloading the full history.
+    """
+
+    def __init__(
+            self,
+            path: Optional[str | Path] = None,
+            ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+    ):
+        self.path = Path(path or os.getenv('FMP_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.ttl = ttl if ttl is not None else float(os.getenv('FMP_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        self.max_bytes = max_bytes or int(os.getenv('FMP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS statements (
+                endpoint TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                period TEXT NOT NULL,
+                lim INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                latest_filing TEXT,
+                PRIMARY KEY (endpoint, symbol, period, lim)
+            )"""
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS statements_accessed ON statements (accessed_at)'
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _row_key(key: CacheKey) -> Tuple[str, str, str, int]:
+        # NULL never matches in a primary key lookup, so store sentinels instead.
+        endpoint, symbol, period, limit = key
+        return endpoint, symbol.upper(), period or '', limit if limit is not None else -1
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Returns the cached entry for `key`, fresh or expired, or None."""
+        row_key = self._row_key(key)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, fetched_at, latest_filing FROM statements '
+                'WHERE endpoint=? AND symbol=? AND period=? AND lim=?',
+                row_key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE statements SET accessed_at=? '
+                'WHERE endpoint=? AND symbol=? AND period=? AND lim=?',
+                (time.time(), *row_key),
+            )
+        payload, fetched_at, filing = row
+        return CacheEntry(zlib.decompress(payload).decode('utf-8'), fetched_at, filing)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def put(self, key: CacheKey, text: str, filing: Optional[str]) -> None:
+        """Stores `text` for `key` and evicts the least recently used entries over budget.
+
+        Any other cached variant of the same (endpoint, symbol, period) whose latest
+        filing is older than `filing` is dropped, since it misses the newly filed
+        period. Annual and quarterly filings are dated independently, so a new
+        quarter never drops the annual entries.
+        """
+        row_key = self._row_key(key)
+        payload = zlib.compress(text.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            if filing is not None:
+                cursor = self._conn.execute(
+                    'DELETE FROM statements WHERE endpoint=? AND symbol=? AND period=? '
+                    'AND latest_filing IS NOT NULL AND latest_filing < ?',
+                    (row_key[0], row_key[1], row_key[2], filing),
+                )
+                self.invalidations += max(cursor.rowcount, 0)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (*row_key, payload, len(payload), now, now, filing),
+            )
+            self._evict()
+
+    def touch(self, key: CacheKey) -> None:
+        """Marks an expired entry as fresh again after it was revalidated upstream."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE statements SET fetched_at=? '
+                'WHERE endpoint=? AND symbol=? AND period=? AND lim=?',
+                (time.time(), *self._row_key(key)),
+            )
+
+    def _evict(self) -> None:
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM statements').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT rowid, size FROM statements ORDER BY accessed_at ASC'
+        ).fetchall()
+        evicted = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self._conn.executemany('DELETE FROM statements WHERE rowid=?', evicted)
+        self.evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM statements')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM statements'
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,521 @@
+import asyncio
+import contextlib
+import inspect
+import logging
+import time
+from typing import Any, Optional
+
+from a2a.server.agent_execution import AgentExecutor
+from a2a.server.agent_execution.context import RequestContext
+from a2a.server.events.event_queue import EventQueue
+from google.adk import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
+from google.adk.sessions import Session
+from a2a.server.tasks import TaskUpdater
+from a2a.types import (
+    AgentCard,
+    FilePart,
+    FileWithBytes,
+    FileWithUri,
+    Part,
+    TaskState,
+    TextPart,
+)
+from google.genai import types
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+
+from common.admission import INTERACTIVE, PRIORITIES, AdmissionController, AdmissionRejected
+from common.agent_stores import partial_metadata
+from common.analysis_cache import (
+    AnalysisCache,
+    CachedAnalysis,
+    ToolCall,
+    digest,
+    get_analysis_cache,
+    normalize_task,
+)
+from common.sqlite_store import SQLiteCancellations
+from common.tracing import extract_context, tracer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+DEFAULT_USER_ID = 'self'
+
+
+class StatementExecutor(AgentExecutor):
+    """Runs one ADK statement agent for A2A requests.
+
+    Every A2A context maps to one ADK session of the runner. Partial model output
+    is published as `working` status messages marked partial, which are not kept
+    in the stored task, and the final response as the task artifact.
+
+    Final responses are cached (see `AnalysisCache`): a repeated request whose
+    tool calls still return the same statement data is answered from the cache,
+    and identical requests arriving while one is running share that run. Either
+    way the exchange is appended to the session, so follow-up questions see it.
+
+    Agent runs are admitted by an `AdmissionController`, using the `user_id`
+    and `priority` (`interactive` or `batch`) of the request metadata. Requests
+    shed because its queue is full end in the `rejected` state.
+
+    Runs, identical in-flight requests and admission are tracked per process.
+    When several worker processes serve the agent, a cancel that reaches a
+    worker not running the context is passed on through `cancellations`, so
+    the worker running it stops it.
+    """
+
+    def __init__(
+            self,
+            runner: Runner,
+            card: AgentCard,
+            cache: Optional[AnalysisCache] = None,
+            admission: Optional[AdmissionController] = None,
+            cancellations: Optional[SQLiteCancellations] = None,
+    ):
+        self.runner = runner
+        self._card = card
+        self._admission = admission or AdmissionController()
+        # Shared with a bounded session service so running sessions are never evicted.
+        self._active_sessions: set[str] = getattr(runner.session_service, 'pinned', set())
+        # The task driving `runner.run_async` for every context with a running request.
+        self._running: dict[str, asyncio.Task] = {}
+        self._cancellations = cancellations
+        self._cancel_watcher: Optional[asyncio.Task] = None
+        # Contexts whose run was canceled by a request to another worker.
+        self._canceled_remotely: set[str] = set()
+        self._cache = cache or get_analysis_cache()
+        # The run answering every cacheable request key, for identical concurrent requests to join.
+        self._in_flight: dict[str, asyncio.Task] = {}
+        agent = runner.agent
+        self._tools = {tool.__name__: tool for tool in getattr(agent, 'tools', []) if callable(tool)}
+        # Changes whenever the model, the instruction or the tools change.
+        self._agent_version = digest({
+            'agent': agent.name,
+            'model': getattr(getattr(agent, 'canonical_model', None), 'model', None),
+            'instruction': getattr(agent, 'instruction', None),
+            'tools': {name: tool.__doc__ for name, tool in self._tools.items()},
+        })
+
+    async def _process_request(
+            self,
+            new_message: types.Content,
+            session_id: str,
+            task_updater: TaskUpdater,
+            user: Optional[str] = None,
+            priority: str = INTERACTIVE,
+    ) -> None:
+        session_obj = await self._upsert_session(session_id)
+        # Update session_id with the ID from the resolved session object.
+        # (it may be the same as the one passed in if it already exists)
+        session_id = session_obj.id
+
+        # Track this session as active
+        self._active_sessions.add(session_id)
+
+        run = asyncio.create_task(
+            self._answer(new_message, session_obj, task_updater, user or session_id, priority)
+        )
+        self._running[session_id] = run
+        if self._cancellations is not None:
+            self._cancellations.clear(session_id)
+            if self._cancel_watcher is None or self._cancel_watcher.done():
+                self._cancel_watcher = asyncio.create_task(self._watch_cancellations())
+        try:
+            await run
+        except AdmissionRejected as e:
+            logger.warning(f'Rejected request for session {session_id}: {e}')
+            await task_updater.update_status(
+                TaskState.rejected,
+                message=task_updater.new_agent_message(
+                    [Part(root=TextPart(text=str(e)))], metadata={'retry_after': e.retry_after}
+                ),
+                final=True,
+            )
+        except asyncio.CancelledError:
+            run.cancel()
+            if asyncio.current_task().cancelling():
+                raise
+            if session_id in self._canceled_remotely:
+                # The `cancel` of the other worker published the status to its own client only.
+                self._canceled_remotely.discard(session_id)
+                await task_updater.update_status(TaskState.canceled, final=True)
+            # Otherwise only the run was canceled, by `cancel`, which already published the status.
+            logger.info(f'Run for session {session_id} canceled')
+        finally:
+            if self._running.get(session_id) is run:
+                del self._running[session_id]
+            # Remove from active sessions when done
+            self._active_sessions.discard(session_id)
+
+    async def _answer(
+            self,
+            new_message: types.Content,
+            session: Session,
+            task_updater: TaskUpdater,
+            user: str,
+            priority: str,
+    ) -> None:
+        """Answers from the cache, from an identical in-flight run, or by running the agent."""
+        request_key = self._request_key(new_message, session)
+        if request_key is None:
+            await self._run_admitted(new_message, session.id, task_updater, user, priority)
+            return
+
+        cached, outcome = await self._lookup(request_key)
+        span = trace.get_current_span()
+        if cached is not None:
+            span.set_attribute('analysis_cache', 'hit')
+            self._cache.hits += 1
+            self._cache.seconds_saved += cached.elapsed
+            logger.info(f'Answering session {session.id} from the analysis cache')
+            parts = [Part.model_validate(part) for part in cached.parts]
+            await self._publish_answer(parts, new_message, session, task_updater)
+            return
+
+        while (leader := self._in_flight.get(request_key)) is not None and not leader.done():
+            try:
+                # Shielded so canceling this request leaves the shared run alone.
+                parts = await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                parts = None
+            except Exception:
+                parts = None
+            if parts is not None:
+                span.set_attribute('analysis_cache', 'joined')
+                self._cache.joined += 1
+                logger.info(f'Answering session {session.id} from an identical in-flight run')
+                await self._publish_answer(parts, new_message, session, task_updater)
+                return
+            # The shared run failed or was canceled; the first waiter to get here runs it again.
+
+        if outcome == 'stale':
+            self._cache.stale += 1
+        else:
+            self._cache.misses += 1
+        span.set_attribute('analysis_cache', 'stale' if outcome == 'stale' else 'miss')
+        run = asyncio.create_task(
+            self._run_admitted(new_message, session.id, task_updater, user, priority, request_key)
+        )
+        self._in_flight[request_key] = run
+        try:
+            await run
+        finally:
+            if self._in_flight.get(request_key) is run:
+                del self._in_flight[request_key]
+
+    def _request_key(self, new_message: types.Content, session: Session) -> Optional[str]:
+        """Returns the analysis cache key of a text request, or None if it is not cacheable."""
+        if self._cache is None or not new_message.parts or any(not part.text for part in new_message.parts):
+            return None
+        history = [
+            (event.author, [part.text for part in event.content.parts if part.text])
+            for event in session.events if event.content and event.content.parts
+        ]
+        return digest({
+            'agent': self._agent_version,
+            'history': history,
+            'task': normalize_task(' '.join(part.text for part in new_message.parts)),
+        })
+
+    async def _lookup(self, request_key: str) -> tuple[Optional[CachedAnalysis], str]:
+        """Returns the cached answer for `request_key` if its tool calls still return the same data.
+
+        The calls are re-run, which is cheap as the statements come from the
+        statement cache, and their responses compared with the recorded digests.
+        """
+        cached = await asyncio.to_thread(self._cache.get, request_key)
+        if cached is None:
+            return None, 'miss'
+        digests = await asyncio.gather(
+            *(self._call_tool(call.name, call.args) for call in cached.calls), return_exceptions=True
+        )
+        if all(found == call.response_digest for found, call in zip(digests, cached.calls)):
+            return cached, 'hit'
+        logger.info(f'Cached analysis {request_key[:12]} is based on outdated data')
+        await asyncio.to_thread(self._cache.delete, request_key)
+        return None, 'stale'
+
+    async def _call_tool(self, name: str, args: dict[str, Any]) -> str:
+        """Calls a tool of the agent and returns the digest of its response as ADK wraps it."""
+        result = self._tools[name](**args)
+        if inspect.isawaitable(result):
+            result = await result
+        return digest(result if isinstance(result, dict) else {'result': result})
+
+    async def _publish_answer(
+            self,
+            parts: list[Part],
+            new_message: types.Content,
+            session: Session,
+            task_updater: TaskUpdater
+    ) -> None:
+        """Publishes an answer produced by another run and records the exchange in `session`."""
+        invocation_id = Event.new_id()
+        await self.runner.session_service.append_event(
+            session, Event(invocation_id=invocation_id, author='user', content=new_message)
+        )
+        await self.runner.session_service.append_event(session, Event(
+            invocation_id=invocation_id,
+            author=self.runner.agent.name,
+            content=types.Content(role='model', parts=[convert_a2a_part_to_genai(part) for part in parts]),
+        ))
+        await task_updater.add_artifact(parts)
+        await task_updater.update_status(TaskState.completed, final=True)
+
+    async def _run_admitted(
+            self,
+            new_message: types.Content,
+            session_id: str,
+            task_updater: TaskUpdater,
+            user: str,
+            priority: str,
+            request_key: Optional[str] = None,
+    ) -> Optional[list[Part]]:
+        """Runs the agent once the admission controller grants a slot."""
+        async with self._admission.admit(user, priority) as waited:
+            trace.get_current_span().set_attribute('admission.wait_ms', round(waited * 1000, 1))
+            if waited > 0:
+                logger.info(f'Session {session_id} waited {waited:.2f}s for a {priority} slot')
+            return await self._run_agent(new_message, session_id, task_updater, request_key)
+
+    async def _run_agent(
+            self,
+            new_message: types.Content,
+            session_id: str,
+            task_updater: TaskUpdater,
+            request_key: Optional[str] = None,
+    ) -> Optional[list[Part]]:
+        """Runs the agent, publishing its output, and returns the parts of the final response."""
+        start = time.perf_counter()
+        calls: dict[str, types.FunctionCall] = {}
+        tool_calls: list[ToolCall] = []
+        # Closed here rather than by the garbage collector, so the runner's spans end
+        # inside this request's span and in the task that opened them.
+        async with contextlib.aclosing(self.runner.run_async(
+                session_id=session_id,
+                user_id=DEFAULT_USER_ID,
+                new_message=new_message,
+                # Stream partial model output so the host sees text before the analysis is done.
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        )) as events:
+            async for event in events:
+                if event.is_final_response():
+                    parts = [
+                        _as_part(convert_genai_part_to_a2a(part))
+                        for part in event.content.parts if (part.text or part.file_data or part.inline_data)
+                    ]
+                    logger.debug('Yielding final response: %s', parts)
+                    await task_updater.add_artifact(parts)
+                    await task_updater.update_status(
+                        TaskState.completed, final=True
+                    )
+                    if request_key is not None and self._cache is not None:
+                        await asyncio.to_thread(
+                            self._cache.put,
+                            request_key,
+                            self._card.name,
+                            [part.model_dump(mode='json') for part in parts],
+                            tool_calls,
+                            time.perf_counter() - start,
+                        )
+                    return parts
+
+                for call in event.get_function_calls():
+                    calls[call.id] = call
+                for response in event.get_function_responses():
+                    call = calls.get(response.id)
+                    if call is not None:
+                        tool_calls.append(ToolCall(call.name, dict(call.args or {}), digest(response.response)))
+
+                if not event.get_function_calls():
+                    parts = [
+                        convert_genai_part_to_a2a(part)
+                        for part in (event.content.parts if event.content else None) or []
+                        if (
+                            part.text
+                            or part.file_data
+                            or part.inline_data
+                        )
+                    ]
+                    if not parts:
+                        continue
+                    logger.debug('Yielding update response')
+                    await task_updater.update_status(
+                        TaskState.working,
+                        message=task_updater.new_agent_message(parts, metadata=partial_metadata()),
+                    )
+                else:
+                    logger.debug('Skipping event')
+
+    async def execute(
+            self,
+            context: RequestContext,
+            event_queue: EventQueue
+    ):
+        # Run the agent until either complete or the task is suspended.
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        # Immediately notify that the task is submitted.
+        if not context.current_task:
+            await updater.update_status(TaskState.submitted)
+        await updater.update_status(TaskState.working)
+        metadata = {**context.metadata, **(context.message.metadata or {})}
+        priority = metadata.get('priority', INTERACTIVE)
+        if priority not in PRIORITIES:
+            priority = INTERACTIVE
+        # Continues the trace of the caller, passed along in the message metadata.
+        with tracer.start_as_current_span(
+                'StatementExecutor._process_request',
+                context=extract_context(metadata),
+                kind=SpanKind.SERVER,
+                attributes={
+                    'agent.name': self._card.name,
+                    'a2a.task_id': context.task_id,
+                    'a2a.context_id': context.context_id,
+                    'admission.priority': priority,
+                },
+        ):
+            await self._process_request(
+                types.UserContent(
+                    parts=[
+                        convert_a2a_part_to_genai(part) for part in context.message.parts
+                    ],
+                ),
+                context.context_id,
+                updater,
+                metadata.get('user_id'),
+                priority,
+            )
+        logger.debug('[search] execute exiting')
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue):
+        """Cancel the execution for the given context.
+
+        Cancels the task running the ADK runner, which stops any in-flight FMP
+        fetch or model call, frees the session and publishes a `canceled` status.
+        """
+        session_id = context.context_id
+        run = self._running.pop(session_id, None)
+        if run is not None:
+            logger.info(f'Cancellation requested for active session: {session_id}')
+            run.cancel()
+            self._active_sessions.discard(session_id)
+        elif self._cancellations is not None:
+            # Another worker may be running it.
+            logger.info(f'Cancellation requested for session {session_id} not running here')
+            self._cancellations.request(session_id)
+        else:
+            logger.debug(f'Cancellation requested for inactive session: {session_id}')
+
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await updater.update_status(TaskState.canceled, final=True)
+
+    async def _watch_cancellations(self) -> None:
+        """Cancels the runs other workers were asked to cancel, while this worker has any."""
+        while self._running:
+            await asyncio.sleep(self._cancellations.poll_interval)
+            try:
+                canceled = await self._cancellations.take(list(self._running))
+            except Exception as e:
+                logger.warning(f'Reading cancellation requests failed: {e!r}')
+                continue
+            for session_id in canceled:
+                run = self._running.pop(session_id, None)
+                if run is not None:
+                    logger.info(f'Cancellation requested through another worker for session: {session_id}')
+                    self._canceled_remotely.add(session_id)
+                    run.cancel()
+                    self._active_sessions.discard(session_id)
+
+    async def _upsert_session(self, session_id: str) -> 'Session':
+        """Retrieves a session if it exists, otherwise creates a new one.
+
+        Ensures that async session service methods are properly awaited.
+        """
+        session = await self.runner.session_service.get_session(
+            app_name=self.runner.app_name,
+            user_id=DEFAULT_USER_ID,
+            session_id=session_id,
+        )
+        if session is None:
+            session = await self.runner.session_service.create_session(
+                app_name=self.runner.app_name,
+                user_id=DEFAULT_USER_ID,
+                session_id=session_id,
+            )
+        return session
+
+
+def _as_part(part: TextPart | FilePart | Part) -> Part:
+    return part if isinstance(part, Part) else Part(root=part)
+
+
+def convert_a2a_part_to_genai(part: Part) -> types.Part:
+    """Convert a single A2A Part type into a Google Gen AI Part type.
+
+    Args:
+        part: The A2A Part to convert
+
+    Returns:
+        The equivalent Google Gen AI Part
+
+    Raises:
+        ValueError: If the part type is not supported
+    """
+    part = part.root
+    if isinstance(part, TextPart):
+        return types.Part(text=part.text)
+    if isinstance(part, FilePart):
+        if isinstance(part.file, FileWithUri):
+            return types.Part(
+                file_data=types.FileData(
+                    file_uri=part.file.uri, mime_type=part.file.mime_type
+                )
+            )
+        if isinstance(part.file, FileWithBytes):
+            return types.Part(
+                inline_data=types.Blob(
+                    data=part.file.bytes, mime_type=part.file.mime_type
+                )
+            )
+        raise ValueError(f'Unsupported file type: {type(part.file)}')
+    raise ValueError(f'Unsupported part type: {type(part)}')
+
+
+
+def convert_genai_part_to_a2a(part: types.Part) -> Part:
+    """Convert a single Google Gen AI Part type into an A2A Part type.
+
+    Args:
+        part: The Google Gen AI Part to convert
+
+    Returns:
+        The equivalent A2A Part
+
+    Raises:
+        ValueError: If the part type is not supported
+    """
+    if part.text:
+        return TextPart(text=part.text)
+    if part.file_data:
+        return FilePart(
+            file=FileWithUri(
+                uri=part.file_data.file_uri,
+                mime_type=part.file_data.mime_type,
+            )
+        )
+    if part.inline_data:
+        return Part(
+            root=FilePart(
+                file=FileWithBytes(
+                    bytes=part.inline_data.data,
+                    mime_type=part.inline_data.mime_type,
+                )
+            )
+        )
+    raise ValueError(f'Unsupported part type: {part}')
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from common.statement_frame import StatementFrame, render_comparison
+
+
+# Line items handed to the model per endpoint. None keeps every line item. The
+# as-reported endpoints use the filer's lower case XBRL concept names, nested
+# under `data`; their list holds the us-gaap concepts most filers report.
+DEFAULT_FIELDS: Dict[str, Optional[List[str]]] = {
+    'balance-sheet-statement': [
+        'cashAndCashEquivalents',
+        'cashAndShortTermInvestments',
+        'netReceivables',
+        'inventory',
+        'totalCurrentAssets',
+        'propertyPlantEquipmentNet',
+        'goodwillAndIntangibleAssets',
+        'totalAssets',
+        'accountPayables',
+        'shortTermDebt',
+        'deferredRevenue',
+        'totalCurrentLiabilities',
+        'longTermDebt',
+        'totalLiabilities',
+        'retainedEarnings',
+        'totalStockholdersEquity',
+        'totalDebt',
+        'netDebt',
+    ],
+    'income-statement': [
+        'revenue',
+        'costOfRevenue',
+        'grossProfit',
+        'researchAndDevelopmentExpenses',
+        'sellingGeneralAndAdministrativeExpenses',
+        'operatingExpenses',
+        'operatingIncome',
+        'interestExpense',
+        'ebitda',
+        'incomeBeforeTax',
+        'incomeTaxExpense',
+        'netIncome',
+        'epsDiluted',
+        'weightedAverageShsOutDil',
+    ],
+    'cash-flow-statement-as-reported': [
+        'netincomeloss',
+        'depreciationdepletionandamortization',
+        'sharebasedcompensation',
+        'deferredincometaxexpensebenefit',
+        'increasedecreaseinaccountsreceivable',
+        'increasedecreaseininventories',
+        'increasedecreaseinaccountspayable',
+        'netcashprovidedbyusedinoperatingactivities',
+        'paymentstoacquirepropertyplantandequipment',
+        'paymentstoacquirebusinessesnetofcashacquired',
+        'netcashprovidedbyusedininvestingactivities',
+        'proceedsfromissuanceoflongtermdebt',
+        'repaymentsoflongtermdebt',
+        'paymentsforrepurchaseofcommonstock',
+        'paymentsofdividends',
+        'netcashprovidedbyusedinfinancingactivities',
+        'cashcashequivalentsrestrictedcashandrestrictedcashequivalents'
+        'periodincreasedecreaseincludingexchangerateeffect',
+        'cashcashequivalentsrestrictedcashandrestrictedcashequivalents',
+    ],
+}
+
+
+def field_whitelist(endpoint: str) -> Optional[List[str]]:
+    """Returns the line items to keep for `endpoint`, or None to keep all of them.
+
+    Overridden with a comma separated `FMP_FIELDS_<ENDPOINT>` environment variable,
+    e.g. `FMP_FIELDS_INCOME_STATEMENT=revenue,netIncome`; `*` keeps every line item.
+    """
+    override = os.getenv(f'FMP_FIELDS_{endpoint.upper().replace("-", "_")}')
+    if override is not None:
+        if override.strip() == '*':
+            return None
+        return [name.strip() for name in override.split(',') if name.strip()]
+    return DEFAULT_FIELDS.get(endpoint)
+
+
+def apply_whitelist(frame: StatementFrame, endpoint: str) -> StatementFrame:
+    """Drops the line items of `frame` that are not whitelisted for `endpoint`.
+
+    A frame with none of the whitelisted line items, e.g. from a filer using
+    other XBRL concepts, is kept whole rather than emptied.
+    """
+    fields = field_whitelist(endpoint)
+    if fields is None:
+        return frame
+    selected = frame.select(fields)
+    return selected if selected.columns else frame
+
+
+def render_peer_comparison(frames: Dict[str, Optional[StatementFrame]], endpoint: str) -> Optional[str]:
+    """Renders the whitelisted line items of several companies side by side, noting those without data."""
+    found = [
+        apply_whitelist(replace(frame, symbol=frame.symbol or symbol), endpoint)
+        for symbol, frame in frames.items() if frame is not None
+    ]
+    if not found:
+        return None
+    text = render_comparison(found)
+    missing = [symbol for symbol, frame in frames.items() if frame is None]
+    if missing:
+        text += f'\nNo data for: {", ".join(missing)}'
+    return text
@@ -0,0 +1,216 @@
+import json
+import logging
+import math
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# Descriptive fields of an FMP statement row that are not line items.
+METADATA_FIELDS = frozenset({
+    'date',
+    'symbol',
+    'reportedCurrency',
+    'cik',
+    'filingDate',
+    'fillingDate',
+    'acceptedDate',
+    'fiscalYear',
+    'calendarYear',
+    'period',
+    'link',
+    'finalLink',
+})
+
+
+def _period_label(row: Dict[str, Any]) -> str:
+    year = row.get('fiscalYear') or row.get('calendarYear') or str(row.get('date', ''))[:4]
+    period = row.get('period') or 'FY'
+    return f'{period} {year}' if period != 'FY' else f'FY{year}'
+
+
+def _period_sort_key(label: str) -> Tuple[str, str]:
+    # 'FY2024' or 'Q3 2024' -> (year, quarter), so quarters sort within their year.
+    if label.startswith('FY'):
+        return label[2:], ''
+    period, _, year = label.partition(' ')
+    return year, period
+
+
+def _line_items(row: Dict[str, Any]) -> Dict[str, Any]:
+    # The as-reported endpoints nest the line items under `data`.
+    if isinstance(row.get('data'), dict):
+        return row['data']
+    return {key: value for key, value in row.items() if key not in METADATA_FIELDS}
+
+
+def format_value(value: float) -> str:
+    """Formats a number compactly for prompts, e.g. 391035000000 -> 391.04B."""
+    if math.isnan(value):
+        return '-'
+    magnitude = abs(value)
+    if magnitude >= 1e9:
+        return f'{value / 1e9:.2f}B'
+    if magnitude >= 1e6:
+        return f'{value / 1e6:.1f}M'
+    if magnitude >= 1e3:
+        return f'{value / 1e3:.1f}K'
+    return f'{value:.4g}'
+
+
+@dataclass
+class StatementFrame:
+    """Columnar view of a financial statement.
+
+    Every line item is one float64 NumPy array aligned with `periods` and `dates`,
+    ordered from the oldest to the most recent period. Missing values are NaN.
+    """
+
+    symbol: str
+    periods: List[str]
+    dates: np.ndarray
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    currency: Optional[str] = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'StatementFrame':
+        """Builds a frame from the list of period rows returned by FMP."""
+        rows = sorted(
+            (row for row in records if isinstance(row, dict)),
+            key=lambda row: str(row.get('date', '')),
+        )
+        if not rows:
+            raise ValueError('Statement has no periods')
+
+        items = [_line_items(row) for row in rows]
+        names: Dict[str, None] = {}
+        for item in items:
+            for name, value in item.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    names.setdefault(name)
+
+        columns = {}
+        for name in names:
+            column = np.full(len(rows), np.nan)
+            for index, item in enumerate(items):
+                value = item.get(name)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    column[index] = value
+            columns[name] = column
+
+        return cls(
+            symbol=str(rows[-1].get('symbol', '')),
+            periods=[_period_label(row) for row in rows],
+            dates=np.array([row.get('date') or 'NaT' for row in rows], dtype='datetime64[D]'),
+            columns=columns,
+            currency=rows[-1].get('reportedCurrency'),
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> 'StatementFrame':
+        """Builds a frame from the raw JSON text of an FMP statement response.
+
+        Raises:
+            ValueError: If the response is not a list of periods (e.g. an FMP error message).
+        """
+        payload = json.loads(text)
+        if not isinstance(payload, list):
+            raise ValueError(f'Unexpected FMP response: {text[:200]}')
+        return cls.from_records(payload)
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def is_quarterly(self) -> bool:
+        return any(period.startswith('Q') for period in self.periods)
+
+    def to_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """Returns the line item names and a (line items x periods) float64 matrix."""
+        names = list(self.columns)
+        if not names:
+            return names, np.empty((0, len(self)))
+        return names, np.vstack([self.columns[name] for name in names])
+
+    def select(self, names: Iterable[str]) -> 'StatementFrame':
+        """Returns a frame with only the given line items, matched case-insensitively, in that order."""
+        lookup = {name.lower(): name for name in self.columns}
+        selected = {}
+        for name in names:
+            column_name = lookup.get(name.lower())
+            if column_name is not None:
+                selected[column_name] = self.columns[column_name]
+        return replace(self, columns=selected)
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> 'StatementFrame':
+        """Returns the periods whose statement date lies within [start, end] (ISO dates, inclusive)."""
+        mask = np.ones(len(self), dtype=bool)
+        if start:
+            mask &= self.dates >= np.datetime64(start, 'D')
+        if end:
+            mask &= self.dates <= np.datetime64(end, 'D')
+        if mask.all():
+            return self
+        return replace(
+            self,
+            periods=[period for period, kept in zip(self.periods, mask) if kept],
+            dates=self.dates[mask],
+            columns={name: column[mask] for name, column in self.columns.items()},
+        )
+
+    def get(self, name: str) -> np.ndarray:
+        """Returns the line item, or an all-NaN column when the statement does not report it."""
+        column = self.columns.get(name)
+        return column if column is not None else np.full(len(self), np.nan)
+
+    def render(self) -> str:
+        """Renders the frame as a compact pipe separated table for the model.
+
+        One row per line item and one column per period; line items that are
+        zero or missing in every period are left out.
+        """
+        header = f'{self.symbol} ({self.currency or "n/a"})'
+        lines = [' | '.join([header, *self.periods])]
+        for name, column in self.columns.items():
+            if np.all(np.isnan(column) | (column == 0)):
+                continue
+            lines.append(' | '.join([name, *(format_value(value) for value in column)]))
+        return '\n'.join(lines)
+
+
+def render_comparison(frames: List[StatementFrame]) -> str:
+    """Renders the same statement of several companies as one aligned table for the model.
+
+    Columns are the union of the fiscal periods of all frames, oldest first, so
+    companies with different fiscal year ends are compared by fiscal year. Rows
+    are grouped per line item with one row per company, in the order of
+    `frames`; a period or line item a company does not report shows as '-'.
+    Line items that are zero or missing for every company are left out.
+    """
+    periods = sorted({period for frame in frames for period in frame.periods}, key=_period_sort_key)
+    names: Dict[str, None] = {}
+    for frame in frames:
+        names.update(dict.fromkeys(frame.columns))
+
+    currencies = ', '.join(f'{frame.symbol} {frame.currency or "n/a"}' for frame in frames)
+    lines = [f'Currencies: {currencies}', ' | '.join(['item', 'symbol', *periods])]
+    for name in names:
+        rows = []
+        for frame in frames:
+            by_period = dict(zip(frame.periods, frame.get(name)))
+            values = np.array([by_period.get(period, np.nan) for period in periods])
+            rows.append((frame.symbol, values))
+        if all(np.all(np.isnan(values) | (values == 0)) for _, values in rows):
+            continue
+        for symbol, values in rows:
+            lines.append(' | '.join([name, symbol, *(format_value(value) for value in values)]))
+    return '\n'.join(lines)
@@ -0,0 +1,121 @@
+import logging
+import os
+from typing import Callable
+
+import uvicorn
+
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.types import AgentCard
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from starlette.applications import Starlette
+
+from common.admission import AdmissionController
+from common.agent_stores import AgentStores
+from common.cassette import is_replaying
+from common.metrics import metrics_endpoint, register_metrics
+from common.sqlite_store import SQLiteCancellations
+from common.statement_executor import StatementExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_google_api_key() -> None:
+    """Verifies an API key is set; not required when using Vertex AI APIs or replaying a cassette.
+
+    Raises:
+        ValueError: If neither GOOGLE_API_KEY nor GOOGLE_GENAI_USE_VERTEXAI is set.
+    """
+    if is_replaying():
+        return
+    if os.getenv('GOOGLE_GENAI_USE_VERTEXAI') != 'TRUE' and not os.getenv(
+            'GOOGLE_API_KEY'
+    ):
+        raise ValueError(
+            'GOOGLE_API_KEY environment variable not set and '
+            'GOOGLE_GENAI_USE_VERTEXAI is not TRUE.'
+        )
+
+
+def build_statement_app(agent_card: AgentCard, agent: BaseAgent, stores: AgentStores) -> Starlette:
+    """Builds the A2A app serving `agent` under `agent_card`, with a `/metrics` route.
+
+    With the SQLite store, cancel requests are shared with the other worker
+    processes using the same database.
+    """
+    # No memory service: the agent never stores sessions in long-term memory.
+    runner = Runner(
+        app_name=agent_card.name,
+        agent=agent,
+        artifact_service=stores.artifact_service,
+        session_service=stores.session_service,
+    )
+    admission = AdmissionController()
+    register_metrics(f'admission/{agent_card.name}', admission.stats)
+    request_handler = DefaultRequestHandler(
+        agent_executor=StatementExecutor(
+            runner,
+            agent_card,
+            admission=admission,
+            cancellations=SQLiteCancellations(stores.database) if stores.database is not None else None,
+        ),
+        task_store=stores.task_store,
+    )
+    a2a_app = A2AStarletteApplication(
+        agent_card=agent_card, http_handler=request_handler
+    )
+    app = a2a_app.build(lifespan=stores.lifespan)
+    app.add_route('/metrics', metrics_endpoint)
+    return app
+
+
+def configure_server(
+        host: str,
+        port: int,
+        store: str | None = None,
+        store_path: str | None = None,
+        workers: int = 1,
+) -> None:
+    """Passes the command line options to the app factory through the environment.
+
+    Worker processes build their app from the environment, so every option must
+    be set there before uvicorn starts them. Several workers only share tasks
+    and sessions through the SQLite store, which is therefore the default then.
+    """
+    os.environ.setdefault('APP_URL', f'http://{host}:{port}')
+    if store:
+        os.environ['AGENT_STORE'] = store
+    elif workers > 1:
+        os.environ.setdefault('AGENT_STORE', 'sqlite')
+    if store_path:
+        os.environ['AGENT_STORE_PATH'] = store_path
+    if workers > 1 and os.environ.get('AGENT_STORE', '').lower() != 'sqlite':
+        logger.warning(
+            f'{workers} workers with the {os.environ.get("AGENT_STORE")} store do not share '
+            'tasks and sessions; use --store sqlite'
+        )
+
+
+def run_server(
+        app_factory: str,
+        create_app: Callable[[], Starlette],
+        host: str,
+        port: int,
+        workers: int = 1,
+) -> None:
+    """Serves the app from one process, or from `workers` processes sharing the port.
+
+    Args:
+        app_factory: Import string of `create_app`, e.g. 'main:create_app', imported
+            by every worker process.
+        create_app: The factory itself, called directly for a single process.
+        host: Interface to bind.
+        port: Port to bind.
+        workers: Number of worker processes; uvicorn restarts workers that die.
+    """
+    if workers > 1:
+        uvicorn.run(app_factory, factory=True, host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(create_app(), host=host, port=port)
@@ -0,0 +1,159 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Status, StatusCode
+
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = ('otlp', 'json')
+DEFAULT_TRACES_PATH = Path.home() / '.cache' / 'agentic-stock-analysis' / 'traces.jsonl'
+
+tracer = trace.get_tracer('agentic-stock-analysis')
+
+_configured = False
+
+
+def _sdk_available() -> bool:
+    try:
+        import opentelemetry.sdk.trace  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure_tracing(service_name: str) -> bool:
+    """Installs a tracer provider exporting to TRACING_EXPORTER; returns whether tracing is on.
+
+    `otlp` sends the spans to an OTLP/HTTP collector at OTEL_EXPORTER_OTLP_ENDPOINT
+    (default http://localhost:4318); `json` appends them, one JSON object per line,
+    to TRACING_JSON_PATH, which every process may share. Without TRACING_EXPORTER
+    the spans are no-ops. OTEL_SERVICE_NAME overrides `service_name`. Only the
+    first call in a process has an effect.
+    """
+    global _configured
+    exporter_name = os.getenv('TRACING_EXPORTER', '').lower()
+    if _configured or not exporter_name:
+        return _configured
+    if exporter_name not in EXPORTERS:
+        raise ValueError(f'Unknown TRACING_EXPORTER {exporter_name!r}, expected one of {EXPORTERS}')
+    if not _sdk_available():
+        logger.warning('TRACING_EXPORTER is set but opentelemetry-sdk is not installed; tracing is off')
+        return False
+
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if exporter_name == 'otlp':
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning('TRACING_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; tracing is off')
+            return False
+        exporter = OTLPSpanExporter()
+    else:
+        exporter = JsonLinesSpanExporter()
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({
+            SERVICE_NAME: os.getenv('OTEL_SERVICE_NAME', service_name),
+        }))
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    _configured = True
+    logger.info(f'Tracing {service_name} to {exporter_name}')
+    return True
+
+
+class JsonLinesSpanExporter:
+    """Appends finished spans to a JSON lines file, for building waterfalls offline.
+
+    Each line is the OpenTelemetry JSON form of one span: name, context (trace
+    and span id), parent id, start and end time, attributes, events and status.
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path or os.getenv('TRACING_JSON_PATH', DEFAULT_TRACES_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Any]) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = ''.join(json.dumps(json.loads(span.to_json()), separators=(',', ':')) + '\n' for span in spans)
+        with self._lock, self.path.open('a', encoding='utf-8') as file:
+            # One write per batch keeps the lines of concurrent processes apart.
+            file.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def inject_context(metadata: Dict[str, Any], context: Optional[otel_context.Context] = None) -> Dict[str, Any]:
+    """Adds the trace context (W3C `traceparent`) to A2A message metadata; the current one by default."""
+    propagate.inject(metadata, context=context)
+    return metadata
+
+
+def extract_context(metadata: Optional[Dict[str, Any]]) -> otel_context.Context:
+    """Returns the trace context carried by A2A message metadata, see `inject_context`."""
+    return propagate.extract(metadata or {})
+
+
+def _attribute(value: Any) -> Any:
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(item, (str, bool, int, float)) for item in value):
+        return list(value)
+    return None
+
+
+def record_error(span: trace.Span, error: BaseException) -> None:
+    """Marks a span that is not used as a context manager as failed with `error`."""
+    span.record_exception(error)
+    span.set_status(Status(StatusCode.ERROR, str(error)))
+
+
+def tracing_enabled() -> bool:
+    return _configured
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator running an async function in a span named `name` (default: its qualified name).
+
+    Arguments of simple types are recorded as `arg.<name>` attributes. The
+    signature and docstring are kept, so decorated ADK tools are declared to
+    the model exactly as before.
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not _configured:
+                return await fn(*args, **kwargs)
+            attributes = {}
+            for arg, value in signature.bind_partial(*args, **kwargs).arguments.items():
+                value = _attribute(value)
+                if value is not None:
+                    attributes[f'arg.{arg}'] = value
+            # The span records an exception and sets the error status on its way out.
+            with tracer.start_as_current_span(span_name, attributes=attributes):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
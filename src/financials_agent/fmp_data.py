@@ -1,13 +1,9 @@
-try:
-    # For Python 3.0 and later
-    from urllib.request import urlopen
-except ImportError:
-    # Fall back to Python 2's urllib2
-    from urllib2 import urlopen
-
-import certifi
-import os
-import ssl
+import sys
+from pathlib import Path
+
+# Make the shared `common` package importable when started from this directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 from dotenv import load_dotenv
 
 
@@ -16,6 +12,8 @@ from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.genai import types
 
+from common.fmp_client import aclose_fmp_client, get_fmp_client
+
 
 retry_config=types.HttpRetryOptions(
     attempts=5,  # Maximum retry attempts
@@ -26,21 +24,19 @@ retry_config=types.HttpRetryOptions(
 
 load_dotenv()
 
-def get_jsonparsed_data(ticker: str):
+async def get_jsonparsed_data(ticker: str):
     """Hits the FMP API to retrieve the balance information for the company with the given ticker.
 
     Args:
         ticker: The ticker of the company we want to access the balance sheet
 
     Returns:
-        A formatted string with search results, or None if no results.
+        A compact table with one row per balance sheet line item and one column per
+        period (oldest first), or None if no results.
     """
 
-    url = (f"https://financialmodelingprep.com/stable/balance-sheet-statement?symbol={ticker}&apikey={os.getenv('fmp_key')}")
-    context = ssl.create_default_context(cafile=certifi.where())
-    response = urlopen(url, context=context)
-    data = response.read().decode("utf-8")
-    return data #json.loads(data)
+    frame = await get_fmp_client().get_statement_frame('balance-sheet-statement', ticker)
+    return frame.render()
 
 
 #url = (f"https://financialmodelingprep.com/stable/balance-sheet-statement?symbol=AAPL&apikey={os.getenv('fmp_key')}")
@@ -71,8 +67,11 @@ root_agent = Agent(
 runner = InMemoryRunner(agent=root_agent)
 
 async def main():
-    response = await runner.run_debug("analyze the balance sheet trends for Apple company and give insights for the health of the company")
-    print(response)
+    try:
+        response = await runner.run_debug("analyze the balance sheet trends for Apple company and give insights for the health of the company")
+        print(response)
+    finally:
+        await aclose_fmp_client()
 
 import asyncio
 asyncio.run(main())
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+import httpx
+
+from a2a.client import A2ACardResolver
+from a2a.client.errors import A2AClientError
+from a2a.types import AgentCard
+
+from remote_agent_connection import RemoteAgentConnections, get_http_pool
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISCOVERY_TIMEOUT = 5.0
+DEFAULT_HEALTH_INTERVAL = 15.0
+DEFAULT_FAILURE_THRESHOLD = 2
+
+
+@dataclass
+class RegisteredAgent:
+    address: str
+    card: AgentCard | None = None
+    connection: RemoteAgentConnections | None = None
+    healthy: bool = False
+    failures: int = 0
+    last_seen: float | None = None
+    order: int = 0
+
+
+class AgentRegistry:
+    """Keeps track of the remote agents and their health.
+
+    Agent cards are resolved concurrently with a per-agent timeout. A background
+    task then re-fetches every card on `health_interval`, which doubles as a
+    health check: agents refusing the connection, or failing `failure_threshold`
+    checks in a row, are dropped from the roster, agents that answer again (or
+    for the first time) are (re-)added and changed cards replace the old
+    connection.
+
+    The roster string pasted into the prompts is only rebuilt when the set of
+    healthy agents or their name/description actually changes, so the prompt
+    prefix stays byte-identical between turns.
+    """
+
+    def __init__(
+            self,
+            discovery_timeout: float | None = None,
+            health_interval: float | None = None,
+            failure_threshold: int | None = None,
+    ):
+        self.discovery_timeout = discovery_timeout or float(
+            os.getenv('A2A_DISCOVERY_TIMEOUT', DEFAULT_DISCOVERY_TIMEOUT)
+        )
+        self.health_interval = health_interval or float(
+            os.getenv('A2A_HEALTH_INTERVAL', DEFAULT_HEALTH_INTERVAL)
+        )
+        self.failure_threshold = failure_threshold or int(
+            os.getenv('A2A_HEALTH_FAILURE_THRESHOLD', DEFAULT_FAILURE_THRESHOLD)
+        )
+
+        self._agents: dict[str, RegisteredAgent] = {}
+        self._monitor: asyncio.Task | None = None
+        self.connections: dict[str, RemoteAgentConnections] = {}
+        self.cards: dict[str, AgentCard] = {}
+        self.roster: str = ''
+
+    async def discover(self, addresses: list[str]) -> None:
+        """Resolves the given agents concurrently and starts the health monitor.
+
+        Returns once every agent answered or hit the discovery timeout; agents
+        that did not answer are picked up by the monitor later.
+        """
+        for address in addresses:
+            self._agents.setdefault(address, RegisteredAgent(address, order=len(self._agents)))
+        await asyncio.gather(*(self.check(address) for address in addresses))
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._monitor_loop())
+
+    async def check(self, address: str) -> bool:
+        """Fetches the card of the agent at `address` and updates its health."""
+        agent = self._agents[address]
+        card_resolver = A2ACardResolver(get_http_pool().client, address)
+        try:
+            card = await asyncio.wait_for(
+                card_resolver.get_agent_card(), self.discovery_timeout
+            )
+        except (asyncio.TimeoutError, httpx.HTTPError, A2AClientError) as e:
+            # Nothing listens at the address: the agent is down, not just slow.
+            agent.failures = self.failure_threshold if _refused(e) else agent.failures + 1
+            if agent.card is None:
+                print(f'Error: Failed to get agent card from {address}: {e!r}')
+            elif agent.healthy and agent.failures >= self.failure_threshold:
+                logger.warning(f'Agent {agent.card.name} at {address} is down: {e!r}')
+                agent.healthy = False
+                self._rebuild()
+            return False
+
+        agent.failures = 0
+        agent.last_seen = asyncio.get_running_loop().time()
+        if agent.card is None or agent.card != card:
+            if agent.card is not None:
+                logger.info(f'Agent card of {card.name} at {address} changed')
+            agent.card = card
+            agent.connection = RemoteAgentConnections(agent_card=card, agent_url=address)
+            agent.healthy = True
+            self._rebuild()
+        elif not agent.healthy:
+            logger.info(f'Agent {card.name} at {address} recovered')
+            agent.healthy = True
+            self._rebuild()
+        return True
+
+    def mark_failed(self, agent_name: str) -> None:
+        """Takes an agent out of rotation right away, e.g. after a connection error.
+
+        The monitor re-adds it once its card can be fetched again.
+        """
+        for agent in self._agents.values():
+            if agent.card is not None and agent.card.name == agent_name and agent.healthy:
+                logger.warning(f'Agent {agent_name} marked as down')
+                agent.healthy = False
+                agent.failures = self.failure_threshold
+                self._rebuild()
+
+    def register(self, card: AgentCard, connection: RemoteAgentConnections, address: str | None = None) -> None:
+        """Adds an already resolved agent, bypassing discovery."""
+        address = address or card.url
+        self._agents[address] = RegisteredAgent(
+            address, card=card, connection=connection, healthy=True, order=len(self._agents)
+        )
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        healthy = sorted(
+            (agent for agent in self._agents.values() if agent.healthy),
+            key=lambda agent: agent.order,
+        )
+        self.connections = {agent.card.name: agent.connection for agent in healthy}
+        self.cards = {agent.card.name: agent.card for agent in healthy}
+        roster = '\n'.join(
+            json.dumps({'name': agent.card.name, 'description': agent.card.description})
+            for agent in healthy
+        )
+        if roster != self.roster:
+            self.roster = roster
+            logger.info(f'Agent roster changed: {list(self.cards)}')
+
+    async def _monitor_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(
+                *(self.check(address) for address in list(self._agents)),
+                return_exceptions=True,
+            )
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            agent.address: {
+                'name': agent.card.name if agent.card else None,
+                'healthy': agent.healthy,
+                'failures': agent.failures,
+            }
+            for agent in self._agents.values()
+        }
+
+    async def aclose(self) -> None:
+        """Stops the health monitor."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+
+def _refused(error: BaseException) -> bool:
+    """True if `error` was caused by a refused connection; the card resolver wraps httpx errors."""
+    while error is not None:
+        if isinstance(error, httpx.ConnectError):
+            return True
+        error = error.__cause__
+    return False
@@ -1,27 +1,48 @@
 import asyncio
+import contextvars
+import os
+import sys
 import traceback  # Import the traceback module
 import logging
 from collections.abc import AsyncIterator
+from pathlib import Path
 from pprint import pformat
 
+# Make the shared `common` package importable when started from the host directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 import gradio as gr
 
 from google.adk.events import Event
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from remote_agent_connection import aclose_http_pool
 from routing_agent import (
+    ANONYMOUS_USER_ID,
+    remote_agent_addresses,
     root_agent as routing_agent,
+    routing_agent_instance,
+    task_updates,
 )
+from session_manager import SessionManager
+
+from common.tracing import configure_tracing, record_error, tracer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 APP_NAME = 'routing_app'
-USER_ID = 'default_user'
-SESSION_ID = 'default_session'
+USER_ID = ANONYMOUS_USER_ID
+
+# Requests served in parallel and requests allowed to wait for a free slot.
+DEFAULT_CONCURRENCY_LIMIT = 16
+DEFAULT_MAX_QUEUE_SIZE = 64
 
 SESSION_SERVICE = InMemorySessionService()
+SESSIONS = SessionManager(SESSION_SERVICE, APP_NAME)
 ROUTING_AGENT_RUNNER = Runner(
     agent=routing_agent,
     app_name=APP_NAME,
@@ -29,75 +50,166 @@ ROUTING_AGENT_RUNNER = Runner(
 )
 
 
+async def _with_remote_updates(
+        event_iterator: AsyncIterator[Event],
+        session_id: str,
+        trace_context: otel_context.Context | None = None,
+) -> AsyncIterator[Event | tuple[str, str]]:
+    """Merges the runner events with the partial output streamed by remote agents.
+
+    Yields runner events and (agent name, text) tuples in arrival order. The
+    runner is driven from a separate task so remote updates published while a
+    tool call is still running are not held back until the tool returns.
+
+    Stopping the iteration (the user pressed stop) or closing the session
+    cancels the runner, and with it the remote tasks it is waiting for.
+
+    The runner runs in `trace_context`, so its spans, and through the A2A
+    message metadata the remote agents' spans, join the request's trace.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def _pump() -> None:
+        try:
+            async for event in event_iterator:
+                queue.put_nowait(event)
+        finally:
+            queue.put_nowait(done)
+
+    # Tools run inside the pump task, so the queue only needs to be set in its context.
+    context = contextvars.copy_context()
+    context.run(task_updates.set, queue)
+    if trace_context is not None:
+        context.run(otel_context.attach, trace_context)
+    pump = asyncio.create_task(_pump(), context=context)
+    SESSIONS.track(session_id, pump)
+    try:
+        while (item := await queue.get()) is not done:
+            yield item
+        await pump  # Re-raise a runner failure.
+    finally:
+        if not pump.done():
+            pump.cancel()
+
+
+def _user_id(request: gr.Request | None) -> str:
+    return (request.username if request else None) or USER_ID
+
+
+def _session_id(request: gr.Request | None) -> str:
+    # Gradio gives every browser tab its own session hash.
+    return (request.session_hash if request else None) or 'default_session'
+
+
 async def get_response_from_agent(
         message: str,
         history: list[gr.ChatMessage],
+        request: gr.Request = None,
 ) -> AsyncIterator[gr.ChatMessage]:
     """Get response from host agent."""
+    # The root span of the request. Not made current here: Gradio may resume
+    # this generator in another context, so the runner gets it explicitly.
+    span = tracer.start_span('get_response_from_agent', attributes={
+        'user.id': _user_id(request),
+        'session.id': _session_id(request),
+    })
     try:
-        event_iterator: AsyncIterator[Event] = ROUTING_AGENT_RUNNER.run_async(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=types.Content(
-                role='user', parts=[types.Part(text=message)]
-            ),
-        )
-
-        async for event in event_iterator:
-            logger.info(f"Event: {event}")
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.function_call:
-                        formatted_call = f'```python\n{pformat(part.function_call.model_dump(exclude_none=True), indent=2, width=80)}\n```'
-                        yield gr.ChatMessage(
-                            role='assistant',
-                            content=f'🛠️ **Tool Call: {part.function_call.name}**\n{formatted_call}',
-                        )
-                    elif part.function_response:
-                        response_content = part.function_response.response
-                        if (
-                                isinstance(response_content, dict)
-                                and 'response' in response_content
-                        ):
-                            formatted_response_data = response_content[
-                                'response'
-                            ]
-                        else:
-                            formatted_response_data = response_content
-                        formatted_response = f'```json\n{pformat(formatted_response_data, indent=2, width=80)}\n```'
-                        yield gr.ChatMessage(
-                            role='assistant',
-                            content=f'⚡ **Tool Response from {part.function_response.name}**\n{formatted_response}',
-                        )
-            if event.is_final_response():
-                final_response_text = ''
-                if event.content and event.content.parts:
-                    final_response_text = ''.join(
-                        [p.text for p in event.content.parts if p.text]
-                    )
-                elif event.actions and event.actions.escalate:
-                    final_response_text = f'Agent escalated: {event.error_message or "No specific message."}'
-                if final_response_text:
-                    yield gr.ChatMessage(
-                        role='assistant', content=final_response_text
-                    )
-                break
+        async with SESSIONS.session(_user_id(request), _session_id(request)) as session_id:
+            async for reply in _run_agent(
+                    message, _user_id(request), session_id, trace.set_span_in_context(span)
+            ):
+                yield reply
     except Exception as e:
+        record_error(span, e)
         print(f'Error in get_response_from_agent (Type: {type(e)}): {e}')
         traceback.print_exc()  # This will print the full traceback
         yield gr.ChatMessage(
             role='assistant',
             content='An error occurred while processing your request. Please check the server logs for details.',
         )
+    finally:
+        span.end()
+
+
+async def end_session(request: gr.Request) -> None:
+    """Cancels the running work and drops the ADK session of a browser tab that was closed."""
+    await SESSIONS.close(_session_id(request))
+
+
+async def _run_agent(
+        message: str,
+        user_id: str,
+        session_id: str,
+        trace_context: otel_context.Context | None = None,
+) -> AsyncIterator[gr.ChatMessage]:
+    """Runs the routing agent on one message and renders its events for the chat."""
+    event_iterator: AsyncIterator[Event] = ROUTING_AGENT_RUNNER.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=types.Content(
+            role='user', parts=[types.Part(text=message)]
+        ),
+    )
+
+    partial_text: dict[str, str] = {}
+    async for event in _with_remote_updates(event_iterator, session_id, trace_context):
+        if isinstance(event, tuple):
+            agent_name, text = event
+            partial_text[agent_name] = partial_text.get(agent_name, '') + text
+            yield gr.ChatMessage(
+                role='assistant',
+                content=f'⏳ **Streaming from {agent_name}**\n{partial_text[agent_name]}',
+            )
+            continue
+        logger.info(f"Event: {event}")
+        if event.content and event.content.parts:
+            for part in event.content.parts:
+                if part.function_call:
+                    formatted_call = f'```python\n{pformat(part.function_call.model_dump(exclude_none=True), indent=2, width=80)}\n```'
+                    yield gr.ChatMessage(
+                        role='assistant',
+                        content=f'🛠️ **Tool Call: {part.function_call.name}**\n{formatted_call}',
+                    )
+                elif part.function_response:
+                    response_content = part.function_response.response
+                    if (
+                            isinstance(response_content, dict)
+                            and 'response' in response_content
+                    ):
+                        formatted_response_data = response_content[
+                            'response'
+                        ]
+                    else:
+                        formatted_response_data = response_content
+                    formatted_response = f'```json\n{pformat(formatted_response_data, indent=2, width=80)}\n```'
+                    yield gr.ChatMessage(
+                        role='assistant',
+                        content=f'⚡ **Tool Response from {part.function_response.name}**\n{formatted_response}',
+                    )
+        if event.is_final_response():
+            final_response_text = ''
+            if event.content and event.content.parts:
+                final_response_text = ''.join(
+                    [p.text for p in event.content.parts if p.text]
+                )
+            elif event.actions and event.actions.escalate:
+                final_response_text = f'Agent escalated: {event.error_message or "No specific message."}'
+            if final_response_text:
+                yield gr.ChatMessage(
+                    role='assistant', content=final_response_text
+                )
+            break
 
 
 async def main():
     """Main gradio app."""
-    print('Creating ADK session...')
-    await SESSION_SERVICE.create_session(
-        app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID
-    )
-    print('ADK session created successfully.')
+    configure_tracing('host')
+    # Waits at most the discovery timeout; agents that are still down are
+    # added in the background while the UI is already serving.
+    print('Discovering remote agents...')
+    await routing_agent_instance.discover_agents(remote_agent_addresses())
+    print(f'Remote agents available: {list(routing_agent_instance.cards)}')
 
     with gr.Blocks(
             theme=gr.themes.Ocean(), title='A2A Host Agent with Logo'
@@ -117,12 +229,30 @@ async def main():
             title='A2A Host Agent',
             description='This assistant can help you to analyse financial data from companies',
         )
+        # ADK sessions are created per browser tab on its first message.
+        demo.unload(end_session)
 
     print('Launching Gradio interface...')
-    demo.queue().launch(
+    # Gradio serves from its own thread; keep this loop running for the
+    # background agent discovery until the process is interrupted.
+    demo.queue(
+        default_concurrency_limit=int(
+            os.getenv('GRADIO_CONCURRENCY_LIMIT', DEFAULT_CONCURRENCY_LIMIT)
+        ),
+        max_size=int(os.getenv('GRADIO_MAX_QUEUE_SIZE', DEFAULT_MAX_QUEUE_SIZE)),
+    ).launch(
         server_name='0.0.0.0',
         server_port=8083,
+        prevent_thread_lock=True,
     )
+    try:
+        await asyncio.Event().wait()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        demo.close()
+        await routing_agent_instance.aclose()
+        await aclose_http_pool()
     print('Gradio application has been shut down.')
 
 
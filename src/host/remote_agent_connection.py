@@ -1,42 +1,239 @@
 
-from collections.abc import Callable
+import asyncio
+import os
+import sys
+import weakref
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+# Make the shared `common` package importable when started from the host directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 import httpx
 
 from a2a.client import A2AClient
 from a2a.types import (
     AgentCard,
+    CancelTaskRequest,
+    CancelTaskResponse,
+    JSONRPCErrorResponse,
+    Message,
     SendMessageRequest,
     SendMessageResponse,
+    SendStreamingMessageRequest,
     Task,
     TaskArtifactUpdateEvent,
+    TaskIdParams,
     TaskStatusUpdateEvent,
 )
 from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+
+from common.tracing import inject_context, record_error, tracer
 
 
 load_dotenv()
 
 TaskCallbackArg = Task | TaskStatusUpdateEvent | TaskArtifactUpdateEvent
-TaskUpdateCallback = Callable[[TaskCallbackArg, AgentCard], Task]
+TaskUpdateCallback = Callable[[TaskCallbackArg, AgentCard], Task | None]
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_PER_AGENT_CONNECTIONS = 10
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class AgentHttpPool:
+    """Host wide HTTP connection pool shared by every remote agent connection.
+
+    One `httpx.AsyncClient` serves card resolution and all A2A calls so keep-alive
+    connections to the agent servers are reused. Each agent is additionally capped
+    at `per_agent_connections` concurrent requests, which httpx does not offer.
+
+    Connections belong to the event loop that opened them, so the pool keeps
+    one client and set of per-agent limits per event loop (e.g. the host's
+    main loop and the loop Gradio serves requests on).
+    """
+
+    def __init__(
+            self,
+            timeout: float | None = None,
+            max_connections: int | None = None,
+            max_keepalive_connections: int | None = None,
+            keepalive_expiry: float | None = None,
+            per_agent_connections: int | None = None,
+            http2: bool | None = None,
+    ):
+        self.timeout = timeout or float(os.getenv('A2A_TIMEOUT', DEFAULT_TIMEOUT))
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(
+                os.getenv('A2A_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+            ),
+            max_keepalive_connections=max_keepalive_connections or int(
+                os.getenv('A2A_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE)
+            ),
+            keepalive_expiry=keepalive_expiry or float(
+                os.getenv('A2A_KEEPALIVE_EXPIRY', DEFAULT_KEEPALIVE_EXPIRY)
+            ),
+        )
+        self.per_agent_connections = per_agent_connections or int(
+            os.getenv('A2A_PER_AGENT_CONNECTIONS', DEFAULT_PER_AGENT_CONNECTIONS)
+        )
+        if http2 is None:
+            http2 = os.getenv('A2A_HTTP2', 'TRUE').upper() == 'TRUE'
+        # HTTP/2 needs the optional `h2` package (httpx[http2]).
+        self.http2 = http2 and _http2_available()
+
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._agent_limits: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, http2=self.http2
+            )
+            self._clients[loop] = client
+        return client
+
+    def agent_limit(self, agent_url: str) -> asyncio.Semaphore:
+        """Semaphore capping the concurrent requests to one agent server."""
+        limits = self._agent_limits.setdefault(asyncio.get_running_loop(), {})
+        if agent_url not in limits:
+            limits[agent_url] = asyncio.Semaphore(self.per_agent_connections)
+        return limits[agent_url]
+
+    async def aclose(self) -> None:
+        """Closes the client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        self._agent_limits.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+_http_pool: AgentHttpPool | None = None
+
+
+def get_http_pool() -> AgentHttpPool:
+    """Returns the host wide pool, creating it on first use."""
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = AgentHttpPool()
+    return _http_pool
+
+
+async def aclose_http_pool() -> None:
+    """Closes the host wide pool's client for the running event loop."""
+    if _http_pool is not None:
+        await _http_pool.aclose()
 
 
 class RemoteAgentConnections:
     """A class to hold the connections to the remote agents."""
 
-    def __init__(self, agent_card: AgentCard, agent_url: str):
+    def __init__(
+            self,
+            agent_card: AgentCard,
+            agent_url: str,
+            http_pool: AgentHttpPool | None = None,
+    ):
         print(f'agent_card: {agent_card}')
         print(f'agent_url: {agent_url}')
-        self._httpx_client = httpx.AsyncClient(timeout=30)
-        self.agent_client = A2AClient(
-            self._httpx_client, agent_card, url=agent_url
-        )
+        self._http_pool = http_pool or get_http_pool()
+        self._agent_url = agent_url
+        self._agent_client: A2AClient | None = None
+        self._agent_client_http: httpx.AsyncClient | None = None
         self.card = agent_card
 
+    @property
+    def agent_client(self) -> A2AClient:
+        # Rebuilt whenever the pool hands out a new client (new event loop).
+        http_client = self._http_pool.client
+        if self._agent_client is None or self._agent_client_http is not http_client:
+            self._agent_client = A2AClient(http_client, self.card, url=self._agent_url)
+            self._agent_client_http = http_client
+        return self._agent_client
+
     def get_agent(self) -> AgentCard:
         return self.card
 
     async def send_message(
             self, message_request: SendMessageRequest
     ) -> SendMessageResponse:
-        return await self.agent_client.send_message(message_request)
+        with self._span('RemoteAgentConnections.send_message', message_request):
+            async with self._http_pool.agent_limit(self._agent_url):
+                return await self.agent_client.send_message(message_request)
+
+    async def send_message_streaming(
+            self, message_request: SendStreamingMessageRequest
+    ) -> AsyncIterator[TaskCallbackArg | Message]:
+        """Sends the message with `message/stream` and yields the updates as they arrive.
+
+        Raises:
+            RuntimeError: If the remote agent answers with a JSON-RPC error.
+        """
+        with self._span('RemoteAgentConnections.send_message_streaming', message_request):
+            async with self._http_pool.agent_limit(self._agent_url):
+                async for response in self.agent_client.send_message_streaming(message_request):
+                    if isinstance(response.root, JSONRPCErrorResponse):
+                        raise RuntimeError(
+                            f'{self.card.name} streaming error: {response.root.error.message}'
+                        )
+                    yield response.root.result
+
+    @contextmanager
+    def _span(
+            self, name: str, message_request: SendMessageRequest | SendStreamingMessageRequest
+    ) -> Iterator[None]:
+        """Client span of an A2A call; its trace context goes along in the message metadata.
+
+        The span is not made current: `send_message_streaming` holds it across
+        `yield`, and a current span would parent whatever the consumer does
+        between updates and could not be detached when another task closes
+        the generator.
+        """
+        message = message_request.params.message
+        span = tracer.start_span(name, kind=SpanKind.CLIENT, attributes={
+            'agent.name': self.card.name,
+            'agent.url': self._agent_url,
+            'a2a.context_id': message.context_id or '',
+        })
+        try:
+            message.metadata = inject_context(
+                dict(message.metadata or {}), trace.set_span_in_context(span)
+            )
+            yield
+        except Exception as e:
+            record_error(span, e)
+            raise
+        finally:
+            span.end()
+
+    async def cancel_task(self, task_id: str) -> CancelTaskResponse:
+        """Asks the remote agent to stop working on `task_id`.
+
+        Not subject to the per-agent connection limit, so a cancel always goes
+        out even when every slot is taken by running tasks.
+        """
+        return await self.agent_client.cancel_task(
+            CancelTaskRequest(id=task_id, params=TaskIdParams(id=task_id))
+        )
@@ -1,5 +1,13 @@
+import sys
+from pathlib import Path
+
+# Make the shared `common` package importable when started from the host directory.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent_registry import AgentRegistry
 from remote_agent_connection import (
     RemoteAgentConnections,
+    TaskCallbackArg,
     TaskUpdateCallback,
 )
 
@@ -10,17 +18,24 @@ import uuid
 import os
 import asyncio
 import logging
+from contextvars import ContextVar
 
-from a2a.client import A2ACardResolver
+from a2a.client.errors import A2AClientHTTPError
 from a2a.types import (
     AgentCard,
+    Artifact,
     TaskState,
     MessageSendParams,
     Part,
     SendMessageRequest,
     SendMessageResponse,
     SendMessageSuccessResponse,
+    SendStreamingMessageRequest,
     Task,
+    TaskArtifactUpdateEvent,
+    TaskStatus,
+    TaskStatusUpdateEvent,
+    TextPart,
 )
 
 from google.adk.agents.readonly_context import ReadonlyContext
@@ -37,9 +52,60 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
 from google.adk.tools import AgentTool
 
+from common.cassette import CassetteGemini
+from common.tracing import traced
+
+
+# The user id of Gradio users who are not logged in, see `main._user_id`.
+ANONYMOUS_USER_ID = 'default_user'
+# Seconds to wait for a remote agent to acknowledge a cancel.
+CANCEL_TIMEOUT = 5.0
+TERMINAL_STATES = frozenset({
+    TaskState.completed,
+    TaskState.canceled,
+    TaskState.failed,
+    TaskState.rejected,
+})
+
+# Queue receiving (agent name, partial text) for the request being served; set
+# by the host around a runner invocation so streamed remote output reaches the UI.
+task_updates: ContextVar[asyncio.Queue | None] = ContextVar('task_updates', default=None)
+
+
+def _update_text(update: TaskCallbackArg) -> str:
+    # Only status messages carry partial output; the artifact repeats the full
+    # final text, which reaches the UI through the tool response.
+    if not isinstance(update, TaskStatusUpdateEvent) or not update.status.message:
+        return ''
+    return ''.join(
+        part.root.text for part in update.status.message.parts if isinstance(part.root, TextPart)
+    )
+
+
+def publish_task_update(update: TaskCallbackArg, card: AgentCard) -> None:
+    """Task callback forwarding the text of streamed remote updates to `task_updates`."""
+    queue = task_updates.get()
+    if queue is None:
+        return
+    text = _update_text(update)
+    if text:
+        queue.put_nowait((card.name, text))
+
+
+def _merge_artifact(artifacts: list[Artifact], update: TaskArtifactUpdateEvent) -> list[Artifact]:
+    for index, artifact in enumerate(artifacts):
+        if artifact.artifact_id == update.artifact.artifact_id:
+            if update.append:
+                artifacts[index] = artifact.model_copy(
+                    update={'parts': [*artifact.parts, *update.artifact.parts]}
+                )
+            else:
+                artifacts[index] = update.artifact
+            return artifacts
+    return [*artifacts, update.artifact]
+
 
 class RoutingAgent:
     """The Routing agent.
@@ -49,50 +115,57 @@ class RoutingAgent:
     """
     def __init__(
             self,
-            task_callback: TaskUpdateCallback | None = None
+            task_callback: TaskUpdateCallback | None = None,
+            streaming: bool | None = None,
     ):
         self.task_callback = task_callback
-        self.remote_agent_connections: Dict[str, RemoteAgentConnections] = {}
-        self.cards: Dict[str, AgentCard] = {}
-        self.agents: str = ''
+        if streaming is None:
+            streaming = os.getenv('A2A_STREAMING', 'TRUE').upper() == 'TRUE'
+        self.streaming = streaming
+        self.registry = AgentRegistry()
+
+    @property
+    def remote_agent_connections(self) -> Dict[str, RemoteAgentConnections]:
+        """Connections to the agents that are currently healthy."""
+        return self.registry.connections
+
+    @property
+    def cards(self) -> Dict[str, AgentCard]:
+        return self.registry.cards
+
+    @property
+    def agents(self) -> str:
+        """The roster pasted into the prompts; only changes when the healthy agents change."""
+        return self.registry.roster
 
     async def _async_init_components(
             self, remote_agent_addresses: List[str]
     ) -> None:
-        """Asynchronous part of initialization."""
-        async with httpx.AsyncClient(timeout=30) as client:
-            for address in remote_agent_addresses:
-                card_resolver = A2ACardResolver(
-                    client, address
-                )
-                try:
-                    card = (
-                        await card_resolver.get_agent_card()
-                    )
-                    remote_connection = RemoteAgentConnections(
-                        agent_card=card, agent_url=address
-                    )
-                    self.remote_agent_connections[card.name] = remote_connection
-                    self.cards[card.name] = card
-
-                except httpx.ConnectError as e:
-                    print(
-                        f'Error: Failed to get agent card from {address}: {e}'
-                    )
-
-        agent_info = []
-        for agent_detail_dict in self.list_remote_agents():
-            agent_info.append(json.dumps(agent_detail_dict))
-        self.agents = '\n'.join(agent_info)
+        """Asynchronous part of initialization.
+
+        Resolves every agent card concurrently, waiting at most the discovery
+        timeout per agent, and starts the registry's health monitor, which adds
+        late agents, drops dead ones and refreshes changed cards.
+        """
+        await self.registry.discover(remote_agent_addresses)
+
+    async def discover_agents(self, remote_agent_addresses: List[str]) -> None:
+        """Resolves the agent cards for an instance not built through `create`."""
+        await self._async_init_components(remote_agent_addresses)
+
+    async def aclose(self) -> None:
+        """Stops the background health checks of the remote agents."""
+        await self.registry.aclose()
 
     @classmethod
     async def create(
             cls,
             remote_agent_addresses: List[str],
             task_callback: TaskUpdateCallback | None = None,
+            streaming: bool | None = None,
     ) -> 'RoutingAgent':
         """Create and asynchronously initialize an instance of the RoutingAgent."""
-        instance = cls(task_callback)
+        instance = cls(task_callback, streaming)
         await instance._async_init_components(remote_agent_addresses)
         return instance
 
@@ -100,7 +173,7 @@ class RoutingAgent:
         """Create an instance of teh RoutingAgent"""
         plan_agent = self.planning_agent()
         return Agent(
-            model='gemini-2.5-flash',
+            model=CassetteGemini(model='gemini-2.5-flash'),
             name='Routing_agent',
             instruction=self.root_instruction,
             before_model_callback=self.before_model_callback,
@@ -109,7 +182,7 @@ class RoutingAgent:
                 of the financials of a company"""
             ),
             tools=[
-                self.send_message, AgentTool(agent=plan_agent)
+                self.send_message, self.send_messages, AgentTool(agent=plan_agent)
             ],
         )
 
@@ -131,6 +204,8 @@ class RoutingAgent:
         to refine the plan. 
 
         * **Task Delegation:** Utilize the `send_message` function to assign actionable tasks to remote agents.
+        When the plan involves several agents, use `send_messages` to send all their tasks at once instead of 
+        calling `send_message` for each agent in turn.
         * **Contextual Awareness for Remote Agents:** If a remote agent repeatedly requests user confirmation, assume 
         it lacks access to the full conversation history. In such cases, enrich the task description with all necessary 
         contextual information relevant to that specific agent.
@@ -189,8 +264,14 @@ class RoutingAgent:
 
         plan_agent = LlmAgent(
             name="PlanningAgent",
-            model=Gemini(model="gemini-2.5-flash-lite"),
-            instruction=f"""You are a planning that that creates a plan to perform financial analysis for a company. 
+            model=CassetteGemini(model="gemini-2.5-flash-lite"),
+            # A callable so agents discovered after startup show up in the roster.
+            instruction=self.planning_instruction,
+        )
+        return plan_agent
+
+    def planning_instruction(self, context: ReadonlyContext) -> str:
+        return f"""You are a planning that that creates a plan to perform financial analysis for a company. 
             
             **INSTRUCTION:**
             Your output MUST be a list of actionable items.
@@ -204,9 +285,8 @@ class RoutingAgent:
             **Agent Roster:**
             * Available Agents: `{self.agents}`
             """
-        )
-        return plan_agent
 
+    @traced()
     async def send_message(
             self, agent_name: str, task: str, tool_context: ToolContext):
 
@@ -224,7 +304,7 @@ class RoutingAgent:
             A dictionary of JSON data.
         """
         if agent_name not in self.remote_agent_connections:
-            raise ValueError(f'Agent {agent_name} not found')
+            raise ValueError(f'Agent {agent_name} not found or currently unavailable')
 
         logger.info(f'Task: {task}')
 
@@ -232,35 +312,116 @@ class RoutingAgent:
         logger.info(f"State: {state}")
         logger.info(f"Agents name {agent_name}")
 
-        previous_agent = state.get('active_agent')
-        if previous_agent and previous_agent != agent_name:
-            state['context_id'] = None
-            state['task_id'] = None
-            #Switch agents - start new context
-
         state['active_agent'] = agent_name
+        # Every agent keeps its own task/context ids, shared with `send_messages`.
+        agent_tasks = dict(state.get('agent_tasks') or {})
+        ids = agent_tasks.get(agent_name) or {}
+        message_id, metadata = self._message_metadata(tool_context)
+        task = await self._send_task(
+            agent_name,
+            task,
+            ids.get('task_id'),
+            ids.get('context_id') or str(uuid.uuid4()),
+            message_id,
+            metadata,
+        )
+        if task is None:
+            return None
+
+        # Handle logic for task id and context id
+        task_id, context_id = self._next_task_ids(task)
+        agent_tasks[agent_name] = {'task_id': task_id, 'context_id': context_id}
+        state['agent_tasks'] = agent_tasks
+        return self._describe_task(agent_name, task)
+
+    @traced()
+    async def send_messages(
+            self, agent_names: List[str], tasks: List[str], tool_context: ToolContext):
+
+        """Sends tasks to several remote agents at once and waits for all of them.
+
+        Use this instead of repeated `send_message` calls when a plan needs more
+        than one agent, e.g. one task each for the balance sheet, cash flow
+        statement and income statement agents.
+
+        Args:
+            agent_names: The names of the agents to send the tasks to. An agent may
+                be listed more than once, e.g. once per company.
+            tasks: One task per entry of agent_names, in the same order. Each task
+                must carry all the context the agent needs on its own.
+            tool_context: The tool context this method runs in.
+
+        Returns:
+            The response or status of every agent, including the agents that failed.
+        """
+        if len(agent_names) != len(tasks):
+            raise ValueError('agent_names and tasks must have the same length')
+
+        state = tool_context.state
+        # Every agent keeps its own task/context ids so the calls can run in parallel.
+        agent_tasks = dict(state.get('agent_tasks') or {})
+        message_id, metadata = self._message_metadata(tool_context)
+
+        async def _run(agent_name: str, agent_task: str, repeated: bool) -> str:
+            if agent_name not in self.remote_agent_connections:
+                raise ValueError(f'Agent {agent_name} not found or currently unavailable')
+            # Two tasks must not share a context at the same time: the agent would run
+            # both on one session. Extra tasks for an agent get a context of their own,
+            # used once and not kept.
+            ids = {} if repeated else agent_tasks.get(agent_name) or {}
+            task = await self._send_task(
+                agent_name,
+                agent_task,
+                ids.get('task_id'),
+                ids.get('context_id') or str(uuid.uuid4()),
+                message_id,
+                metadata,
+            )
+            if task is None:
+                return f"{agent_name} did not return a task"
+            if not repeated:
+                task_id, context_id = self._next_task_ids(task)
+                agent_tasks[agent_name] = {'task_id': task_id, 'context_id': context_id}
+            return self._describe_task(agent_name, task)
+
+        logger.info(f'Fan-out to {agent_names}')
+        results = await asyncio.gather(
+            *(
+                _run(name, agent_task, name in agent_names[:index])
+                for index, (name, agent_task) in enumerate(zip(agent_names, tasks))
+            ),
+            return_exceptions=True,
+        )
+
+        state['agent_tasks'] = agent_tasks
+        responses = []
+        answered = []
+        for agent_name, result in zip(agent_names, results):
+            if isinstance(result, BaseException):
+                logger.error(f'Task for {agent_name} failed: {result!r}')
+                responses.append(f"{agent_name} failed: {result}")
+            else:
+                answered.append(agent_name)
+                responses.append(result)
+        if answered:
+            state['active_agent'] = ', '.join(dict.fromkeys(answered))
+        return '\n\n'.join(responses)
+
+    async def _send_task(
+            self,
+            agent_name: str,
+            task: str,
+            task_id: str | None,
+            context_id: str | None,
+            message_id: str = '',
+            metadata: dict[str, Any] | None = None,
+    ) -> Task | None:
+        """Sends one task to the remote agent and returns the resulting Task, if any."""
         client = self.remote_agent_connections[agent_name]
 
         if not client:
             raise ValueError(f'Client not available for {agent_name}')
 
-        #task_id = state['task_id'] if 'task_id' in state else str(uuid.uuid4())
-        if 'task_id' in state and state['task_id'] is not None:
-            task_id = state['task_id']
-        else:
-            task_id = None
-
-        if 'context_id' in state and state['context_id'] is not None:
-            context_id = state['context_id']
-        else:
-            context_id = str(uuid.uuid4())
-
-        message_id = ''
-        metadata = {}
-        if 'input_message_metadata' in state:
-            metadata.update(**state['input_message_metadata'])
-            if 'message_id' in state['input_message_metadata']:
-                message_id = state['input_message_metadata']['message_id']
         if not message_id:
             message_id = str(uuid.uuid4())
 
@@ -282,13 +443,29 @@ class RoutingAgent:
         if context_id:
             payload['message']['contextId'] = context_id
 
-        message_request = SendMessageRequest(
-            id=message_id, params=MessageSendParams.model_validate(payload)
-        )
+        if metadata:
+            payload['message']['metadata'] = metadata
 
-        send_response: SendMessageResponse = await client.send_message(
-            message_request=message_request
-        )
+        try:
+            if self.streaming and client.get_agent().capabilities.streaming:
+                return await self._stream_task(client, payload, message_id)
+
+            message_request = SendMessageRequest(
+                id=message_id, params=MessageSendParams.model_validate(payload)
+            )
+
+            send_response: SendMessageResponse = await client.send_message(
+                message_request=message_request
+            )
+        except asyncio.CancelledError:
+            # A blocking send only knows the task id when it continues an existing task.
+            if task_id is not None:
+                await self._cancel_remote(client, task_id)
+            raise
+        except (httpx.ConnectError, A2AClientHTTPError) as e:
+            # Stop routing to the agent until the health monitor sees it again.
+            self.registry.mark_failed(agent_name)
+            raise RuntimeError(f'Agent {agent_name} is currently unavailable') from e
         print(
             'send_response',
             send_response.model_dump_json(exclude_none=True, indent=2),
@@ -302,15 +479,95 @@ class RoutingAgent:
             print('received non-task response. Aborting get task ')
             return None
 
-        #return send_response.root.result
-        # Handle logic for task id and context id
+        return send_response.root.result
 
-        task = send_response.root.result
-        if task.status.state == TaskState.input_required:
+    async def _stream_task(
+            self,
+            client: RemoteAgentConnections,
+            payload: dict[str, Any],
+            message_id: str,
+    ) -> Task | None:
+        """Sends the task over `message/stream`, forwarding every update to the task
+        callback as it arrives, and returns the Task rebuilt from the updates."""
+        message_request = SendStreamingMessageRequest(
+            id=message_id, params=MessageSendParams.model_validate(payload)
+        )
+        card = client.get_agent()
+        task: Task | None = None
+        try:
+            async for update in client.send_message_streaming(message_request):
+                if self.task_callback:
+                    self.task_callback(update, card)
+                if isinstance(update, Task):
+                    task = update
+                elif isinstance(update, TaskStatusUpdateEvent):
+                    if task is None:
+                        task = Task(id=update.task_id, context_id=update.context_id, status=update.status)
+                    task.status = update.status
+                elif isinstance(update, TaskArtifactUpdateEvent):
+                    if task is None:
+                        task = Task(
+                            id=update.task_id,
+                            context_id=update.context_id,
+                            status=TaskStatus(state=TaskState.working),
+                        )
+                    task.artifacts = _merge_artifact(list(task.artifacts or []), update)
+        except asyncio.CancelledError:
+            # The user stopped or left; stop the remote agent from spending tokens on it.
+            if task is not None and task.status.state not in TERMINAL_STATES:
+                await self._cancel_remote(client, task.id)
+            raise
+
+        if task is None:
+            print('received non-task response. Aborting get task ')
+        return task
+
+    @staticmethod
+    async def _cancel_remote(client: RemoteAgentConnections, task_id: str) -> None:
+        """Cancels `task_id` on the remote agent, waiting at most CANCEL_TIMEOUT seconds."""
+        logger.info(f'Canceling task {task_id} on {client.get_agent().name}')
+        try:
+            await asyncio.wait_for(client.cancel_task(task_id), CANCEL_TIMEOUT)
+        except Exception as e:
+            logger.warning(f'Canceling task {task_id} failed: {e!r}')
+
+    def _message_metadata(self, tool_context: ToolContext) -> tuple[str, dict[str, Any]]:
+        """Returns the message id and metadata to send a task with.
+
+        The metadata of the user's message, if the host passed it in the
+        `input_message_metadata` state, is forwarded together with the request
+        metadata; its `message_id`, if any, is reused.
+        """
+        input_metadata = tool_context.state.get('input_message_metadata') or {}
+        metadata = {**input_metadata, **self._request_metadata(tool_context)}
+        return input_metadata.get('message_id', ''), metadata
+
+    @staticmethod
+    def _request_metadata(tool_context: ToolContext) -> dict[str, Any]:
+        """Metadata the agents schedule the request by: who asks, and that someone is waiting.
+
+        Anonymous users are told apart by their session, so the agents share
+        their capacity fairly between browsers.
+        """
+        user_id = tool_context.user_id
+        if user_id == ANONYMOUS_USER_ID:
+            user_id = f'{user_id}:{tool_context.session.id}'
+        return {'user_id': user_id, 'priority': 'interactive'}
+
+    @staticmethod
+    def _next_task_ids(task: Task) -> tuple[str | None, str]:
+        """Returns the (task_id, context_id) to continue the conversation with after `task`.
 
-            state['task_id'] = task.id
-            state['context_id'] = task.context_id
+        A task in a terminal state (completed, canceled, failed or rejected) is
+        closed, so the next message starts a new task in the same context.
+        """
+        if task.status.state in TERMINAL_STATES:
+            return None, task.context_id
+        return task.id, task.context_id
 
+    @staticmethod
+    def _describe_task(agent_name: str, task: Task) -> str:
+        if task.status.state == TaskState.input_required:
             # Extract te agent's question/message
             agent_question = task.status.message.parts[
                 0].root.text if task.status.message.parts else "Input required"
@@ -320,49 +577,28 @@ class RoutingAgent:
         elif task.status.state == TaskState.completed:
 
             agent_response = task.artifacts[0].parts[0].root.text
-
-            state['task_id'] = None
-            state['context_id'] = task.context_id
             return f"Response from {agent_name}: {agent_response}"
 
-        else:
-            state['task_id'] = task.id
-            state['context_id'] = task.context_id
+        elif task.status.state == TaskState.rejected and task.status.message:
+            # Shed by the agent's admission control; the message says when to retry.
+            reason = task.status.message.parts[0].root.text if task.status.message.parts else ''
+            return f"The {agent_name} agent is busy and rejected the task: {reason}"
 
+        else:
             return f"Task sent to {agent_name}. Status: {task.status.state}"
 
 
 
-def _get_initialized_routing_agent_sync() -> Agent:
-
-    async def _async_main() -> Agent:
-        routing_agent_instance = await RoutingAgent.create(
-            remote_agent_addresses=[
-                os.getenv('AIR_AGENT_URL', 'http://localhost:10002'),
-                os.getenv('WEA_AGENT_URL', 'http://localhost:10001'),
-                os.getenv('SEA_AGENT_URL', 'http://localhost:10003'),
-            ]
-        )
-
-        return routing_agent_instance.create_agent()
-
-    try:
-        return asyncio.run(_async_main())
-    except RuntimeError as e:
-        if 'asyncio.run() cannot be called from a running event loop' in str(e):
-            print(
-                f'Warning: Could not initialize RoutingAgent with asyncio.run(): {e}. '
-                'This can happen if an event loop is already running (e.g., in Jupyter). '
-                'Consider initializing RoutingAgent within an async function in your application.'
-            )
-        raise
-
-root_agent = _get_initialized_routing_agent_sync()
-
-
-
-
-
-
+def remote_agent_addresses() -> List[str]:
+    """The agent server urls to discover, from the environment."""
+    return [
+        os.getenv('AIR_AGENT_URL', 'http://localhost:10002'),
+        os.getenv('WEA_AGENT_URL', 'http://localhost:10001'),
+        os.getenv('SEA_AGENT_URL', 'http://localhost:10003'),
+    ]
 
 
+# Agent cards are resolved by the host once its event loop runs (see
+# `RoutingAgent._async_init_components`), so importing this module does no I/O.
+routing_agent_instance = RoutingAgent(task_callback=publish_task_update)
+root_agent = routing_agent_instance.create_agent()
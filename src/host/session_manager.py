@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from google.adk.sessions import BaseSessionService
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_SESSION_TTL = 60 * 60
+
+
+@dataclass
+class _SessionSlot:
+    user_id: str
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    tasks: set[asyncio.Task] = field(default_factory=set)
+    closing: bool = False
+
+
+class SessionManager:
+    """Maps every browser session to its own ADK session.
+
+    Sessions are created on first use and kept in least recently used order.
+    Sessions idle for longer than `ttl` seconds, and the oldest sessions beyond
+    `max_sessions`, are deleted from the session service so the host memory
+    stays bounded. A session that is still answering a message is never evicted.
+
+    The per-session lock serialises messages of the same browser, which share
+    the `active_agent`/`task_id` state, while different browsers run in parallel.
+    Closing a session cancels its running work, which in turn cancels the tasks
+    sent to the remote agents.
+    """
+
+    def __init__(
+            self,
+            session_service: BaseSessionService,
+            app_name: str,
+            max_sessions: int | None = None,
+            ttl: float | None = None,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.max_sessions = max_sessions or int(
+            os.getenv('HOST_MAX_SESSIONS', DEFAULT_MAX_SESSIONS)
+        )
+        self.ttl = ttl or float(os.getenv('HOST_SESSION_TTL', DEFAULT_SESSION_TTL))
+        self._slots: OrderedDict[str, _SessionSlot] = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+
+    @asynccontextmanager
+    async def session(self, user_id: str, session_id: str) -> AsyncIterator[str]:
+        """Holds the ADK session of `session_id` for one message, creating it if needed."""
+        slot = self._slots.get(session_id)
+        if slot is None:
+            slot = self._slots[session_id] = _SessionSlot(user_id)
+        try:
+            async with slot.lock:
+                self._slots.move_to_end(session_id)
+                slot.last_used = time.monotonic()
+                existing = await self.session_service.get_session(
+                    app_name=self.app_name, user_id=user_id, session_id=session_id
+                )
+                if existing is None:
+                    await self.session_service.create_session(
+                        app_name=self.app_name, user_id=user_id, session_id=session_id
+                    )
+                    self.created += 1
+                    logger.info(f'Created session {session_id} ({len(self._slots)} active)')
+                await self.evict_idle()
+                try:
+                    yield session_id
+                finally:
+                    slot.last_used = time.monotonic()
+        finally:
+            # The tab was closed while this message was being answered.
+            if slot.closing and not slot.lock.locked():
+                await self.drop(session_id)
+
+    def track(self, session_id: str, task: asyncio.Task) -> None:
+        """Registers a task doing work for `session_id`, to be canceled by `close`."""
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            slot.tasks.add(task)
+            task.add_done_callback(slot.tasks.discard)
+
+    async def close(self, session_id: str) -> None:
+        """Cancels the running work of `session_id` and deletes its ADK session.
+
+        A session answering a message is deleted once the canceled run has let go of it.
+        """
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return
+        if slot.lock.locked():
+            slot.closing = True
+            for task in list(slot.tasks):
+                task.cancel()
+        else:
+            await self.drop(session_id)
+
+    async def evict_idle(self) -> None:
+        """Deletes sessions idle for longer than the TTL and the least recently used over the cap."""
+        now = time.monotonic()
+        excess = len(self._slots) - self.max_sessions
+        for session_id, slot in list(self._slots.items()):
+            if slot.lock.locked():
+                continue
+            if excess > 0 or now - slot.last_used > self.ttl:
+                await self.drop(session_id)
+                excess -= 1
+
+    async def drop(self, session_id: str) -> None:
+        """Deletes the ADK session of `session_id`, e.g. when the browser tab is closed."""
+        slot = self._slots.get(session_id)
+        if slot is None or slot.lock.locked():
+            return
+        del self._slots[session_id]
+        await self.session_service.delete_session(
+            app_name=self.app_name, user_id=slot.user_id, session_id=session_id
+        )
+        self.evicted += 1
+        logger.info(f'Deleted session {session_id} ({len(self._slots)} active)')
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'active': len(self._slots),
+            'created': self.created,
+            'evicted': self.evicted,
+        }
@@ -1,50 +1,121 @@
 import serpapi
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
-from google.genai import types
 
-import certifi
-import os
-import ssl
 from dotenv import load_dotenv
-from urllib.request import urlopen
+
+from common.analytics import INCOME_STATEMENT_RATIOS, render_metrics
+from common.fmp_client import get_fmp_client
+from common.models import statement_model
+from common.statement_fields import apply_whitelist, field_whitelist, render_peer_comparison
+from common.tracing import traced
 
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-retry_config = types.HttpRetryOptions(
-    attempts=5,  # Maximum retry attempts
-    exp_base=7,  # Delay multiplier
-    initial_delay=1,
-    http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
-)
+
+STATEMENT_ENDPOINT = 'income-statement'
 
 
-def fmp_income_statement(ticker: str) -> Optional[str]:
+@traced()
+async def fmp_income_statement(
+        ticker: str,
+        period: str = 'annual',
+        limit: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+) -> Optional[str]:
     """Hits the FMP API to retrieve the income statement information for the company with the given ticker.
 
     Args:
         ticker: The ticker of the company we want to access the balance sheet
+        period: `annual` or `quarter`
+        limit: Maximum number of most recent periods to retrieve
+        start_date: Only include periods ending on or after this ISO date (YYYY-MM-DD)
+        end_date: Only include periods ending on or before this ISO date (YYYY-MM-DD)
 
     Returns:
-        A formatted string with search results, or None if no results.
+        A compact table with one row per income statement line item and one column per
+        period (oldest first), or None if no results.
     """
-    url = f"https://financialmodelingprep.com/stable/income-statement?symbol={ticker}&apikey={os.getenv('FMP_KEY')}"
     try:
-        context = ssl.create_default_context(cafile=certifi.where())
-        response = urlopen(url, context=context)
-        data = response.read().decode("utf-8")
-        return data
+        frame = await get_fmp_client().get_statement_frame(
+            STATEMENT_ENDPOINT, ticker, period, limit, start_date, end_date
+        )
+        return apply_whitelist(frame, STATEMENT_ENDPOINT).render()
     except Exception as e:
         logger.error(f"fmp API request for income statement failed for {ticker}")
 
 
+@traced()
+async def fmp_income_statements(
+        tickers: List[str],
+        period: str = 'annual',
+        limit: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+) -> Optional[str]:
+    """Hits the FMP API to retrieve the income statements of several companies at once, for peer comparisons.
+
+    Args:
+        tickers: The tickers of the companies to compare, e.g. ["NVDA", "AMD", "INTC"]
+        period: `annual` or `quarter`
+        limit: Maximum number of most recent periods to retrieve per company
+        start_date: Only include periods ending on or after this ISO date (YYYY-MM-DD)
+        end_date: Only include periods ending on or before this ISO date (YYYY-MM-DD)
+
+    Returns:
+        One table with the same fiscal periods as columns (oldest first) and, for every
+        income statement line item, one row per company, or None if no results.
+    """
+    try:
+        frames = await get_fmp_client().get_statement_frames(
+            STATEMENT_ENDPOINT, tickers, period, limit, start_date, end_date
+        )
+        return render_peer_comparison(frames, STATEMENT_ENDPOINT)
+    except Exception as e:
+        logger.error(f"fmp API request for income statement comparison failed for {tickers}")
+
+
+@traced()
+async def income_statement_metrics(
+        ticker: str,
+        period: str = 'annual',
+        limit: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+) -> Optional[str]:
+    """Computes the trends and ratios of the income statement for the company with the given ticker.
+
+    Use these precomputed numbers for changes, growth rates and ratios instead of
+    calculating them yourself.
+
+    Args:
+        ticker: The ticker of the company we want to analyse
+        period: `annual` or `quarter`
+        limit: Maximum number of most recent periods to retrieve
+        start_date: Only include periods ending on or after this ISO date (YYYY-MM-DD)
+        end_date: Only include periods ending on or before this ISO date (YYYY-MM-DD)
+
+    Returns:
+        Tables with the change (%) of every line item per period, its CAGR and
+        moving average, and the margins and coverage ratios per period, or None if no results.
+    """
+    try:
+        frame = await get_fmp_client().get_statement_frame(
+            STATEMENT_ENDPOINT, ticker, period, limit, start_date, end_date
+        )
+        return render_metrics(frame, INCOME_STATEMENT_RATIOS, fields=field_whitelist(STATEMENT_ENDPOINT))
+    except Exception as e:
+        logger.error(f"computing income statement metrics failed for {ticker}")
+
+
 create_income_statement_agent = LlmAgent(
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=statement_model(),
     name="Income_Statement_Agent",
     description="A simple financial analysis agent that can perform analysis on income statement trends across time",
     instruction="""You are an expert financial analyst capable to analyze the income statement in details across time. 
@@ -52,8 +123,30 @@ create_income_statement_agent = LlmAgent(
     ***Instructions***
     * Make sure you **PROVIDE DETAILED NUMBERS and PERCENTAGES** for upward and downward trends for each fundamental in the income statement
     * For each fundamental trend in the income statement explain what it means for the health of the company.
+    * Use `income_statement_metrics` for the changes, CAGR, moving averages and ratios and narrate those precomputed numbers instead of calculating them yourself
+    * To compare several companies call `fmp_income_statements` once with all their tickers instead of one call per company
     * Try to combine fundamentals to give better insights for the financial health of the company 
     """,
-    tools=[fmp_income_statement],
+    tools=[fmp_income_statement, fmp_income_statements, income_statement_metrics],
 )
 
+
+def create_agent_card(url: str) -> AgentCard:
+    """A2A card of the agent served at `url`."""
+    skill = AgentSkill(
+        id='incomestatement_search',
+        name='Income Statement Analysis',
+        description='It analyses the income statement of a company across time',
+        tags=['income statement', 'financial analysis'],
+        examples=['Analyse the income statement data for NVIDIA'],
+    )
+    return AgentCard(
+        name='Income Statement Agent',
+        description='Helps with Performing a Detailed analyses of income statement data across time for companies',
+        url=url,
+        version='1.0.0',
+        default_input_modes=['text'],
+        default_output_modes=['text'],
+        capabilities=AgentCapabilities(streaming=True),
+        skills=[skill],
+    )
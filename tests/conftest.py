@@ -0,0 +1,51 @@
+import multiprocessing
+import socket
+import time
+
+import pytest
+
+from bench_end_to_end import serve_fmp
+
+
+STUB_PERIODS = 5
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    """Keeps every cache, limiter and store of a test in its own directory, offline and untraced."""
+    monkeypatch.setenv('FMP_KEY', 'test')
+    monkeypatch.setenv('FMP_CACHE_PATH', str(tmp_path / 'fmp_statements.sqlite3'))
+    monkeypatch.setenv('FMP_RATE_LIMIT_PATH', str(tmp_path / 'fmp_rate_limit.sqlite3'))
+    monkeypatch.setenv('ANALYSIS_CACHE_PATH', str(tmp_path / 'analyses.sqlite3'))
+    monkeypatch.setenv('AGENT_STORE_DIR', str(tmp_path))
+    monkeypatch.setenv('FMP_HTTP2', 'FALSE')
+    monkeypatch.setenv('FMP_RATE_LIMIT', '0')
+    monkeypatch.delenv('CASSETTE_MODE', raising=False)
+    monkeypatch.delenv('TRACING_EXPORTER', raising=False)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='session')
+def fmp_server():
+    """Base url of the stub FMP server of the end-to-end benchmark, with `STUB_PERIODS` years per statement."""
+    port = _free_port()
+    process = multiprocessing.Process(target=serve_fmp, args=(port, STUB_PERIODS), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                process.terminate()
+                raise
+            time.sleep(0.05)
+    yield f'http://127.0.0.1:{port}'
+    process.terminate()
+    process.join()
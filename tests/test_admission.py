@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from common.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+async def run_in_order(controller, requests):
+    """Queues `requests` (user, priority) behind a held slot, frees it and returns the order they ran in."""
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.admit('holder'):
+            await release.wait()
+
+    async def request(user, priority):
+        async with controller.admit(user, priority):
+            order.append(user)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = []
+    for user, priority in requests:
+        tasks.append(asyncio.create_task(request(user, priority)))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+
+async def test_runs_up_to_the_limit_at_once():
+    controller = AdmissionController(max_concurrent=2, max_queue=10)
+    async with controller.admit('a') as waited_a, controller.admit('b') as waited_b:
+        assert waited_a < 0.01 and waited_b < 0.01
+        assert controller.active == 2
+    assert controller.active == 0
+
+
+async def test_interactive_requests_go_before_batch():
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    order = await run_in_order(controller, [
+        ('batch-1', BATCH),
+        ('batch-2', BATCH),
+        ('user', INTERACTIVE),
+    ])
+    assert order == ['user', 'batch-1', 'batch-2']
+
+
+async def test_users_take_turns():
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    order = await run_in_order(controller, [
+        ('alice', INTERACTIVE),
+        ('alice', INTERACTIVE),
+        ('alice', INTERACTIVE),
+        ('bob', INTERACTIVE),
+        ('carol', INTERACTIVE),
+    ])
+    assert order == ['alice', 'bob', 'carol', 'alice', 'alice']
+
+
+async def test_requests_beyond_the_queue_are_rejected():
+    controller = AdmissionController(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold(user):
+        async with controller.admit(user):
+            await release.wait()
+
+    running = asyncio.create_task(hold('a'))
+    waiting = asyncio.create_task(hold('b'))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        async with controller.admit('c'):
+            pass
+    assert rejected.value.retry_after > 0
+    assert controller.rejected == 1
+    release.set()
+    await asyncio.gather(running, waiting)
+
+
+async def test_canceled_waiter_gives_up_its_place():
+    controller = AdmissionController(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold(user):
+        async with controller.admit(user):
+            await release.wait()
+
+    running = asyncio.create_task(hold('a'))
+    waiting = asyncio.create_task(hold('b'))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    # The queue has room again, and the slot is not handed to the canceled waiter.
+    queued = asyncio.create_task(hold('c'))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(running, queued)
+    assert controller.active == 0
+    assert controller.stats()['active'] == 0
+
+
+async def test_unknown_priority_is_refused():
+    controller = AdmissionController(max_concurrent=1, max_queue=1)
+    with pytest.raises(ValueError):
+        async with controller.admit('a', 'urgent'):
+            pass
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from common.analytics import (
+    BALANCE_SHEET_RATIOS,
+    CASH_FLOW_RATIOS,
+    cagr,
+    compute_ratios,
+    moving_average,
+    period_change,
+    render_metrics,
+    span_in_years,
+)
+from common.statement_frame import StatementFrame
+
+
+nan = np.nan
+
+
+def frame(**columns) -> StatementFrame:
+    periods = len(next(iter(columns.values())))
+    return StatementFrame.from_records([
+        {
+            'date': f'{2020 + index}-09-30',
+            'symbol': 'AAPL',
+            'fiscalYear': str(2020 + index),
+            'period': 'FY',
+            **{name: values[index] for name, values in columns.items() if values[index] is not None},
+        }
+        for index in range(periods)
+    ])
+
+
+def test_moving_average():
+    result = moving_average(np.array([[1.0, 2, 3, 4]]), 2)
+    np.testing.assert_allclose(result, [[nan, 1.5, 2.5, 3.5]])
+
+
+def test_moving_average_only_blanks_windows_with_a_missing_period():
+    result = moving_average(np.array([[1.0, nan, 3, 4, 5, 6]]), 2)
+    np.testing.assert_allclose(result, [[nan, nan, nan, 3.5, 4.5, 5.5]])
+
+
+def test_moving_average_longer_than_the_statement():
+    assert np.isnan(moving_average(np.array([[1.0, 2]]), 3)).all()
+
+
+def test_period_change_uses_the_absolute_base():
+    change = period_change(np.array([[-10.0, -5, 0, 5]]))
+    np.testing.assert_allclose(change, [[nan, 0.5, 1.0, nan]])
+
+
+def test_quarterly_change_against_the_same_quarter():
+    change = period_change(np.array([[1.0, 2, 3, 4, 2]]), lag=4)
+    np.testing.assert_allclose(change, [[nan, nan, nan, nan, 1.0]])
+
+
+def test_cagr_needs_positive_ends():
+    growth = cagr(np.array([[100.0, 150, 121], [-1, 2, 3]]), 2)
+    np.testing.assert_allclose(growth, [0.1, nan])
+
+
+def test_span_in_years():
+    assert span_in_years(frame(revenue=[1, 2, 3])) == pytest.approx(2, abs=0.01)
+
+
+def test_ratios_skip_what_the_statement_cannot_support():
+    ratios = compute_ratios(
+        frame(totalCurrentAssets=[200, 300], totalCurrentLiabilities=[100, 0]),
+        BALANCE_SHEET_RATIOS,
+    )
+    assert list(ratios) == ['currentRatio', 'quickRatio']
+    np.testing.assert_allclose(ratios['currentRatio'], [2.0, nan])
+
+
+def test_ratios_read_as_reported_concepts():
+    ratios = compute_ratios(
+        frame(
+            netcashprovidedbyusedinoperatingactivities=[120, 150],
+            paymentstoacquirepropertyplantandequipment=[20, 30],
+            netincomeloss=[100, 100],
+        ),
+        CASH_FLOW_RATIOS,
+    )
+    np.testing.assert_allclose(ratios['fcfToNetIncome'], [1.0, 1.2])
+    np.testing.assert_allclose(ratios['cashConversion'], [1.2, 1.5])
+
+
+def test_render_metrics():
+    text = render_metrics(
+        frame(revenue=[100, 110, 121], costOfRevenue=[0, 0, 0]),
+        {},
+        window=2,
+    )
+    lines = text.splitlines()
+    assert lines[1] == 'item | FY2021 | FY2022 | CAGR | MA2'
+    assert lines[2] == 'revenue | +10.0% | +10.0% | +10.0% | 115.5'
+    # All-zero line items are left out.
+    assert 'costOfRevenue' not in text
+
+
+def test_render_metrics_falls_back_to_every_item_when_fields_match_none():
+    text = render_metrics(frame(revenue=[100, 110]), {}, window=2, fields=['netincomeloss'])
+    assert 'revenue |' in text
@@ -0,0 +1,109 @@
+import time
+
+import httpx
+import pytest
+
+from common.fmp_client import FMPClient
+from common.rate_limiter import TokenBucketLimiter
+from common.statement_cache import StatementCache
+from conftest import STUB_PERIODS
+
+
+def scripted_client(responses, **kwargs) -> tuple[FMPClient, list[httpx.Request]]:
+    """An FMP client whose requests are answered by `responses` in order, and the requests it sent."""
+    client = FMPClient(base_url='http://fmp.test', use_cache=False, **kwargs)
+    client.retry_base_delay = 0.01
+    requests = []
+    answers = iter(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return next(answers)
+
+    client._http_client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client, requests
+
+
+async def test_retries_server_errors():
+    client, requests = scripted_client([
+        httpx.Response(503),
+        httpx.Response(502),
+        httpx.Response(200, text='[]'),
+    ])
+    assert await client.get_text('income-statement', symbol='AAPL') == '[]'
+    assert len(requests) == 3
+    assert client.retries == 2
+    assert requests[0].url.params['apikey'] == 'test'
+    await client.aclose()
+
+
+async def test_gives_up_after_max_retries():
+    client, requests = scripted_client([httpx.Response(500)] * 3, max_retries=2)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_text('income-statement', symbol='AAPL')
+    assert len(requests) == 3
+    await client.aclose()
+
+
+async def test_does_not_retry_client_errors():
+    client, requests = scripted_client([httpx.Response(401)])
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_text('income-statement', symbol='AAPL')
+    assert len(requests) == 1
+    await client.aclose()
+
+
+async def test_waits_for_retry_after():
+    client, requests = scripted_client([
+        httpx.Response(429, headers={'Retry-After': '0.3'}),
+        httpx.Response(200, text='[]'),
+    ])
+    start = time.monotonic()
+    await client.get_text('income-statement', symbol='AAPL')
+    assert time.monotonic() - start >= 0.3
+    assert client.throttled == 1
+    await client.aclose()
+
+
+async def test_long_retry_after_fails_at_once():
+    client, requests = scripted_client([httpx.Response(429, headers={'Retry-After': '3600'})])
+    start = time.monotonic()
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_text('income-statement', symbol='AAPL')
+    assert time.monotonic() - start < 1
+    assert len(requests) == 1
+    await client.aclose()
+
+
+async def test_throttling_blocks_the_shared_limiter(tmp_path):
+    limiter = TokenBucketLimiter('test', tmp_path / 'limit.sqlite3', rate=100, burst=10)
+    client, requests = scripted_client(
+        [httpx.Response(429, headers={'Retry-After': '0.2'}), httpx.Response(200, text='[]')],
+        rate_limiter=limiter,
+    )
+    start = time.monotonic()
+    await client.get_text('income-statement', symbol='AAPL')
+    # The retry waited for the block in the limiter rather than sleeping on its own.
+    assert time.monotonic() - start >= 0.2
+    assert limiter.blocks == 1
+    await client.aclose()
+
+
+async def test_statements_are_cached(fmp_server, tmp_path):
+    client = FMPClient(base_url=fmp_server, cache=StatementCache(tmp_path / 'cache.sqlite3'))
+    frame = await client.get_statement_frame('income-statement', 'AAPL')
+    assert len(frame) == STUB_PERIODS
+    await client.get_statement_frame('income-statement', 'AAPL')
+    await client.get_statement_frame('income-statement', 'AAPL', period='quarter')
+    assert (client.cache.misses, client.cache.hits) == (2, 1)
+    await client.aclose()
+
+
+async def test_expired_statements_are_revalidated(fmp_server, tmp_path):
+    client = FMPClient(base_url=fmp_server, cache=StatementCache(tmp_path / 'cache.sqlite3', ttl=0))
+    first = await client.get_statement('balance-sheet-statement', 'MSFT')
+    # The stub never files anything newer, so the expired entry is kept.
+    assert await client.get_statement('balance-sheet-statement', 'MSFT') == first
+    assert client.cache.revalidations == 1
+    assert client.cache.misses == 1
+    await client.aclose()
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from common.rate_limiter import TokenBucketLimiter
+
+
+@pytest.fixture
+def limiter_path(tmp_path):
+    return tmp_path / 'limit.sqlite3'
+
+
+async def test_burst_is_served_at_once(limiter_path):
+    limiter = TokenBucketLimiter('key', limiter_path, rate=1, burst=3)
+    waits = [await limiter.acquire() for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+    assert limiter.delayed == 0
+    limiter.close()
+
+
+async def test_callers_beyond_the_burst_are_spaced_out(limiter_path):
+    limiter = TokenBucketLimiter('key', limiter_path, rate=20, burst=1)
+    start = time.monotonic()
+    waits = [await limiter.acquire() for _ in range(4)]
+    assert waits[0] == 0.0
+    assert all(wait > 0 for wait in waits[1:])
+    # Three tokens refilled at 20 per second.
+    assert time.monotonic() - start >= 0.14
+    assert limiter.delayed == 3
+    limiter.close()
+
+
+def test_waiters_queue_up_in_arrival_order(limiter_path):
+    limiter = TokenBucketLimiter('key', limiter_path, rate=10, burst=1)
+    waits = [limiter._update(1.0) for _ in range(4)]
+    assert waits[0] == 0.0
+    # Every token taken while the bucket is empty waits one refill longer than the one before.
+    assert waits[1:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+    limiter.close()
+
+
+def test_processes_share_the_bucket(limiter_path):
+    first = TokenBucketLimiter('key', limiter_path, rate=1, burst=2)
+    second = TokenBucketLimiter('key', limiter_path, rate=1, burst=2)
+    other_key = TokenBucketLimiter('other', limiter_path, rate=1, burst=2)
+    assert first._update(1.0) == 0.0
+    assert second._update(1.0) == 0.0
+    assert first._update(1.0) > 0.0
+    assert other_key._update(1.0) == 0.0
+    for limiter in (first, second, other_key):
+        limiter.close()
+
+
+async def test_block_holds_back_every_caller(limiter_path):
+    limiter = TokenBucketLimiter('key', limiter_path, rate=100, burst=10)
+    other = TokenBucketLimiter('key', limiter_path, rate=100, burst=10)
+    await limiter.block(0.2)
+    start = time.monotonic()
+    await other.acquire()
+    assert time.monotonic() - start >= 0.19
+    assert limiter.blocks == 1
+    limiter.close()
+    other.close()
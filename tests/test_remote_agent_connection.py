@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from a2a.types import (
+    AgentCapabilities,
+    AgentCard,
+    Message,
+    MessageSendParams,
+    Part,
+    Role,
+    SendStreamingMessageRequest,
+    TaskState,
+    TaskStatus,
+    TaskStatusUpdateEvent,
+    TextPart,
+)
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from common.tracing import extract_context
+from remote_agent_connection import AgentHttpPool, RemoteAgentConnections
+
+
+@pytest.fixture(scope='module')
+def exporter():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+class StreamingClient:
+    """Stands in for the A2A client, streaming `updates` status updates."""
+
+    def __init__(self, updates: int):
+        self.updates = updates
+        self.requests = []
+
+    async def send_message_streaming(self, request):
+        self.requests.append(request)
+        for _ in range(self.updates):
+            yield SimpleNamespace(root=SimpleNamespace(result=TaskStatusUpdateEvent(
+                task_id='task',
+                context_id='context',
+                status=TaskStatus(state=TaskState.working),
+                final=False,
+            )))
+
+
+def connection(client: StreamingClient, monkeypatch) -> RemoteAgentConnections:
+    card = AgentCard(
+        name='Balance Sheet Agent',
+        description='',
+        url='http://agent',
+        version='1.0',
+        capabilities=AgentCapabilities(streaming=True),
+        default_input_modes=['text'],
+        default_output_modes=['text'],
+        skills=[],
+    )
+    monkeypatch.setattr(RemoteAgentConnections, 'agent_client', property(lambda self: client))
+    return RemoteAgentConnections(card, card.url, http_pool=AgentHttpPool())
+
+
+def request() -> SendStreamingMessageRequest:
+    return SendStreamingMessageRequest(id='1', params=MessageSendParams(message=Message(
+        role=Role.user,
+        message_id='1',
+        context_id='context',
+        parts=[Part(root=TextPart(text='AAPL'))],
+    )))
+
+
+async def test_client_span_is_not_current_between_updates(exporter, monkeypatch):
+    exporter.clear()
+    client = StreamingClient(updates=2)
+    remote = connection(client, monkeypatch)
+
+    with trace.get_tracer(__name__).start_as_current_span('turn') as turn:
+        async for _ in remote.send_message_streaming(request()):
+            # Work done by the consumer belongs to the turn, not to the A2A call.
+            assert trace.get_current_span() is turn
+
+    client_span, = [span for span in exporter.get_finished_spans() if span.kind == trace.SpanKind.CLIENT]
+    assert client_span.parent.span_id == turn.get_span_context().span_id
+    # The agent continues the trace under the client span.
+    metadata = client.requests[0].params.message.metadata
+    assert trace.get_current_span(extract_context(metadata)).get_span_context().span_id == (
+        client_span.context.span_id
+    )
+
+
+async def test_closing_the_stream_from_another_task_ends_the_span(exporter, monkeypatch, caplog):
+    exporter.clear()
+    remote = connection(StreamingClient(updates=3), monkeypatch)
+    stream = remote.send_message_streaming(request())
+    await stream.__anext__()
+    await asyncio.create_task(stream.aclose())
+    assert [span.name for span in exporter.get_finished_spans()] == [
+        'RemoteAgentConnections.send_message_streaming'
+    ]
+    assert 'Failed to detach context' not in caplog.text
@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+import pytest
+from a2a.types import (
+    AgentCapabilities,
+    AgentCard,
+    Message,
+    Part,
+    Role,
+    SendMessageResponse,
+    SendMessageSuccessResponse,
+    Task,
+    TaskState,
+    TaskStatus,
+    TextPart,
+)
+
+from routing_agent import RoutingAgent
+
+
+def card(name: str, streaming: bool) -> AgentCard:
+    return AgentCard(
+        name=name,
+        description=name,
+        url=f'http://{name}',
+        version='1.0',
+        capabilities=AgentCapabilities(streaming=streaming),
+        default_input_modes=['text'],
+        default_output_modes=['text'],
+        skills=[],
+    )
+
+
+class FakeAgent:
+    """A remote agent answering every message with the next scripted task state.
+
+    Like the a2a-sdk request handler, it refuses messages continuing a task
+    that already reached a terminal state.
+    """
+
+    def __init__(self, name: str, states: list[TaskState], streaming: bool = False):
+        self.card = card(name, streaming)
+        self.states = list(states)
+        self.sent: list[dict] = []
+        self.terminal: set[str] = set()
+
+    def get_agent(self) -> AgentCard:
+        return self.card
+
+    def _answer(self, request) -> Task:
+        message = request.params.message
+        self.sent.append({'task_id': message.task_id, 'context_id': message.context_id})
+        if message.task_id in self.terminal:
+            raise RuntimeError(f'Task {message.task_id} is in terminal state')
+        state = self.states.pop(0)
+        task = Task(
+            id=message.task_id or f'task-{len(self.sent)}',
+            context_id=message.context_id,
+            status=TaskStatus(
+                state=state,
+                message=Message(
+                    role=Role.agent,
+                    message_id=f'reply-{len(self.sent)}',
+                    parts=[Part(root=TextPart(text=state.value))],
+                ),
+            ),
+        )
+        if state in (TaskState.completed, TaskState.canceled, TaskState.failed, TaskState.rejected):
+            self.terminal.add(task.id)
+        return task
+
+    async def send_message(self, message_request):
+        return SendMessageResponse(
+            root=SendMessageSuccessResponse(id=message_request.id, result=self._answer(message_request))
+        )
+
+    async def send_message_streaming(self, message_request):
+        yield self._answer(message_request)
+
+
+def routing_agent(agent: FakeAgent, streaming: bool) -> RoutingAgent:
+    routing = RoutingAgent(streaming=streaming)
+    routing.registry = SimpleNamespace(connections={agent.card.name: agent})
+    return routing
+
+
+def tool_context() -> SimpleNamespace:
+    return SimpleNamespace(state={}, user_id='user', session=SimpleNamespace(id='session'))
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('state', [TaskState.rejected, TaskState.canceled, TaskState.failed])
+async def test_follow_up_after_a_closed_task_starts_a_new_task(state, streaming):
+    agent = FakeAgent('Balance Sheet Agent', [state, TaskState.input_required], streaming)
+    routing = routing_agent(agent, streaming)
+    context = tool_context()
+
+    await routing.send_message('Balance Sheet Agent', 'AAPL', context)
+    reply = await routing.send_message('Balance Sheet Agent', 'And MSFT?', context)
+
+    assert 'needs more information' in reply
+    assert agent.sent[1] == {'task_id': None, 'context_id': agent.sent[0]['context_id']}
+    # An open task is continued.
+    assert context.state['agent_tasks']['Balance Sheet Agent']['task_id'] == 'task-2'
+
+
+async def test_fan_out_follow_up_after_a_rejected_task():
+    agent = FakeAgent('Balance Sheet Agent', [TaskState.rejected, TaskState.input_required])
+    routing = routing_agent(agent, streaming=False)
+    context = tool_context()
+
+    await routing.send_messages(['Balance Sheet Agent'], ['AAPL'], context)
+    reply = await routing.send_messages(['Balance Sheet Agent'], ['And MSFT?'], context)
+
+    assert 'failed' not in reply
+    assert agent.sent[1]['task_id'] is None
+
+
+async def test_fan_out_to_the_same_agent_twice_uses_separate_contexts():
+    agent = FakeAgent('Balance Sheet Agent', [TaskState.input_required, TaskState.completed])
+    routing = routing_agent(agent, streaming=False)
+    context = tool_context()
+
+    await routing.send_messages(['Balance Sheet Agent', 'Balance Sheet Agent'], ['AAPL', 'MSFT'], context)
+
+    first, second = agent.sent
+    assert first['context_id'] != second['context_id']
+    # Only the first task is continued by later messages.
+    assert context.state['agent_tasks']['Balance Sheet Agent'] == {
+        'task_id': 'task-1',
+        'context_id': first['context_id'],
+    }
+    assert context.state['active_agent'] == 'Balance Sheet Agent'
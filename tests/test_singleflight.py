@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from common.singleflight import SingleFlight
+
+
+class Upstream:
+    """A slow fetch counting its calls and whether it was canceled."""
+
+    def __init__(self, result='data', error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.canceled = False
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.canceled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def test_concurrent_calls_share_one_fetch():
+    flight = SingleFlight()
+    upstream = Upstream()
+    callers = [asyncio.create_task(flight.do('AAPL', upstream.fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await asyncio.gather(*callers) == ['data'] * 5
+    assert upstream.calls == 1
+    assert flight.stats() == {'calls': 5, 'deduplicated': 4, 'abandoned': 0, 'in_flight': 0}
+
+
+async def test_errors_are_shared():
+    flight = SingleFlight()
+    upstream = Upstream(error=ValueError('bad key'))
+    callers = [asyncio.create_task(flight.do('AAPL', upstream.fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert upstream.calls == 1
+
+
+async def test_different_keys_fetch_separately():
+    flight = SingleFlight()
+    upstream = Upstream()
+    upstream.release.set()
+    await asyncio.gather(flight.do('AAPL', upstream.fetch), flight.do('MSFT', upstream.fetch))
+    assert upstream.calls == 2
+
+
+async def test_canceled_caller_leaves_the_fetch_to_the_others():
+    flight = SingleFlight()
+    upstream = Upstream()
+    first = asyncio.create_task(flight.do('AAPL', upstream.fetch))
+    second = asyncio.create_task(flight.do('AAPL', upstream.fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await second == 'data'
+    assert first.cancelled()
+    assert not upstream.canceled
+
+
+async def test_fetch_is_canceled_when_every_caller_is():
+    flight = SingleFlight()
+    upstream = Upstream()
+    callers = [asyncio.create_task(flight.do('AAPL', upstream.fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert upstream.canceled
+    assert flight.stats()['abandoned'] == 1
+    assert flight.stats()['in_flight'] == 0
+
+    # The next call starts a fresh fetch.
+    retry = Upstream(result='fresh')
+    retry.release.set()
+    assert await flight.do('AAPL', retry.fetch) == 'fresh'
+
+
+async def test_fetch_survives_a_canceled_caller_when_another_joins_later():
+    flight = SingleFlight()
+    upstream = Upstream()
+    first = asyncio.create_task(flight.do('AAPL', upstream.fetch))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(flight.do('AAPL', upstream.fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    upstream.release.set()
+    assert await second == 'data'
+    assert upstream.calls == 1
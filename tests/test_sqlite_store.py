@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from common.sqlite_store import SQLiteCancellations, SQLiteDatabase, SQLiteSessionService
+
+
+@pytest.fixture
+async def database(tmp_path):
+    database = SQLiteDatabase(tmp_path / 'agent.sqlite3', flush_interval=60, batch_size=4)
+    yield database
+    await database.aclose()
+
+
+def committed(database, sql='SELECT COUNT(*) FROM app_state'):
+    return database.peek(sql)[0]
+
+
+def insert(database, key, value='1'):
+    database.write('INSERT INTO app_state VALUES (?, ?, ?)', ('app', key, value))
+
+
+async def test_writes_are_committed_in_one_batch(database):
+    for key in 'abc':
+        insert(database, key)
+    assert committed(database) == 0
+    await database.flush()
+    assert committed(database) == 3
+    assert database.stats()['batches'] == 1
+    assert database.stats()['writes'] == 3
+
+
+async def test_full_batch_is_flushed_without_waiting(database):
+    for key in 'abcd':
+        insert(database, key)
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+        if committed(database) == 4:
+            break
+    assert committed(database) == 4
+    assert database.stats()['pending'] == 0
+
+
+async def test_batch_is_flushed_after_the_interval(tmp_path):
+    database = SQLiteDatabase(tmp_path / 'agent.sqlite3', flush_interval=0.01)
+    insert(database, 'a')
+    await asyncio.sleep(0.1)
+    assert committed(database) == 1
+    await database.aclose()
+
+
+async def test_reads_see_queued_writes(database):
+    insert(database, 'a', '"x"')
+    assert await database.fetchone('SELECT value FROM app_state WHERE key=?', ('a',)) == ('"x"',)
+
+
+async def test_failed_write_does_not_drop_the_batch(database):
+    insert(database, 'a')
+    insert(database, 'a')  # Violates the primary key.
+    insert(database, 'b')
+    await database.flush()
+    assert committed(database) == 2
+    assert database.stats()['failed'] == 1
+    assert database.stats()['writes'] == 2
+
+
+async def test_workers_creating_the_same_session(tmp_path, monkeypatch):
+    path = tmp_path / 'agent.sqlite3'
+    first = SQLiteDatabase(path, flush_interval=60)
+    second = SQLiteDatabase(path, flush_interval=60)
+    first_sessions = SQLiteSessionService(first)
+    second_sessions = SQLiteSessionService(second)
+    fetchone = second.fetchone
+
+    async def racing_fetchone(sql, params=()):
+        # The other worker commits the session just after this one checked for it.
+        row = await fetchone(sql, params)
+        if sql.startswith('SELECT 1 FROM sessions'):
+            await first_sessions.create_session(app_name='app', user_id='u', session_id='ctx')
+            await first.flush()
+        return row
+
+    monkeypatch.setattr(second, 'fetchone', racing_fetchone)
+    await second_sessions.create_session(app_name='app', user_id='u', session_id='ctx', state={'app:k': 1})
+    await second.flush()
+    assert second.stats()['failed'] == 0
+    # The scoped state queued in the same batch survived.
+    session = await first_sessions.get_session(app_name='app', user_id='u', session_id='ctx')
+    assert session.state == {'app:k': 1}
+    await first.aclose()
+    await second.aclose()
+
+
+async def test_sessions_default_to_the_in_memory_ttl(database, monkeypatch):
+    monkeypatch.delenv('AGENT_SESSION_TTL', raising=False)
+    assert SQLiteSessionService(database).ttl == 1800
+
+
+async def test_cancellations_reach_the_other_worker(tmp_path):
+    path = tmp_path / 'agent.sqlite3'
+    receiving = SQLiteCancellations(SQLiteDatabase(path))
+    running = SQLiteCancellations(SQLiteDatabase(path))
+    receiving.request('ctx')
+    await receiving.database.flush()
+    assert await running.take(['other', 'ctx']) == ['ctx']
+    assert await running.take(['ctx']) == []
+    await receiving.database.aclose()
+    await running.database.aclose()
+
+
+async def test_metrics_do_not_wait_for_a_commit(database):
+    insert(database, 'a')
+    await database.flush()
+    sessions = SQLiteSessionService(database)
+    # A commit waiting for another worker's write lock holds the write connection.
+    with database._lock:
+        stats = await asyncio.wait_for(asyncio.to_thread(sessions.stats), timeout=1)
+    assert stats['resident_sessions'] == 0
+    assert committed(database) == 1
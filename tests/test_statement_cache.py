@@ -0,0 +1,70 @@
+import json
+
+from common.statement_cache import StatementCache, latest_filing
+
+
+def statement(*filings: str) -> str:
+    return json.dumps([{'date': filing[:10], 'acceptedDate': filing} for filing in filings])
+
+
+def test_latest_filing():
+    assert latest_filing(json.loads(statement('2023-11-03 06:01:36', '2024-11-01 06:01:36'))) == '2024-11-01 06:01:36'
+    assert latest_filing([{'fillingDate': '2022-10-28'}]) == '2022-10-28'
+    assert latest_filing({'Error Message': 'Invalid API KEY'}) is None
+
+
+def test_put_and_get(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3', ttl=60)
+    key = ('income-statement', 'aapl', None, None)
+    assert cache.get(key) is None
+    cache.put(key, statement('2024-11-01'), '2024-11-01')
+    entry = cache.get(('income-statement', 'AAPL', None, None))
+    assert entry.text == statement('2024-11-01')
+    assert entry.latest_filing == '2024-11-01'
+    assert cache.is_fresh(entry)
+
+
+def test_entries_expire(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3', ttl=0)
+    key = ('income-statement', 'AAPL', None, None)
+    cache.put(key, statement('2024-11-01'), '2024-11-01')
+    assert not cache.is_fresh(cache.get(key))
+
+
+def test_newer_filing_invalidates_older_variants(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3')
+    cache.put(('income-statement', 'AAPL', 'annual', 5), statement('2023-11-03'), '2023-11-03')
+    cache.put(('income-statement', 'AAPL', 'annual', 1), statement('2024-11-01'), '2024-11-01')
+    assert cache.get(('income-statement', 'AAPL', 'annual', 5)) is None
+    assert cache.invalidations == 1
+
+
+def test_invalidation_is_scoped_to_the_period(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3')
+    annual = ('income-statement', 'AAPL', 'annual', None)
+    cache.put(annual, statement('2023-11-03'), '2023-11-03')
+    # A new quarterly filing says nothing about the annual statements.
+    cache.put(('income-statement', 'AAPL', 'quarter', None), statement('2024-02-02'), '2024-02-02')
+    assert cache.get(annual) is not None
+    assert cache.invalidations == 0
+
+
+def test_invalidation_is_scoped_to_endpoint_and_symbol(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3')
+    cache.put(('income-statement', 'AAPL', None, None), statement('2023-11-03'), '2023-11-03')
+    cache.put(('balance-sheet-statement', 'AAPL', None, None), statement('2024-11-01'), '2024-11-01')
+    cache.put(('income-statement', 'MSFT', None, None), statement('2024-11-01'), '2024-11-01')
+    assert cache.get(('income-statement', 'AAPL', None, None)) is not None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = StatementCache(tmp_path / 'cache.sqlite3')
+    text = statement('2024-11-01')
+    cache.put(('income-statement', 'AAPL', None, None), text, None)
+    cache.max_bytes = 2 * cache.stats()['bytes']
+    cache.put(('income-statement', 'MSFT', None, None), text, None)
+    cache.get(('income-statement', 'AAPL', None, None))
+    cache.put(('income-statement', 'NVDA', None, None), text, None)
+    assert cache.get(('income-statement', 'MSFT', None, None)) is None
+    assert cache.get(('income-statement', 'AAPL', None, None)) is not None
+    assert cache.evictions == 1
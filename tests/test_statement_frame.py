@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from common.statement_frame import StatementFrame, format_value, render_comparison
+
+
+RECORDS = [
+    {'date': '2024-09-28', 'symbol': 'AAPL', 'reportedCurrency': 'USD', 'fiscalYear': '2024',
+     'period': 'FY', 'revenue': 391035000000, 'netIncome': 93736000000, 'link': 'https://sec.gov'},
+    {'date': '2023-09-30', 'symbol': 'AAPL', 'reportedCurrency': 'USD', 'fiscalYear': '2023',
+     'period': 'FY', 'revenue': 383285000000, 'netIncome': 96995000000, 'eps': None},
+]
+
+
+def test_from_records_orders_periods_and_skips_metadata():
+    frame = StatementFrame.from_records(RECORDS)
+    assert frame.periods == ['FY2023', 'FY2024']
+    assert frame.symbol == 'AAPL'
+    assert frame.currency == 'USD'
+    assert list(frame.columns) == ['revenue', 'netIncome']
+    np.testing.assert_array_equal(frame['revenue'], [383285000000, 391035000000])
+
+
+def test_as_reported_rows_read_the_data_block():
+    frame = StatementFrame.from_records([
+        {'date': '2024-09-28', 'symbol': 'AAPL', 'fiscalYear': 2024, 'period': 'FY',
+         'data': {'netincomeloss': 93736000000, 'documenttype': '10-K'}},
+    ])
+    assert list(frame.columns) == ['netincomeloss']
+
+
+def test_missing_values_are_nan():
+    frame = StatementFrame.from_records([
+        {'date': '2023-09-30', 'revenue': 1},
+        {'date': '2024-09-28', 'revenue': 2, 'netIncome': 1},
+    ])
+    assert np.isnan(frame['netIncome'][0])
+    assert np.isnan(frame.get('eps')).all()
+
+
+def test_from_json_rejects_error_messages():
+    with pytest.raises(ValueError):
+        StatementFrame.from_json(json.dumps({'Error Message': 'Invalid API KEY'}))
+    with pytest.raises(ValueError):
+        StatementFrame.from_json('[]')
+
+
+def test_select_is_case_insensitive_and_ordered():
+    frame = StatementFrame.from_records(RECORDS).select(['NETINCOME', 'revenue', 'eps'])
+    assert list(frame.columns) == ['netIncome', 'revenue']
+
+
+def test_between():
+    frame = StatementFrame.from_records(RECORDS).between(start='2024-01-01')
+    assert frame.periods == ['FY2024']
+    np.testing.assert_array_equal(frame['revenue'], [391035000000])
+
+
+def test_quarterly():
+    frame = StatementFrame.from_records([{'date': '2024-12-28', 'period': 'Q1', 'fiscalYear': '2025', 'revenue': 1}])
+    assert frame.is_quarterly
+    assert frame.periods == ['Q1 2025']
+
+
+def test_format_value():
+    assert format_value(391035000000) == '391.04B'
+    assert format_value(-12_500_000) == '-12.5M'
+    assert format_value(1500) == '1.5K'
+    assert format_value(1.2345) == '1.234'
+    assert format_value(float('nan')) == '-'
+
+
+def test_render_leaves_out_empty_items():
+    frame = StatementFrame.from_records([
+        {'date': '2024-09-28', 'symbol': 'AAPL', 'reportedCurrency': 'USD', 'fiscalYear': '2024',
+         'revenue': 391035000000, 'goodwill': 0},
+    ])
+    assert frame.render().splitlines() == ['AAPL (USD) | FY2024', 'revenue | 391.04B']
+
+
+def test_render_comparison_aligns_fiscal_periods():
+    apple = StatementFrame.from_records(RECORDS)
+    microsoft = StatementFrame.from_records([
+        {'date': '2024-06-30', 'symbol': 'MSFT', 'fiscalYear': '2024', 'revenue': 245122000000},
+    ])
+    assert render_comparison([apple, microsoft]).splitlines() == [
+        'Currencies: AAPL USD, MSFT n/a',
+        'item | symbol | FY2023 | FY2024',
+        'revenue | AAPL | 383.29B | 391.04B',
+        'revenue | MSFT | - | 245.12B',
+        'netIncome | AAPL | 97.00B | 93.74B',
+        'netIncome | MSFT | - | -',
+    ]